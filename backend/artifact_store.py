@@ -0,0 +1,364 @@
+"""
+Content-addressed artifact storage.
+
+Tools save artifacts under new random names even when the bytes are the same
+as an artifact saved before (the same diagram rendered again, the same
+Terraform file...). `ContentAddressedArtifactService` wraps the artifact
+service (GcsArtifactService in production) so the bytes of an artifact are
+uploaded once, to a blob store keyed by their SHA-256, and each artifact
+version only stores a small reference to it:
+
+    {"sha256": "...", "mime_type": "image/png", "size": 12345}
+
+Listing, versioning and deleting artifacts are left to the wrapped service.
+Artifacts saved before, or smaller than MIN_DEDUP_SIZE, are stored as they are.
+Blobs are never deleted, since other artifacts may reference them.
+
+Blob uploads go through an `UploadQueue`. In background mode a save returns
+as soon as the reference is written, the blob is uploaded by a bounded number
+of concurrent tasks with retries, and is served from memory until then. The
+upload status of each artifact of a session is available from `upload_status`.
+
+Stored blobs can be downloaded straight from the blob store with short-lived
+signed URLs (GCS only), or read by byte ranges to be streamed.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from google.adk.artifacts import BaseArtifactService
+from google.genai import types
+
+REF_MIME_TYPE = "application/vnd.autoarch.blob-ref+json"
+
+# Smaller artifacts are stored directly, a reference would not save anything
+MIN_DEDUP_SIZE = 1024
+
+# Background uploads running at the same time, and attempts per upload
+MAX_CONCURRENT_UPLOADS = 4
+UPLOAD_ATTEMPTS = 3
+# Delay before the first retry, doubled for each following one, in seconds
+RETRY_DELAY = 1.0
+# Delay before a blob whose attempts all failed is queued again, in seconds. Its
+# reference is already saved, so the bytes are kept in memory until it is uploaded.
+REQUEUE_DELAY = 60.0
+
+# Sessions whose upload status is kept, the least recently used are dropped
+MAX_TRACKED_SESSIONS = 1000
+
+
+def _blob_name(digest: str) -> str:
+    return f"sha256/{digest[:2]}/{digest}"
+
+
+class GcsBlobStore:
+    """
+    Blobs in a GCS bucket, under "<prefix>/sha256/<2 first chars>/<digest>".
+    The credentials (the application default ones if not given) also sign the
+    download URLs.
+    """
+
+    def __init__(self, bucket_name: str, prefix: str = "blobs", credentials=None):
+        import google.auth
+        from google.cloud import storage
+
+        project = None
+        if credentials is None:
+            credentials, project = google.auth.default()
+        self.credentials = credentials
+        self.client = storage.Client(credentials=credentials, project=project)
+        self.bucket = self.client.bucket(bucket_name)
+        self.prefix = prefix
+
+    def _blob(self, digest: str):
+        return self.bucket.blob(f"{self.prefix}/{_blob_name(digest)}")
+
+    def exists(self, digest: str) -> bool:
+        return self._blob(digest).exists()
+
+    def put(self, digest: str, data: bytes, mime_type: str):
+        self._blob(digest).upload_from_string(data, content_type=mime_type)
+
+    def get(self, digest: str) -> bytes:
+        return self._blob(digest).download_as_bytes()
+
+    def read_range(self, digest: str, start: int, end: int) -> bytes:
+        """Bytes start to end, both included."""
+        return self._blob(digest).download_as_bytes(start=start, end=end)
+
+    def signed_url(self, digest: str, mime_type: str, filename: str, expires_in: int) -> str:
+        """V4 signed GET URL of a blob, served with the artifact MIME type and file name."""
+        from google.auth.transport.requests import Request
+        from google.oauth2 import service_account
+
+        kwargs = {}
+        credentials = self.credentials
+        if not isinstance(credentials, service_account.Credentials):
+            # Cloud Run / GCE credentials have no private key, the URL is signed through the IAM API
+            if not credentials.valid:
+                credentials.refresh(Request())
+            kwargs = {"service_account_email": credentials.service_account_email, "access_token": credentials.token}
+        return self._blob(digest).generate_signed_url(
+            version="v4",
+            expiration=datetime.timedelta(seconds=expires_in),
+            method="GET",
+            response_type=mime_type,
+            response_disposition=f'inline; filename="{filename}"',
+            **kwargs,
+        )
+
+
+class LocalBlobStore:
+    """Blobs in a local directory, the stand-in for GcsBlobStore in tests and local runs."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, *_blob_name(digest).split("/"))
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def put(self, digest: str, data: bytes, mime_type: str):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside then renamed, so a reader never sees a partial blob
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def get(self, digest: str) -> bytes:
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+    def read_range(self, digest: str, start: int, end: int) -> bytes:
+        """Bytes start to end, both included."""
+        with open(self._path(digest), "rb") as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    def signed_url(self, digest: str, mime_type: str, filename: str, expires_in: int) -> Optional[str]:
+        """Local blobs have no signed URLs, they are streamed."""
+        return None
+
+
+class UploadQueue:
+    """
+    Uploads blobs to a blob store, skipping the ones already there. With
+    `background`, uploads run as tasks limited to `max_concurrency` at a time
+    and are retried with exponential backoff, then queued again after
+    REQUEUE_DELAY until they succeed; otherwise they are awaited by the caller.
+    `uploaded_bytes` and `deduplicated_bytes` count the bytes sent to the blob
+    store and the bytes that did not need to be.
+    """
+
+    def __init__(self, blob_store, background: bool = True, max_concurrency: int = MAX_CONCURRENT_UPLOADS, attempts: int = UPLOAD_ATTEMPTS):
+        self.blob_store = blob_store
+        self.background = background
+        self.attempts = attempts
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Digests known to be in the blob store, so they are not checked again
+        self._known_digests = set()
+        # Uploads in progress and their bytes, by digest
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._pending_data: Dict[str, bytes] = {}
+        self.uploaded_bytes = 0
+        self.deduplicated_bytes = 0
+
+    def submit(self, digest: str, data: bytes, mime_type: str) -> Optional[asyncio.Task]:
+        """Starts the upload of a blob, returns its task, or None when the blob is known to be stored."""
+        if digest in self._known_digests:
+            self.deduplicated_bytes += len(data)
+            return None
+        if digest not in self._tasks:
+            self._pending_data[digest] = data
+            self._tasks[digest] = asyncio.create_task(self._upload(digest, data, mime_type))
+        return self._tasks[digest]
+
+    def pending_data(self, digest: str) -> Optional[bytes]:
+        """The bytes of a blob still being uploaded."""
+        return self._pending_data.get(digest)
+
+    def task(self, digest: str) -> Optional[asyncio.Task]:
+        """The upload in progress of a blob, e.g. queued again after a failure."""
+        return self._tasks.get(digest)
+
+    async def _upload(self, digest: str, data: bytes, mime_type: str, delay: float = 0.0):
+        try:
+            await asyncio.sleep(delay)
+            async with self._semaphore:
+                for attempt in range(self.attempts):
+                    try:
+                        if await asyncio.to_thread(self.blob_store.exists, digest):
+                            self.deduplicated_bytes += len(data)
+                        else:
+                            await asyncio.to_thread(self.blob_store.put, digest, data, mime_type)
+                            self.uploaded_bytes += len(data)
+                        break
+                    except Exception:
+                        if attempt == self.attempts - 1:
+                            raise
+                        await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+        except asyncio.CancelledError:
+            self._tasks.pop(digest, None)
+            raise
+        except Exception as e:
+            if not self.background:
+                # Awaited by save_artifact, which fails before saving the reference
+                print(f"Upload of blob {digest} failed after {self.attempts} attempts: {str(e)}")
+                self._tasks.pop(digest, None)
+                self._pending_data.pop(digest, None)
+                raise
+            print(f"Upload of blob {digest} failed after {self.attempts} attempts, queued again in {REQUEUE_DELAY:g} seconds: {str(e)}")
+            self._tasks[digest] = asyncio.create_task(self._upload(digest, data, mime_type, REQUEUE_DELAY))
+            raise
+
+        self._known_digests.add(digest)
+        self._tasks.pop(digest, None)
+        self._pending_data.pop(digest, None)
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Waits for the uploads in progress, e.g. before the process exits."""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks.values()), timeout=timeout)
+
+
+class ContentAddressedArtifactService(BaseArtifactService):
+    """
+    Wraps an artifact service so identical artifact bytes are uploaded and
+    stored once. Blobs are uploaded by `upload_queue`, in the background
+    unless it was created with background=False.
+    """
+
+    def __init__(self, artifact_service: BaseArtifactService, upload_queue: UploadQueue):
+        self.artifact_service = artifact_service
+        self.upload_queue = upload_queue
+        self.blob_store = upload_queue.blob_store
+        # (app, user, session) -> {"filename/version": status}
+        self._statuses: "OrderedDict[tuple, Dict[str, dict]]" = OrderedDict()
+
+    def _track(self, session_key: tuple, filename: str, version: int, size: int, digest: str, upload: Optional[asyncio.Task]):
+        status = {"filename": filename, "version": version, "size": size, "status": "uploaded"}
+        if upload is not None:
+            status["status"] = "pending"
+
+            def on_done(task: asyncio.Task):
+                if task.cancelled():
+                    status.update(status="failed", error="cancelled")
+                elif task.exception() is None:
+                    status["status"] = "uploaded"
+                    status.pop("error", None)
+                elif self.upload_queue.task(digest) is not None:
+                    # Queued again, the artifact is still served from memory
+                    status.update(status="retrying", error=str(task.exception()))
+                    self.upload_queue.task(digest).add_done_callback(on_done)
+                else:
+                    status.update(status="failed", error=str(task.exception()))
+
+            upload.add_done_callback(on_done)
+
+        statuses = self._statuses.setdefault(session_key, {})
+        statuses[f"{filename}/{version}"] = status
+        self._statuses.move_to_end(session_key)
+        while len(self._statuses) > MAX_TRACKED_SESSIONS:
+            self._statuses.popitem(last=False)
+
+    def upload_status(self, app_name: str, user_id: str, session_id: str) -> list[dict]:
+        """Upload status ("pending", "retrying", "uploaded" or "failed") of the artifacts saved by this process in a session."""
+        return [dict(status) for status in self._statuses.get((app_name, user_id, session_id), {}).values()]
+
+    async def save_artifact(self, *, app_name: str, user_id: str, session_id: str, filename: str, artifact: types.Part) -> int:
+        blob = artifact.inline_data
+        if blob is None or blob.data is None or len(blob.data) < MIN_DEDUP_SIZE:
+            return await self.artifact_service.save_artifact(app_name=app_name, user_id=user_id, session_id=session_id, filename=filename, artifact=artifact)
+
+        digest = hashlib.sha256(blob.data).hexdigest()
+        upload = self.upload_queue.submit(digest, blob.data, blob.mime_type)
+        if upload is not None and not self.upload_queue.background:
+            await upload
+        reference = json.dumps({"sha256": digest, "mime_type": blob.mime_type, "size": len(blob.data)}).encode("utf-8")
+        version = await self.artifact_service.save_artifact(
+            app_name=app_name,
+            user_id=user_id,
+            session_id=session_id,
+            filename=filename,
+            artifact=types.Part(inline_data=types.Blob(data=reference, mime_type=REF_MIME_TYPE)),
+        )
+        self._track((app_name, user_id, session_id), filename, version, len(blob.data), digest, upload)
+        return version
+
+    async def load_artifact(self, *, app_name: str, user_id: str, session_id: str, filename: str, version: Optional[int] = None) -> Optional[types.Part]:
+        artifact = await self.artifact_service.load_artifact(app_name=app_name, user_id=user_id, session_id=session_id, filename=filename, version=version)
+        if artifact is None or artifact.inline_data is None or artifact.inline_data.mime_type != REF_MIME_TYPE:
+            return artifact
+
+        reference = json.loads(artifact.inline_data.data)
+        data = self.upload_queue.pending_data(reference["sha256"])
+        if data is None:
+            data = await asyncio.to_thread(self.blob_store.get, reference["sha256"])
+        return types.Part(inline_data=types.Blob(data=data, mime_type=reference["mime_type"]))
+
+    async def describe_artifact(self, *, app_name: str, user_id: str, session_id: str, filename: str, version: Optional[int] = None) -> Optional[dict]:
+        """
+        Describes an artifact version (the latest by default) without downloading its blob.
+
+        Returns:
+            A dict with "version", "mime_type", "size", "sha256" (None when the
+            artifact is stored directly) and "data" (its bytes when stored directly
+            or still uploading, else None), or None if there is no such artifact.
+        """
+        if version is None:
+            versions = await self.list_versions(app_name=app_name, user_id=user_id, session_id=session_id, filename=filename)
+            if not versions:
+                return None
+            version = max(versions)
+        artifact = await self.artifact_service.load_artifact(app_name=app_name, user_id=user_id, session_id=session_id, filename=filename, version=version)
+        if artifact is None or artifact.inline_data is None:
+            return None
+
+        blob = artifact.inline_data
+        if blob.mime_type != REF_MIME_TYPE:
+            return {"version": version, "mime_type": blob.mime_type, "size": len(blob.data), "sha256": None, "data": blob.data}
+        reference = json.loads(blob.data)
+        return {
+            "version": version,
+            "mime_type": reference["mime_type"],
+            "size": reference["size"],
+            "sha256": reference["sha256"],
+            "data": self.upload_queue.pending_data(reference["sha256"]),
+        }
+
+    async def read_range(self, description: dict, start: int, end: int) -> bytes:
+        """Bytes start to end (both included) of an artifact from `describe_artifact`."""
+        if description["data"] is not None:
+            return description["data"][start:end + 1]
+        return await asyncio.to_thread(self.blob_store.read_range, description["sha256"], start, end)
+
+    async def signed_url(self, description: dict, filename: str, expires_in: int) -> Optional[str]:
+        """
+        Short-lived URL to download an artifact from `describe_artifact` straight from
+        the blob store, or None when it has to be streamed instead (artifact stored
+        directly, upload in progress, or blob store without signed URLs).
+        """
+        if description["sha256"] is None or description["data"] is not None:
+            return None
+        try:
+            return await asyncio.to_thread(self.blob_store.signed_url, description["sha256"], description["mime_type"], filename, expires_in)
+        except Exception as e:
+            print(f"Signed URL of artifact {filename} could not be created, it will be streamed: {str(e)}")
+            return None
+
+    async def list_artifact_keys(self, *, app_name: str, user_id: str, session_id: str) -> list[str]:
+        return await self.artifact_service.list_artifact_keys(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def delete_artifact(self, *, app_name: str, user_id: str, session_id: str, filename: str) -> None:
+        await self.artifact_service.delete_artifact(app_name=app_name, user_id=user_id, session_id=session_id, filename=filename)
+
+    async def list_versions(self, *, app_name: str, user_id: str, session_id: str, filename: str) -> list[int]:
+        return await self.artifact_service.list_versions(app_name=app_name, user_id=user_id, session_id=session_id, filename=filename)
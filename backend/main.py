@@ -1,17 +1,22 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Header
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 # from .models import CustomerInquiryRequest, CustomerInquiryResponse
 from google.adk.sessions import DatabaseSessionService
-from google.adk.artifacts import GcsArtifactService
+from google.adk.artifacts import GcsArtifactService, InMemoryArtifactService
 from google.adk.runners import Runner
 # from .agents.customer_agent import CustomerAgentOrchestrator
 from .root_agent.agent import root_agent
+from .artifact_store import ContentAddressedArtifactService, GcsBlobStore, LocalBlobStore, UploadQueue
+from .root_agent.sub_agents.cloud_arch_diagram_agent.arch_schema import arch_json_to_react_flow, ArchGraphError
 from google.genai import types
 import json
 import re
 import uuid
 import os
 from contextlib import asynccontextmanager
+from typing import Optional
+from urllib.parse import quote
 
 from google.adk.sessions.in_memory_session_service import InMemorySessionService
 
@@ -43,6 +48,8 @@ class ChatResponse(BaseModel):
     response: str
     session_id: str
     user_id: str
+    # Artifacts saved in the session and whether their upload is "pending", "retrying", "uploaded" or "failed"
+    artifact_uploads: list[dict] = Field(default_factory=list)
 
 class ListSessionRequest(BaseModel):
     user_id: str
@@ -51,8 +58,33 @@ class CreateSessionRequest(BaseModel):
     user_id: str
     session_id: str
 
+class ArtifactRequest(BaseModel):
+    user_id: str
+    session_id: str
+    filename: str
+    version: Optional[int] = None
+
+
+ARTIFACT_BUCKET = "helloaihackathon_2025_autoarch_backend_specific"
+
+# Identical artifacts are uploaded and stored once, see artifact_store.py.
+# LOCAL_ARTIFACT_DIR keeps the blobs on the local disk instead of GCS, for tests and local runs.
+# Artifact bytes are uploaded in the background, the upload status is returned with each chat response.
+LOCAL_ARTIFACT_DIR = os.environ.get("LOCAL_ARTIFACT_DIR")
+if LOCAL_ARTIFACT_DIR:
+    upload_queue = UploadQueue(LocalBlobStore(LOCAL_ARTIFACT_DIR))
+    artifact_service = ContentAddressedArtifactService(InMemoryArtifactService(), upload_queue)
+else:
+    upload_queue = UploadQueue(GcsBlobStore(ARTIFACT_BUCKET))
+    artifact_service = ContentAddressedArtifactService(GcsArtifactService(bucket_name=ARTIFACT_BUCKET), upload_queue)
 
-artifact_service = GcsArtifactService(bucket_name="helloaihackathon_2025_autoarch_backend_specific")
+# Seconds to wait for the uploads in progress when the application shuts down
+UPLOAD_DRAIN_TIMEOUT = 30
+
+# Lifetime of the artifact download URLs, in seconds
+SIGNED_URL_EXPIRATION = 15 * 60
+# Size of the chunks artifacts are streamed in
+STREAM_CHUNK_SIZE = 1024 * 1024
 
 
 # SQLlite DB init
@@ -77,6 +109,7 @@ async def lifespan(app: FastAPI):
     yield # This is where the application runs, handling requests
     # Shutdown code
     print("Application shutting down...")
+    await upload_queue.drain(timeout=UPLOAD_DRAIN_TIMEOUT)
     
 # FastAPI application setup
 app = FastAPI(
@@ -104,6 +137,22 @@ app.add_middleware(
 )
 
 
+def fill_terraform_code(response: str, state: dict) -> str:
+    """
+    Terraform replies (type "terraform") leave "terraform_code" empty when the code
+    was generated by the terraform_agent tools and saved in state["terraform_code"],
+    instead of the model repeating it. The saved code is put back here.
+    """
+    try:
+        data = json.loads(response)
+    except ValueError:
+        return response
+    if isinstance(data, dict) and data.get("type") == "terraform" and not data.get("terraform_code") and state.get("terraform_code"):
+        data["terraform_code"] = state["terraform_code"]
+        return json.dumps(data)
+    return response
+
+
 router = APIRouter()
 
 @router.post("/chat", response_model=ChatResponse)
@@ -206,11 +255,17 @@ async def process_question(
         # Clean up Markdown code block if it exists
         # This handles responses like: ```json\n{ ... }\n```
         cleaned_response = re.sub(r"^```(?:json)?\n|```$", "", final_response.strip(), flags=re.IGNORECASE)
+
+        if '"terraform"' in cleaned_response:
+            updated_session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+            if updated_session is not None:
+                cleaned_response = fill_terraform_code(cleaned_response, updated_session.state)
         
         result = ChatResponse(
             response=cleaned_response,
             session_id=session_id,
-            user_id=user_id
+            user_id=user_id,
+            artifact_uploads=artifact_service.upload_status(APP_NAME, user_id, session_id),
         )
         
         # Return the structured response using your Pydantic model
@@ -219,6 +274,131 @@ async def process_question(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process agent query: {e}")
 
+@router.post("/artifact_uploads")
+async def artifact_uploads(
+    request: CreateSessionRequest
+):
+    """
+    Endpoint to poll the upload status of the artifacts saved in a session
+    request: {"user_id": "user123", "session_id": "session_123"}
+    """
+    return artifact_service.upload_status(APP_NAME, request.user_id, request.session_id)
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[tuple]:
+    """
+    (start, end) of a single "bytes=start-end", "bytes=start-" or "bytes=-suffix"
+    Range header, end included. None when there is no header.
+
+    Raises:
+        HTTPException: 416 if the range is malformed or not satisfiable.
+    """
+    if not range_header:
+        return None
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+    if not match or match.group(1) == match.group(2) == "":
+        raise HTTPException(status_code=416, detail="Only single byte ranges are supported", headers={"Content-Range": f"bytes */{size}"})
+    if match.group(1) == "":
+        start, end = max(size - int(match.group(2)), 0), size - 1
+    else:
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def artifact_stream_url(user_id: str, session_id: str, filename: str, version: int) -> str:
+    return f"/api/artifacts/{quote(user_id, safe='')}/{quote(session_id, safe='')}/{quote(filename)}?version={version}"
+
+
+@router.post("/artifacts")
+async def list_artifacts(
+    request: CreateSessionRequest
+):
+    """
+    Endpoint to list the artifacts of a session with their versions
+    request: {"user_id": "user123", "session_id": "session_123"}
+    """
+    try:
+        filenames = await artifact_service.list_artifact_keys(app_name=APP_NAME, user_id=request.user_id, session_id=request.session_id)
+        artifacts = []
+        for filename in filenames:
+            versions = await artifact_service.list_versions(app_name=APP_NAME, user_id=request.user_id, session_id=request.session_id, filename=filename)
+            artifacts.append({"filename": filename, "versions": sorted(versions)})
+        return {"artifacts": artifacts}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to list the artifacts: {e}")
+
+
+@router.post("/artifact_url")
+async def artifact_url(
+    request: ArtifactRequest
+):
+    """
+    Endpoint to get a download URL for an artifact (latest version by default).
+    The URL is a short-lived signed URL to the storage when possible, so the
+    browser downloads it directly, else the streaming endpoint of this API.
+    request: {"user_id": "user123", "session_id": "session_123", "filename": "report.pdf", "version": null}
+    """
+    description = await artifact_service.describe_artifact(
+        app_name=APP_NAME, user_id=request.user_id, session_id=request.session_id, filename=request.filename, version=request.version
+    )
+    if description is None:
+        raise HTTPException(status_code=404, detail=f"Artifact {request.filename} not found")
+
+    url = await artifact_service.signed_url(description, request.filename, SIGNED_URL_EXPIRATION)
+    return {
+        "url": url or artifact_stream_url(request.user_id, request.session_id, request.filename, description["version"]),
+        "signed": url is not None,
+        "expires_in": SIGNED_URL_EXPIRATION if url else None,
+        "version": description["version"],
+        "mime_type": description["mime_type"],
+        "size": description["size"],
+    }
+
+
+@router.get("/artifacts/{user_id}/{session_id}/{filename:path}")
+async def download_artifact(
+    user_id: str,
+    session_id: str,
+    filename: str,
+    version: Optional[int] = None,
+    range_header: Optional[str] = Header(default=None, alias="Range"),
+):
+    """
+    Endpoint to download an artifact (latest version by default). It redirects
+    to a signed storage URL when possible, otherwise the artifact is streamed
+    from here, supporting single byte-range requests.
+    """
+    description = await artifact_service.describe_artifact(app_name=APP_NAME, user_id=user_id, session_id=session_id, filename=filename, version=version)
+    if description is None:
+        raise HTTPException(status_code=404, detail=f"Artifact {filename} not found")
+
+    url = await artifact_service.signed_url(description, filename, SIGNED_URL_EXPIRATION)
+    if url is not None:
+        return RedirectResponse(url, status_code=307)
+
+    size = description["size"]
+    requested = parse_range(range_header, size)
+    start, end = requested or (0, size - 1)
+
+    async def chunks():
+        position = start
+        while position <= end:
+            chunk_end = min(position + STREAM_CHUNK_SIZE - 1, end)
+            yield await artifact_service.read_range(description, position, chunk_end)
+            position = chunk_end + 1
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1 if size else 0),
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(filename)}",
+    }
+    if requested:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(chunks(), status_code=206 if requested else 200, media_type=description["mime_type"], headers=headers)
+
+
 @router.post("/list_sessions")
 async def list_sessions(
     request: ListSessionRequest
@@ -295,6 +475,12 @@ async def get_session(
             user_id=user_id,
             session_id=session_id,
         )
+        # arch_json is stored compact, the frontend expects the React Flow JSON
+        if current_session is not None and current_session.state.get("arch_json"):
+            try:
+                current_session.state["arch_json"] = arch_json_to_react_flow(current_session.state["arch_json"])
+            except ArchGraphError as e:
+                print(f"Stored arch_json of session {session_id} could not be expanded: {str(e)}")
         return current_session
     except Exception as e:
         print(f"Existing Session retrieval failed for {user_id}. Error: {str(e)}")
@@ -5,6 +5,7 @@ from google.adk.tools.agent_tool import AgentTool
 from .instructions import instructions
 
 # from .tools import saveJSONToDBSession
+from .tools import convert_diagrams_code_to_json, patch_arch_json, diagram_gcp_inventory
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -27,5 +28,5 @@ cloud_arch_diagram_agent = Agent(
     description='A helpful assistant for helping to generate cloud architecture diagram at the end.',
     instruction=instructions,
     # sub_agents=[diagrams_code_builder_agent],
-    tools=[AgentTool(diagrams_code_builder_agent)]
+    tools=[AgentTool(diagrams_code_builder_agent), convert_diagrams_code_to_json, patch_arch_json, diagram_gcp_inventory]
 )
@@ -0,0 +1,189 @@
+"""
+Incremental edits ("patches") on the stored architecture graph, so small changes
+such as "add a Redis cache" do not need the diagrams code to be regenerated.
+
+A patch is a dict with an "op" key:
+
+    {"op": "add_node", "label": "Cache", "component": "gcp.database.Memorystore", "parent": "Data"}
+    {"op": "remove_node", "node": "Cache"}
+    {"op": "update_node", "node": "Cache", "label": "Redis", "component": "onprem.inmemory.Redis"}
+    {"op": "move_node", "node": "Cache", "parent": "Backend"}          # parent null = top level
+    {"op": "add_edge", "source": "API", "target": "Cache", "label": "reads", "color": "", "style": "", "directed": true}
+    {"op": "remove_edge", "source": "API", "target": "Cache"}
+    {"op": "add_cluster", "label": "Data", "parent": null, "color": ""}
+    {"op": "remove_cluster", "cluster": "Data"}                        # children move up one level
+    {"op": "regroup", "nodes": ["API", "Worker"], "cluster": "Backend"} # cluster created if missing
+
+Nodes and clusters are referenced by id or by (case-insensitive) label.
+"""
+from typing import List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .arch_schema import ArchCluster, ArchEdge, ArchGraph, ArchNode
+
+
+class ArchPatchError(ValueError):
+    """Raised when a patch cannot be applied."""
+
+
+class _Patcher:
+    def __init__(self, graph: ArchGraph):
+        self.graph = graph.model_copy(deep=True)
+        self.changed = set()
+
+    def find(self, items: list, ref: str, kind: str):
+        for item in items:
+            if item.id == ref:
+                return item
+        matches = [item for item in items if item.label.lower() == str(ref).lower()]
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            raise ArchPatchError(f"{kind} '{ref}' is ambiguous, use one of the ids {[item.id for item in matches]}")
+        raise ArchPatchError(f"{kind} '{ref}' not found")
+
+    def node(self, ref: str) -> ArchNode:
+        return self.find(self.graph.nodes, ref, "Node")
+
+    def cluster(self, ref: Optional[str]) -> Optional[ArchCluster]:
+        return self.find(self.graph.clusters, ref, "Cluster") if ref else None
+
+    def endpoint(self, ref: str):
+        try:
+            return self.node(ref)
+        except ArchPatchError:
+            return self.find(self.graph.clusters, ref, "Node or cluster")
+
+    def next_id(self, prefix: str, items: list) -> str:
+        numbers = [int(item.id[len(prefix):]) for item in items if item.id.startswith(prefix) and item.id[len(prefix):].isdigit()]
+        return f"{prefix}{max(numbers, default=0) + 1}"
+
+    def apply(self, patch: dict):
+        op = patch.get("op")
+        handler = getattr(self, f"op_{op}", None) if isinstance(op, str) else None
+        if handler is None:
+            raise ArchPatchError(f"Unknown patch op '{op}'")
+        try:
+            handler(patch)
+        except KeyError as e:
+            raise ArchPatchError(f"Patch '{op}' is missing the field {e}") from e
+        except ValidationError as e:
+            raise ArchPatchError(f"Patch '{op}' has an invalid value: {e.errors()[0]['msg']}") from e
+
+    # --- Operations --------------------------------------------------------
+
+    def op_add_node(self, patch):
+        parent = self.cluster(patch.get("parent"))
+        node = ArchNode(
+            id=self.next_id("node_", self.graph.nodes),
+            label=patch["label"],
+            component=patch.get("component", ""),
+            parent=parent.id if parent else None,
+        )
+        self.graph.nodes.append(node)
+        self.changed.add(node.id)
+
+    def op_remove_node(self, patch):
+        node = self.node(patch["node"])
+        self.graph.nodes.remove(node)
+        self.graph.edges = [edge for edge in self.graph.edges if node.id not in (edge.source, edge.target)]
+        self.changed.add(node.id)
+
+    def op_update_node(self, patch):
+        node = self.node(patch["node"])
+        if "label" in patch:
+            node.label = patch["label"]
+        if "component" in patch:
+            node.component = patch["component"]
+        self.changed.add(node.id)
+
+    def op_move_node(self, patch):
+        node = self.node(patch["node"])
+        parent = self.cluster(patch.get("parent"))
+        node.parent = parent.id if parent else None
+        self.changed.add(node.id)
+
+    def op_add_edge(self, patch):
+        source, target = self.endpoint(patch["source"]), self.endpoint(patch["target"])
+        self.graph.edges.append(ArchEdge(
+            source=source.id,
+            target=target.id,
+            label=patch.get("label", ""),
+            color=patch.get("color", ""),
+            style=patch.get("style", ""),
+            directed=patch.get("directed", True),
+        ))
+        self.changed.update((source.id, target.id))
+
+    def op_remove_edge(self, patch):
+        source, target = self.endpoint(patch["source"]), self.endpoint(patch["target"])
+        remaining = [edge for edge in self.graph.edges if (edge.source, edge.target) != (source.id, target.id)]
+        if len(remaining) == len(self.graph.edges):
+            raise ArchPatchError(f"No edge from '{patch['source']}' to '{patch['target']}'")
+        self.graph.edges = remaining
+        self.changed.update((source.id, target.id))
+
+    def op_add_cluster(self, patch):
+        parent = self.cluster(patch.get("parent"))
+        cluster = ArchCluster(
+            id=self.next_id("cluster_", self.graph.clusters),
+            label=patch["label"],
+            parent=parent.id if parent else None,
+            color=patch.get("color", ""),
+        )
+        self.graph.clusters.append(cluster)
+        self.changed.add(cluster.id)
+        return cluster
+
+    def op_remove_cluster(self, patch):
+        cluster = self.cluster(patch["cluster"])
+        for item in self.graph.nodes + self.graph.clusters:
+            if item.parent == cluster.id:
+                item.parent = cluster.parent
+                self.changed.add(item.id)
+        self.graph.clusters.remove(cluster)
+        self.graph.edges = [edge for edge in self.graph.edges if cluster.id not in (edge.source, edge.target)]
+        self.changed.add(cluster.id)
+
+    def op_regroup(self, patch):
+        ref = patch["cluster"]
+        if any(cluster.id == ref or cluster.label.lower() == str(ref).lower() for cluster in self.graph.clusters):
+            # Raises when the label matches several clusters
+            cluster = self.cluster(ref)
+        else:
+            cluster = self.op_add_cluster({"label": ref, "parent": patch.get("parent"), "color": patch.get("color", "")})
+        for ref in patch["nodes"]:
+            node = self.node(ref)
+            node.parent = cluster.id
+            self.changed.add(node.id)
+
+
+def apply_patches(graph: ArchGraph, patches: List[dict]) -> Tuple[ArchGraph, List[str]]:
+    """
+    Applies the patches in order. Either all of them apply or none does.
+
+    Args:
+        graph: The current architecture graph (not modified).
+        patches: The list of patch dicts, see the module docstring.
+
+    Returns:
+        (the patched and validated graph, sorted ids of the nodes/clusters that changed)
+
+    Raises:
+        ArchPatchError: If a patch is invalid or the result is not a valid graph.
+    """
+    patcher = _Patcher(graph)
+    for i, patch in enumerate(patches):
+        if not isinstance(patch, dict):
+            raise ArchPatchError(f"Patch #{i + 1} must be an object with an 'op' key")
+        try:
+            patcher.apply(patch)
+        except ArchPatchError as e:
+            raise ArchPatchError(f"Patch #{i + 1}: {str(e)}") from e
+
+    try:
+        patched = ArchGraph(**patcher.graph.model_dump())
+    except ValidationError as e:
+        raise ArchPatchError(f"The patched graph is invalid: {e.errors()[0]['msg']}") from e
+    return patched, sorted(patcher.changed)
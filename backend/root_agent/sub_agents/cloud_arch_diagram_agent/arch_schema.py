@@ -0,0 +1,221 @@
+"""
+Typed model of the architecture diagram graph stored in state["arch_json"].
+
+The state keeps a compact encoding of the graph (see `encode_arch_graph`):
+strings such as component names and colors are stored once in a table, nodes
+and clusters are referenced by their integer index, and positions are not
+stored at all since the layout engine recomputes them in milliseconds. The
+React Flow JSON for the frontend is produced from it on demand.
+"""
+from collections import Counter
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, ValidationError, model_validator
+
+from .diagrams_converter import to_react_flow
+
+ENCODING_VERSION = 1
+
+
+class ArchGraphError(ValueError):
+    """Raised when an architecture JSON is not a valid graph."""
+
+
+class ArchNode(BaseModel):
+    id: str
+    label: str
+    component: str = ""
+    parent: Optional[str] = None
+
+
+class ArchCluster(BaseModel):
+    id: str
+    label: str
+    parent: Optional[str] = None
+    color: str = ""
+
+
+class ArchEdge(BaseModel):
+    source: str
+    target: str
+    label: str = ""
+    color: str = ""
+    style: str = ""
+    directed: bool = True
+
+
+class ArchGraph(BaseModel):
+    nodes: List[ArchNode] = Field(default_factory=list)
+    clusters: List[ArchCluster] = Field(default_factory=list)
+    edges: List[ArchEdge] = Field(default_factory=list)
+    direction: str = "LR"
+
+    @model_validator(mode="after")
+    def check_references(self):
+        ids = [item.id for item in self.clusters] + [item.id for item in self.nodes]
+        duplicates = sorted(item_id for item_id, count in Counter(ids).items() if count > 1)
+        if duplicates:
+            raise ValueError(f"Duplicate node ids: {duplicates}")
+
+        cluster_parent = {cluster.id: cluster.parent for cluster in self.clusters}
+        for item in self.clusters + self.nodes:
+            if item.parent is not None and item.parent not in cluster_parent:
+                raise ValueError(f"'{item.id}' has parent '{item.parent}' which is not a group node")
+
+        for cluster_id in cluster_parent:
+            seen = {cluster_id}
+            ancestor = cluster_parent[cluster_id]
+            while ancestor is not None:
+                if ancestor in seen:
+                    raise ValueError(f"Group '{cluster_id}' is nested inside itself")
+                seen.add(ancestor)
+                ancestor = cluster_parent[ancestor]
+
+        known = set(ids)
+        for edge in self.edges:
+            for end in (edge.source, edge.target):
+                if end not in known:
+                    raise ValueError(f"Edge {edge.source} -> {edge.target} refers to unknown node '{end}'")
+        return self
+
+
+def graph_from_react_flow(flow: dict, direction: str = "LR") -> ArchGraph:
+    """
+    Builds and validates the graph from a React Flow JSON (nodes/edges).
+
+    Raises:
+        ArchGraphError: If the JSON is malformed or the graph is inconsistent.
+    """
+    if not isinstance(flow, dict) or not isinstance(flow.get("nodes"), list):
+        raise ArchGraphError("The architecture JSON must be an object with a 'nodes' list and an 'edges' list.")
+    flow_edges = flow.get("edges") or []
+    # Edges written by hand rarely carry markers, treat them as directed unless some edges do
+    has_markers = any(isinstance(edge, dict) and "markerEnd" in edge for edge in flow_edges)
+
+    try:
+        nodes, clusters, edges = [], [], []
+        for node in flow["nodes"]:
+            data = node.get("data") or {}
+            style = node.get("style") or {}
+            parent = node.get("parentNode") or node.get("parentId")
+            if node.get("type") == "group":
+                clusters.append(ArchCluster(id=str(node["id"]), label=str(data.get("label", "")), parent=parent, color=str(style.get("backgroundColor", ""))))
+            else:
+                nodes.append(ArchNode(id=str(node["id"]), label=str(data.get("label", "")), component=str(data.get("component", "")), parent=parent))
+        for edge in flow_edges:
+            style = edge.get("style") or {}
+            edges.append(ArchEdge(
+                source=str(edge["source"]),
+                target=str(edge["target"]),
+                label=str(edge.get("label") or ""),
+                color=str(style.get("stroke", "")),
+                style="dashed" if edge.get("animated") else "",
+                directed="markerEnd" in edge if has_markers else True,
+            ))
+        return ArchGraph(nodes=nodes, clusters=clusters, edges=edges, direction=direction)
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ArchGraphError(f"Malformed architecture JSON, missing or invalid field: {e}") from e
+    except ValidationError as e:
+        raise ArchGraphError(f"Invalid architecture graph: {e.errors()[0]['msg']}") from e
+
+
+def encode_arch_graph(graph: ArchGraph) -> dict:
+    """
+    Encodes the graph in the compact form kept in state:
+
+        {"v": 1, "dir": "LR", "t": [strings...],
+         "c": [[label, parent, color], ...],
+         "n": [[label, component, parent], ...],
+         "e": [[source, target, label, color, style, directed], ...]}
+
+    `parent` is a cluster index (-1 for none), `source`/`target` are node indexes
+    (clusters continue after the nodes) and component/color/style are indexes in
+    the string table "t" (-1 for empty).
+    """
+    table, table_index = [], {}
+
+    def ref(value: str) -> int:
+        if not value:
+            return -1
+        if value not in table_index:
+            table_index[value] = len(table)
+            table.append(value)
+        return table_index[value]
+
+    cluster_index = {cluster.id: i for i, cluster in enumerate(graph.clusters)}
+    item_index = {node.id: i for i, node in enumerate(graph.nodes)}
+    item_index.update({cluster.id: len(graph.nodes) + i for i, cluster in enumerate(graph.clusters)})
+
+    def parent_ref(parent: Optional[str]) -> int:
+        return cluster_index[parent] if parent is not None else -1
+
+    return {
+        "v": ENCODING_VERSION,
+        "dir": graph.direction,
+        "c": [[cluster.label, parent_ref(cluster.parent), ref(cluster.color)] for cluster in graph.clusters],
+        "n": [[node.label, ref(node.component), parent_ref(node.parent)] for node in graph.nodes],
+        "e": [
+            [item_index[edge.source], item_index[edge.target], edge.label, ref(edge.color), ref(edge.style), int(edge.directed)]
+            for edge in graph.edges
+        ],
+        "t": table,
+    }
+
+
+def decode_arch_graph(data: dict) -> ArchGraph:
+    """
+    Decodes the compact form from `encode_arch_graph`. Ids are regenerated as
+    "node_<n>" and "cluster_<n>".
+
+    Raises:
+        ArchGraphError: If the stored data is malformed.
+    """
+    try:
+        table = data.get("t", [])
+
+        def text(index: int) -> str:
+            return table[index] if index >= 0 else ""
+
+        cluster_ids = [f"cluster_{i + 1}" for i in range(len(data.get("c", [])))]
+        node_ids = [f"node_{i + 1}" for i in range(len(data.get("n", [])))]
+        item_ids = node_ids + cluster_ids
+
+        def parent_id(index: int) -> Optional[str]:
+            return cluster_ids[index] if index >= 0 else None
+
+        return ArchGraph(
+            direction=data.get("dir", "LR"),
+            clusters=[ArchCluster(id=cluster_ids[i], label=label, parent=parent_id(parent), color=text(color)) for i, (label, parent, color) in enumerate(data.get("c", []))],
+            nodes=[ArchNode(id=node_ids[i], label=label, component=text(component), parent=parent_id(parent)) for i, (label, component, parent) in enumerate(data.get("n", []))],
+            edges=[
+                ArchEdge(source=item_ids[source], target=item_ids[target], label=label, color=text(color), style=text(style), directed=bool(directed))
+                for source, target, label, color, style, directed in data.get("e", [])
+            ],
+        )
+    except ValidationError as e:
+        raise ArchGraphError(f"Invalid architecture graph: {e.errors()[0]['msg']}") from e
+    except (KeyError, TypeError, IndexError, ValueError, AttributeError) as e:
+        raise ArchGraphError(f"Malformed stored architecture graph: {e}") from e
+
+
+def load_arch_graph(value: Optional[dict]) -> Optional[ArchGraph]:
+    """
+    Reads state["arch_json"], either the compact form or a React Flow JSON saved
+    by older sessions. Returns None when nothing is stored.
+    """
+    if not value:
+        return None
+    if "v" in value:
+        return decode_arch_graph(value)
+    return graph_from_react_flow(value)
+
+
+def arch_graph_to_react_flow(graph: ArchGraph) -> dict:
+    """Emits the React Flow JSON (with computed layout) for the frontend."""
+    return to_react_flow(graph.model_dump(), graph.direction)
+
+
+def arch_json_to_react_flow(value: Optional[dict]) -> Optional[dict]:
+    """Expands state["arch_json"] to the React Flow JSON, or None when nothing is stored."""
+    graph = load_arch_graph(value)
+    return arch_graph_to_react_flow(graph) if graph is not None else None
@@ -4,61 +4,11 @@ instructions="""
     If you encounter any error, delegate back to parent agent and tell what is the error.
     Typical flow will be:
     1. First use diagrams_code_builder_agent to generate the code. You should always send the whole information to this agent to generate.
-    2. Understand the code provided by the sub agent and generate equivalent JSON format with nodes and edges keyfield, below is just the reference, you should be smart enough to identify from the  diagrams code what should be nodes and what should be edges. The JSON is to be used for React Flow in the frontend:
-        Example:
-     {
-       "nodes": [
-         {
-           "id": "1",
-           "type": "default",
-           "position": { "x": 100, "y": 100 },
-           "data": {
-             "label": "My Server",
-             "shape": "rectangle"
-          }
-        },
-        {
-          "id": "2",
-          "type": "custom",
-          "position": { "x": 400, "y": 200 },
-          "data": {
-            "label": "My Database",
-            "shape": "cylinder"
-          },
-          "parentNode": "cluster_gcp", // For grouping, if you intend to group this node under node type group
-          "extent": 'parent' // If you have parentNode, this is a must
-        },
-        {
-            "id": "cluster_gcp",
-            "type": "group",
-            "data": {
-                "label": "Google Cloud Platform/Parent Container"
-            },
-            "position": { // Your position should think carefully in order to visually show that it group the nodes you want
-                "x": 0,
-                "y": 0
-            },
-            "style": {
-                width: 400, // Base on how many children node inside this group, you should provide reasonable width with buffer so that visually child nodes are enough to be in the group. I would suggest to be 185 * number of child nodes, but please be aware also in some case there is nested group (A group node that contain another group node)
-                height: 250, // Base on how many children node inside this group, you should provide reasonable height with buffer so that visually child nodes are enough to be in the group. I would suggest to be 185 * number of child nodes, but please be aware also in some case there is nested group (A group node that contain another group node)
-                backgroundColor: 'rgba(208, 208, 208, 0.2)', // Example styling, you need to figure out carefully based on how many nodes you want to group
-            },
-            "zIndex": -1 // So that it always behind
-        }
-      ],
-      "edges": [
-        {
-          "id": "e1-2",
-          "source": "1",
-          "target": "2",
-          "label": "connects to",
-          "animated": true
-        }
-      ]
-    }
+    2. Call the convert_diagrams_code_to_json tool with the code provided by the sub agent. It converts the code into the JSON format with nodes and edges keyfield (including group nodes for clusters, positions and sizes) used by React Flow in the frontend, and saves it. Do not write or modify this JSON yourself, use the json_output returned by the tool as it is.
+    If the tool returns an error, send the error to diagrams_code_builder_agent to fix the code and call the tool again.
     3. When you response back to user, your output must strictly be plain JSON output format as below based on two scenario (Must follow the structure everytime as the frontend is looking at specific structure.):
 
-Scenario A: If you already complete generated arch diagram and ready to response back to user, follow the plain JSON format:{"type": "arch_diagram","response": "Your response response to the user such as diagram created.", "json_output": "The json created"}
+Scenario A: If you already complete generated arch diagram and ready to response back to user, follow the plain JSON format:{"type": "arch_diagram","response": "Your response response to the user such as diagram created.", "json_output": "The json_output returned by convert_diagrams_code_to_json"}
 
 Scenario B: If you want to ask for more information or any kind of context except for scenario B, follow the plain JSON format:{"type": "general","response": "Your text or question."}
 
@@ -68,6 +18,11 @@ Scenario B: If you want to ask for more information or any kind of context excep
     Sub Agents:
     1. diagrams_code_builder_agent: This agent will help you build the full python code. You should always rely on this agent if you want to create the code or modify the code.
 
+    Tools:
+    1. convert_diagrams_code_to_json: Converts the python code into the React Flow JSON and saves it to the session.
+    2. patch_arch_json: For small changes to the diagram already created in this session (add/remove/rename a component, connect or disconnect components, move components into another group), use this tool with the list of patches instead of asking diagrams_code_builder_agent to regenerate the code. Then respond with scenario A using the json_output returned by the tool. Only regenerate the code for a redesign.
+    3. diagram_gcp_inventory: When the user asks for the diagram of their existing GCP project (the resources listed by gcp_agent in this session), use this tool directly instead of describing the resources to diagrams_code_builder_agent. Then respond with scenario A using the json_output returned by the tool.
+
 
     ***Important Notes:
     1. Before you send context to the diagrams_code_builder_agent, make sure your understand correctly. You should understand the request and form the context in correct and clear way. 
@@ -0,0 +1,284 @@
+"""
+Layered (hierarchical) layout for the architecture graph.
+
+Every cluster is laid out on its own, bottom-up, and then treated as a single
+block inside its parent. Edges between nodes of different clusters are lifted
+to the blocks that contain them at the common level. Inside a container the
+layout is a light Sugiyama: cycle removal, longest-path layering, barycenter
+ordering and packing of the layers.
+"""
+from typing import Dict, List, Optional, Tuple
+
+# React Flow default node box
+NODE_WIDTH = 150
+NODE_HEIGHT = 50
+# Space between two layers (along the flow) and between two items of a layer
+LAYER_GAP = 80
+ITEM_GAP = 40
+CLUSTER_PADDING = 30
+CLUSTER_HEADER = 30
+ORDERING_SWEEPS = 4
+
+
+def _remove_cycles(items: List[str], edges: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Reverses the back edges found by a depth-first search so the graph is acyclic."""
+    successors = {item: [] for item in items}
+    for source, target in edges:
+        successors[source].append(target)
+
+    state = {}  # 1 = on the DFS stack, 2 = done
+    back_edges = set()
+    for root in items:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            item, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                state[item] = 2
+                stack.pop()
+            elif child not in state:
+                state[child] = 1
+                stack.append((child, iter(successors[child])))
+            elif state[child] == 1:
+                back_edges.add((item, child))
+
+    return [(target, source) if (source, target) in back_edges else (source, target) for source, target in edges]
+
+
+def _break_parent_cycles(parent_of: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    """
+    Moves one cluster of every parent cycle (A -> B -> A), the first listed, to
+    the top level, so each item has a finite chain of ancestors. Returns a copy.
+    """
+    parents = dict(parent_of)
+    order = {item: i for i, item in enumerate(parents)}
+    done = set()
+    for start in parents:
+        chain, in_chain, current = [], {}, start
+        while current is not None and current not in done:
+            if current in in_chain:
+                parents[min(chain[in_chain[current]:], key=order.get)] = None
+                break
+            in_chain[current] = len(chain)
+            chain.append(current)
+            current = parents.get(current)
+        done.update(chain)
+    return parents
+
+
+def _assign_layers(items: List[str], edges: List[Tuple[str, str]]) -> Dict[str, int]:
+    """Longest-path layering: every item goes one layer after its furthest predecessor."""
+    successors = {item: [] for item in items}
+    in_degree = {item: 0 for item in items}
+    for source, target in edges:
+        successors[source].append(target)
+        in_degree[target] += 1
+
+    layer = {item: 0 for item in items}
+    queue = [item for item in items if in_degree[item] == 0]
+    for item in queue:
+        for child in successors[item]:
+            layer[child] = max(layer[child], layer[item] + 1)
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                queue.append(child)
+    return layer
+
+
+def _order_layers(layers: List[List[str]], edges: List[Tuple[str, str]]) -> List[List[str]]:
+    """Barycenter heuristic, sweeping down then up, to reduce edge crossings."""
+    predecessors, successors = {}, {}
+    for source, target in edges:
+        successors.setdefault(source, []).append(target)
+        predecessors.setdefault(target, []).append(source)
+
+    index = {item: i for layer in layers for i, item in enumerate(layer)}
+
+    def sweep(layer, neighbours):
+        def barycenter(item):
+            linked = [index[other] for other in neighbours.get(item, []) if other in index]
+            return sum(linked) / len(linked) if linked else index[item]
+        layer.sort(key=barycenter)
+        for i, item in enumerate(layer):
+            index[item] = i
+
+    for _ in range(ORDERING_SWEEPS):
+        for layer in layers[1:]:
+            sweep(layer, predecessors)
+        for layer in reversed(layers[:-1]):
+            sweep(layer, successors)
+    return layers
+
+
+def _layout_container(items: List[str], edges: List[Tuple[str, str]], sizes: Dict[str, Dict[str, int]], horizontal: bool) -> Tuple[Dict[str, Dict[str, float]], float, float]:
+    """
+    Lays out the direct children of one container.
+
+    Returns:
+        (positions relative to the container content origin, content width, content height)
+    """
+    order = {item: i for i, item in enumerate(items)}
+    edges = [(source, target) for source, target in set(edges) if source != target]
+    edges = _remove_cycles(items, sorted(edges, key=lambda edge: (order[edge[0]], order[edge[1]])))
+    layer_of = _assign_layers(items, edges)
+
+    layers = [[] for _ in range(max(layer_of.values(), default=0) + 1)]
+    for item in items:
+        layers[layer_of[item]].append(item)
+    layers = _order_layers([layer for layer in layers if layer], edges)
+
+    # "main" runs along the flow (x for LR), "cross" runs across the layers
+    def main_size(item):
+        return sizes[item]["width"] if horizontal else sizes[item]["height"]
+
+    def cross_size(item):
+        return sizes[item]["height"] if horizontal else sizes[item]["width"]
+
+    layer_main = [max(main_size(item) for item in layer) for layer in layers]
+    layer_cross = [sum(cross_size(item) for item in layer) + ITEM_GAP * (len(layer) - 1) for layer in layers]
+    total_main = sum(layer_main) + LAYER_GAP * (len(layers) - 1)
+    total_cross = max(layer_cross, default=0)
+
+    positions = {}
+    main_offset = 0
+    for layer, thickness, length in zip(layers, layer_main, layer_cross):
+        cross_offset = (total_cross - length) / 2
+        for item in layer:
+            main = main_offset + (thickness - main_size(item)) / 2
+            positions[item] = {"x": main, "y": cross_offset} if horizontal else {"x": cross_offset, "y": main}
+            cross_offset += cross_size(item) + ITEM_GAP
+        main_offset += thickness + LAYER_GAP
+
+    if horizontal:
+        return positions, total_main, total_cross
+    return positions, total_cross, total_main
+
+
+def layout_graph(graph: dict, direction: str = "LR") -> Tuple[Dict[str, Dict[str, float]], Dict[str, Dict[str, int]]]:
+    """
+    Computes positions for every node and cluster, and the size of every cluster.
+
+    Args:
+        graph: A dict with "nodes" and "clusters" (each item with "id" and
+            "parent", the id of the enclosing cluster or None) and "edges"
+            (each with "source" and "target" node ids).
+        direction: "LR" (left to right, the diagrams default) or "TB" (top to bottom).
+
+    Returns:
+        (positions, sizes). Positions are relative to the parent cluster, as React
+        Flow expects for nodes with a `parentNode`. Sizes are keyed by cluster id.
+    """
+    horizontal = direction.upper() in ("LR", "RL")
+    cluster_ids = {cluster["id"] for cluster in graph["clusters"]}
+    parent_of: Dict[str, Optional[str]] = {}
+    for item in graph["clusters"] + graph["nodes"]:
+        parent_of[item["id"]] = item.get("parent") if item.get("parent") in cluster_ids else None
+
+    # A cluster nested in itself (through its ancestors) is moved to the top level
+    parent_of = _break_parent_cycles(parent_of)
+
+    children: Dict[Optional[str], List[str]] = {None: [], **{cluster_id: [] for cluster_id in cluster_ids}}
+    for item in graph["clusters"] + graph["nodes"]:
+        children[parent_of[item["id"]]].append(item["id"])
+
+    paths = {}
+
+    def path(item):
+        # Chain of containers from the root down to the item itself, built
+        # iteratively since client JSON may nest groups deeply
+        chain, current = [], item
+        while current is not None and current not in paths:
+            chain.append(current)
+            current = parent_of[current]
+        prefix = paths[current] if current is not None else [None]
+        for ancestor in reversed(chain):
+            prefix = paths[ancestor] = prefix + [ancestor]
+        return paths[item]
+
+    # Lift every edge to the two blocks it connects inside their closest common container
+    container_edges: Dict[Optional[str], List[Tuple[str, str]]] = {}
+    for edge in graph["edges"]:
+        if edge["source"] not in parent_of or edge["target"] not in parent_of:
+            continue
+        source_path, target_path = path(edge["source"]), path(edge["target"])
+        depth = 0
+        while depth < min(len(source_path), len(target_path)) and source_path[depth] == target_path[depth]:
+            depth += 1
+        if depth >= min(len(source_path), len(target_path)):
+            continue
+        container_edges.setdefault(source_path[depth - 1], []).append((source_path[depth], target_path[depth]))
+
+    sizes = {item["id"]: {"width": NODE_WIDTH, "height": NODE_HEIGHT} for item in graph["nodes"]}
+    positions = {}
+
+    # Deepest clusters first, so every cluster size is known before its parent is laid out
+    containers = sorted((cluster["id"] for cluster in graph["clusters"]), key=lambda cluster_id: -len(path(cluster_id)))
+    for container in containers + [None]:
+        items = children[container]
+        if not items:
+            sizes[container] = {"width": 2 * CLUSTER_PADDING + NODE_WIDTH, "height": 2 * CLUSTER_PADDING + CLUSTER_HEADER}
+            continue
+        local, width, height = _layout_container(items, container_edges.get(container, []), sizes, horizontal)
+        offset_x, offset_y = (CLUSTER_PADDING, CLUSTER_PADDING + CLUSTER_HEADER) if container is not None else (0, 0)
+        for item, position in local.items():
+            positions[item] = {"x": round(position["x"] + offset_x), "y": round(position["y"] + offset_y)}
+        if container is not None:
+            sizes[container] = {"width": round(width + 2 * CLUSTER_PADDING), "height": round(height + 2 * CLUSTER_PADDING + CLUSTER_HEADER)}
+
+    return positions, {cluster["id"]: sizes[cluster["id"]] for cluster in graph["clusters"]}
+
+
+def layout_react_flow(flow: dict, direction: str = "LR") -> dict:
+    """
+    Recomputes `position` of every node and `style.width/height` of every group
+    node of a React Flow JSON, keeping everything else as is. Group nodes are
+    moved ahead of their children, as React Flow requires.
+
+    Args:
+        flow: The React Flow JSON with "nodes" and "edges".
+        direction: "LR" or "TB".
+
+    Returns:
+        A new React Flow JSON with the computed layout.
+    """
+    flow_nodes = flow.get("nodes", [])
+    node_ids = {node["id"] for node in flow_nodes}
+    declared = {}
+    for node in flow_nodes:
+        parent = node.get("parentNode") or node.get("parentId")
+        declared[node["id"]] = parent if parent in node_ids else None
+    # Client JSON may nest groups in a cycle, one group of it is moved to the top level
+    parent_of = _break_parent_cycles(declared)
+
+    graph = {"nodes": [], "clusters": [], "edges": flow.get("edges", [])}
+    for node in flow_nodes:
+        item = {"id": node["id"], "parent": parent_of[node["id"]]}
+        graph["clusters" if node.get("type") == "group" else "nodes"].append(item)
+
+    positions, sizes = layout_graph(graph, direction)
+
+    def group_depth(node):
+        level, parent = 0, parent_of[node["id"]]
+        while parent is not None:
+            level, parent = level + 1, parent_of[parent]
+        return level
+
+    groups = sorted((node for node in flow_nodes if node.get("type") == "group"), key=group_depth)
+    others = [node for node in flow_nodes if node.get("type") != "group"]
+
+    nodes = []
+    for node in groups + others:
+        node = dict(node, position=positions[node["id"]])
+        if node["id"] in sizes:
+            node["style"] = dict(node.get("style") or {}, **sizes[node["id"]])
+        if declared[node["id"]] is not None and parent_of[node["id"]] is None:
+            # The group cut from a cycle is top level in the emitted JSON too
+            node.pop("parentNode", None)
+            node.pop("parentId", None)
+            if node.get("extent") == "parent":
+                del node["extent"]
+        nodes.append(node)
+    return dict(flow, nodes=nodes)
@@ -2,10 +2,23 @@ from google.adk.tools import ToolContext
 import google.genai.types as types
 import ast
 import os
+import re
 import base64
+import html
+import mimetypes
 import traceback
 import subprocess
 import sys
+import tempfile
+from typing import Optional
+
+from pydantic import ValidationError
+
+from .diagrams_converter import parse_diagrams_code, DiagramsCodeError
+from .arch_schema import ArchGraph, ArchGraphError, graph_from_react_flow, encode_arch_graph, decode_arch_graph, load_arch_graph, arch_graph_to_react_flow
+from .arch_patch import apply_patches, ArchPatchError
+from ..gcp_agent.tools import load_inventory_index
+from ..gcp_agent.inventory_diagram import inventory_to_graph
 
 # async def save_image_to_artifact(base64_string: str, tool_context: ToolContext) -> str:
 #     """
@@ -69,60 +82,163 @@ import sys
     
 #     return "Failed: No image artifact found in the tool context."
 
-async def execute_python_code(code_string: str, tool_context: ToolContext) -> str:
+# Diagrams always writes "<filename>.<format>", so the rendered files are
+# looked up with this base name inside the temporary working directory.
+DIAGRAM_BASENAME = "diagram"
+
+SUPPORTED_OUTPUT_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+# Prepended to the generated code so the output format, DPI and filename are
+# controlled by the tool instead of whatever the generated code asked for.
+RENDER_PRELUDE = '''
+import inspect as _inspect
+import diagrams as _diagrams
+
+_diagram_init = _diagrams.Diagram.__init__
+
+def _render_init(self, *args, **kwargs):
+    bound = _inspect.signature(_diagram_init).bind(self, *args, **kwargs)
+    bound.arguments["filename"] = {basename!r}
+    bound.arguments["outformat"] = {formats!r}
+    bound.arguments["show"] = False
+    graph_attr = dict(bound.arguments.get("graph_attr") or {{}})
+    graph_attr["dpi"] = {dpi!r}
+    bound.arguments["graph_attr"] = graph_attr
+    _diagram_init(*bound.args, **bound.kwargs)
+
+_diagrams.Diagram.__init__ = _render_init
+'''
+
+
+# Node icons in the SVG written by graphviz, e.g. <image xlink:href="/.../resources/gcp/compute/gce.png" .../>
+SVG_IMAGE_HREF = re.compile(rb'(<image\b[^>]*?\b(?:xlink:)?href=")([^"]+)(")')
+
+
+def inline_svg_images(svg: bytes, base_dir: str) -> bytes:
     """
-    Executes Python code, reads the generated image, and saves it to an artifact.
-    
+    Replaces the file paths of the node icons in an SVG by data URIs, so the SVG
+    still shows them once it leaves this machine, e.g. embedded in the PDF report
+    as a data URI or downloaded from the chat.
+
+    Args:
+        svg: The SVG bytes.
+        base_dir: The directory relative paths are resolved from.
+
     Returns:
-        A string indicating success or failure.
+        The SVG bytes, with every readable icon inlined.
     """
-    image_filename = "diagram.png"
-    
-    # Get the path to the current Python interpreter from the virtual environment
-    python_executable = sys.executable
+    def inline(match):
+        href = html.unescape(match.group(2).decode())
+        if href.startswith(("data:", "http:", "https:")):
+            return match.group(0)
+        path = os.path.join(base_dir, href.removeprefix("file://"))
+        if not os.path.isfile(path):
+            return match.group(0)
+        mime_type = mimetypes.guess_type(path)[0] or "image/png"
+        with open(path, "rb") as f:
+            data = base64.b64encode(f.read())
+        return match.group(1) + f"data:{mime_type};base64,".encode() + data + match.group(3)
 
-    try:
+    return SVG_IMAGE_HREF.sub(inline, svg)
+
+
+def render_diagram(code_string: str, output_formats: list, dpi: int) -> dict:
+    """
+    Runs the diagrams code in a separate interpreter inside a temporary directory
+    and collects the rendered files.
+
+    Args:
+        code_string: The Python code using the diagrams library.
+        output_formats: The formats to render, any of "png" and "svg".
+        dpi: The resolution used for raster output.
+
+    Returns:
+        A dict mapping each output format to the rendered bytes, the SVG with its
+        icons inlined.
+
+    Raises:
+        SyntaxError: If the code does not parse, checked before any process is spawned.
+    """
+    ast.parse(code_string)
+
+    prelude = RENDER_PRELUDE.format(basename=DIAGRAM_BASENAME, formats=list(output_formats), dpi=str(dpi))
+
+    with tempfile.TemporaryDirectory() as work_dir:
         # Run the Python code using the same interpreter as the agent
         subprocess.run(
-            [python_executable, "-c", code_string],
+            [sys.executable, "-c", prelude + code_string],
             capture_output=True,
             text=True,
             check=True,
-            timeout=60
+            timeout=60,
+            cwd=work_dir
         )
-        
-        with open(image_filename, "rb") as f:
-            image_bytes = f.read()
-            
-        image_artifact = types.Part(
-            inline_data=types.Blob(
-                data=image_bytes,
-                mime_type="image/png"
+
+        rendered = {}
+        for output_format in output_formats:
+            with open(os.path.join(work_dir, f"{DIAGRAM_BASENAME}.{output_format}"), "rb") as f:
+                rendered[output_format] = f.read()
+        if "svg" in rendered:
+            rendered["svg"] = inline_svg_images(rendered["svg"], work_dir)
+        return rendered
+
+
+async def execute_python_code(code_string: str, tool_context: ToolContext, output_formats: Optional[list[str]] = None, dpi: int = 96) -> str:
+    """
+    Executes Python code, reads the generated image(s), and saves them to artifacts.
+
+    Args:
+        code_string: The Python code to be executed.
+        output_formats: The image formats to produce, "png" and/or "svg". Defaults to ["png"]. SVG is much smaller and stays sharp when embedded in documents.
+        dpi: The resolution of the PNG output. Defaults to 96.
+
+    Returns:
+        A string indicating success or failure.
+    """
+    output_formats = [output_format.lower().lstrip(".") for output_format in (output_formats or ["png"])]
+    unsupported = [output_format for output_format in output_formats if output_format not in SUPPORTED_OUTPUT_FORMATS]
+    if unsupported:
+        return f"Error: Unsupported output format(s) {unsupported}. Use any of {list(SUPPORTED_OUTPUT_FORMATS)}."
+
+    try:
+        rendered = render_diagram(code_string, output_formats, dpi)
+
+        unique_id = os.urandom(4).hex()
+        saved = []
+        for output_format, image_bytes in rendered.items():
+            image_artifact = types.Part(
+                inline_data=types.Blob(
+                    data=image_bytes,
+                    mime_type=SUPPORTED_OUTPUT_FORMATS[output_format]
+                )
             )
-        )
-        output_filename = f"received_file_{os.urandom(4).hex()}.png"
-        version = await tool_context.save_artifact(
-            filename=output_filename,
-            artifact=image_artifact
-        )
-        
-        return f"Success - Image saved to artifact with version {version}. Filename: {output_filename}"
-    
+            output_filename = f"received_file_{unique_id}.{output_format}"
+            version = await tool_context.save_artifact(
+                filename=output_filename,
+                artifact=image_artifact
+            )
+            saved.append(f"{output_filename} (version {version})")
+
+        return f"Success - Image saved to artifact. Filename: {', '.join(saved)}"
+
+    except SyntaxError as e:
+        return f"Python code has a syntax error at line {e.lineno}: {e.msg}"
     except subprocess.CalledProcessError as e:
         return f"Python code execution failed with error: {e.stderr}"
-    except FileNotFoundError:
-        return f"Error: Code executed but the file '{image_filename}' was not found."
+    except FileNotFoundError as e:
+        return f"Error: Code executed but the file '{os.path.basename(e.filename or DIAGRAM_BASENAME)}' was not found."
     except Exception as e:
         error_details = traceback.format_exc()
         return f"An unexpected error occurred: {str(e)}\n{error_details}"
-    finally:
-        # Clean up the generated image file to avoid clutter.
-        if os.path.exists(image_filename):
-            os.remove(image_filename)
 
 async def saveJSONToDBSession(json_of_architecture: dict, tool_context: ToolContext) -> str:
     """
-    Save JSON to a state with key "arch_json".
+    Save JSON to a state with key "arch_json". The graph is validated and stored in
+    the compact form from arch_schema. Node positions and group sizes are
+    recomputed by the layout engine, so they do not need to be accurate.
     
     Args:
         json_of_architecture: the plain JSON format with nodes and edges key for the architecture diagram
@@ -131,10 +247,113 @@ async def saveJSONToDBSession(json_of_architecture: dict, tool_context: ToolCont
         A string indicating success or failure.
     """
     try:
-        tool_context.state["arch_json"] = json_of_architecture
+        graph = graph_from_react_flow(json_of_architecture)
+        tool_context.state["arch_json"] = encode_arch_graph(graph)
         return (f"Successfully saved the architecture JSON with nodes "
                 f"and edges to the session state. "
                 f"I should now confirm this with the user.")
 
+    except ArchGraphError as e:
+        return f"Error: The architecture JSON is invalid, fix it and save again. {str(e)}"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+async def convert_diagrams_code_to_json(code_string: str, tool_context: ToolContext) -> dict:
+    """
+    Converts the python code from diagrams_code_builder_agent into the React Flow
+    JSON (nodes and edges, with groups for clusters) and saves it to the state
+    with key "arch_json". The code is parsed, not executed.
+
+    Args:
+        code_string: The full python code that uses the diagrams library.
+
+    Returns:
+        A dict with the status and the React Flow JSON under "json_output".
+    """
+    try:
+        graph = ArchGraph(**parse_diagrams_code(code_string))
+        tool_context.state["arch_json"] = encode_arch_graph(graph)
+        return {"status": "success", "json_output": arch_graph_to_react_flow(graph)}
+    except (DiagramsCodeError, ValidationError) as e:
+        return {"status": "failed", "error": str(e)}
+    except Exception as e:
+        return {"status": "failed", "error": f"An unexpected error occurred: {str(e)}"}
+
+
+
+async def patch_arch_json(patches: list[dict], tool_context: ToolContext) -> dict:
+    """
+    Applies small edits to the architecture diagram saved in the state with key
+    "arch_json", without regenerating the diagrams code. Either all patches apply
+    or none does. Nodes and clusters can be referenced by id or by label.
+
+    Args:
+        patches: The list of edits, each a dict with an "op" key:
+            {"op": "add_node", "label": "Cache", "component": "gcp.database.Memorystore", "parent": "Data"}
+            {"op": "remove_node", "node": "Cache"}
+            {"op": "update_node", "node": "Cache", "label": "Redis", "component": "onprem.inmemory.Redis"}
+            {"op": "move_node", "node": "Cache", "parent": "Backend"} (parent null for top level)
+            {"op": "add_edge", "source": "API", "target": "Cache", "label": "reads"}
+            {"op": "remove_edge", "source": "API", "target": "Cache"}
+            {"op": "add_cluster", "label": "Data", "parent": null}
+            {"op": "remove_cluster", "cluster": "Data"}
+            {"op": "regroup", "nodes": ["API", "Worker"], "cluster": "Backend"}
+
+    Returns:
+        A dict with the status, the updated React Flow JSON under "json_output" and
+        the current ids of the changed nodes and clusters under "changed" (removed
+        ones are not listed).
+    """
+    try:
+        graph = load_arch_graph(tool_context.state.get("arch_json"))
+        if graph is None:
+            return {"status": "failed", "error": "No architecture diagram saved yet, create one first."}
+
+        patched, changed = apply_patches(graph, patches)
+        stored = encode_arch_graph(patched)
+        tool_context.state["arch_json"] = stored
+
+        # Ids are renumbered by the compact encoding, report them as they are now stored.
+        # Removed items are left out, their old id may now belong to another item.
+        reloaded = decode_arch_graph(stored)
+        id_map = {old.id: new.id for old, new in zip(patched.nodes + patched.clusters, reloaded.nodes + reloaded.clusters)}
+        return {
+            "status": "success",
+            "json_output": arch_graph_to_react_flow(reloaded),
+            "changed": sorted(id_map[item_id] for item_id in changed if item_id in id_map),
+        }
+    except (ArchPatchError, ArchGraphError) as e:
+        return {"status": "failed", "error": str(e)}
+    except Exception as e:
+        return {"status": "failed", "error": f"An unexpected error occurred: {str(e)}"}
+
+
+async def diagram_gcp_inventory(tool_context: ToolContext) -> dict:
+    """
+    Builds the architecture diagram of the last GCP inventory of the session
+    (from gcp_agent) directly, without generating code: asset types are mapped
+    to diagrams components, VPC networks and subnets become groups, and managed
+    instance groups group their instances. The result is saved to the state with
+    key "arch_json" like convert_diagrams_code_to_json.
+
+    Returns:
+        A dict with the status, the React Flow JSON under "json_output" and the
+        number of resources per asset type left out under "skipped".
+    """
+    try:
+        index = await load_inventory_index(tool_context)
+        if index is None:
+            return {"status": "failed", "error": "No GCP inventory found in this session, the gcp_agent has to list the project resources first."}
+
+        graph = inventory_to_graph(index.resources)
+        skipped = graph.pop("skipped")
+        if not graph["nodes"]:
+            return {"status": "failed", "error": f"None of the inventoried resources can be drawn. Asset types found: {list(skipped)}"}
+
+        arch_graph = ArchGraph(**graph)
+        tool_context.state["arch_json"] = encode_arch_graph(arch_graph)
+        return {"status": "success", "json_output": arch_graph_to_react_flow(arch_graph), "skipped": skipped}
+    except ValidationError as e:
+        return {"status": "failed", "error": str(e)}
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return {"status": "failed", "error": f"An unexpected error occurred: {str(e)}"}
@@ -0,0 +1,85 @@
+"""
+Local stand-in for the Cloud Asset Inventory API, to run the gcp_agent tools
+without GCP credentials or network access.
+
+It is used instead of the real client when the FAKE_ASSET_API_DATA environment
+variable points to a JSON file mapping each scope to its resources, in the
+format of `ResourceSearchResult.to_dict`:
+
+    {
+        "projects/my-project": [
+            {"name": "//compute.googleapis.com/projects/my-project/zones/us-central1-a/instances/vm-1",
+             "asset_type": "compute.googleapis.com/Instance",
+             "display_name": "vm-1", "location": "us-central1-a"}
+        ]
+    }
+"""
+import datetime
+import json
+import re
+from typing import Dict, List, Optional
+
+from google.cloud import asset_v1
+
+
+def _parse_time(value: Optional[str]) -> datetime.datetime:
+    """Parses an RFC 3339 timestamp such as "2024-01-01T00:00:00Z", missing ones are the oldest."""
+    if not value:
+        return datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class FakeSearchAllResourcesResponse:
+    def __init__(self, results: list):
+        self.results = results
+
+
+class FakeSearchAllResourcesPager:
+    """Async pager over the fake results, serving them page by page like the real one."""
+
+    def __init__(self, client: "FakeAssetServiceAsyncClient", resources: List[dict], page_size: int):
+        self.client = client
+        self.resources = resources
+        self.page_size = page_size or len(resources) or 1
+
+    @property
+    async def pages(self):
+        for start in range(0, len(self.resources), self.page_size):
+            self.client.page_requests += 1
+            page = [asset_v1.ResourceSearchResult(mapping=resource, ignore_unknown_fields=True) for resource in self.resources[start:start + self.page_size]]
+            yield FakeSearchAllResourcesResponse(page)
+
+    async def __aiter__(self):
+        async for page in self.pages:
+            for resource in page.results:
+                yield resource
+
+
+class FakeAssetServiceAsyncClient:
+    """
+    Implements the `search_all_resources` call of `asset_v1.AssetServiceAsyncClient`
+    over in-memory data. `search_requests` and `page_requests` count the calls
+    made, so callers can check how much of the API they used.
+    """
+
+    def __init__(self, resources_by_scope: Dict[str, List[dict]]):
+        self.resources_by_scope = resources_by_scope
+        self.search_requests = 0
+        self.page_requests = 0
+
+    @classmethod
+    def from_file(cls, path: str) -> "FakeAssetServiceAsyncClient":
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    async def search_all_resources(self, request: Optional[asset_v1.SearchAllResourcesRequest] = None, timeout: Optional[float] = None, **kwargs) -> FakeSearchAllResourcesPager:
+        self.search_requests += 1
+        resources = self.resources_by_scope.get(request.scope, [])
+        if request.asset_types:
+            resources = [resource for resource in resources if resource.get("asset_type") in request.asset_types]
+        # Only the "updateTime>SECONDS" query used for incremental refreshes is supported
+        updated_after = re.fullmatch(r"\s*updateTime\s*>\s*(\d+)\s*", request.query or "")
+        if updated_after:
+            since = datetime.datetime.fromtimestamp(int(updated_after.group(1)), datetime.timezone.utc)
+            resources = [resource for resource in resources if _parse_time(resource.get("update_time")) > since]
+        return FakeSearchAllResourcesPager(self, resources, request.page_size)
@@ -0,0 +1,94 @@
+"""
+Local SQLite snapshot of the inventoried resources, one database file per
+scope (e.g. "projects/my-project"), so a refresh only downloads the assets
+updated since the previous one and merges them.
+
+The Asset API search cannot return deleted assets, so an incremental refresh
+never removes anything: a full refresh replaces the snapshot when it is older
+than FULL_REFRESH_AFTER, when the previous full refresh was truncated, or on demand.
+"""
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+SNAPSHOT_DIR = os.environ.get("ASSET_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "asset_snapshots"))
+
+# Age after which the next refresh is a full one, in seconds
+FULL_REFRESH_AFTER = 24 * 3600
+
+# Incremental refreshes look this many seconds before the previous refresh
+# started, so assets updated while it was running are not missed
+REFRESH_OVERLAP = 300
+
+
+class AssetSnapshotStore:
+    """Snapshot of the resources of one scope, stored as the `to_dict` JSON of each resource."""
+
+    def __init__(self, scope: str, directory: str = SNAPSHOT_DIR):
+        self.scope = scope
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, re.sub(r"[^\w.-]", "_", scope) + ".sqlite")
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS resources (name TEXT PRIMARY KEY, asset_type TEXT, update_time TEXT, data TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS snapshot (id INTEGER PRIMARY KEY CHECK (id = 1), refreshed_at REAL, full_refreshed_at REAL, complete INTEGER)")
+
+    @contextmanager
+    def _connect(self):
+        # A connection per operation, so the store can be used from worker threads
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:  # commits, or rolls back on error
+                yield connection
+        finally:
+            connection.close()
+
+    def refreshed_at(self) -> Optional[float]:
+        """Start time (epoch seconds) of the last refresh, or None if the next one must be a full refresh."""
+        with self._connect() as connection:
+            row = connection.execute("SELECT refreshed_at, full_refreshed_at, complete FROM snapshot WHERE id = 1").fetchone()
+        if row is None or not row[2] or time.time() - row[1] > FULL_REFRESH_AFTER:
+            return None
+        return row[0]
+
+    def update_query(self, refreshed_at: float) -> str:
+        """Asset API search query for the assets updated since the given refresh."""
+        return f"updateTime>{int(refreshed_at - REFRESH_OVERLAP)}"
+
+    def replace(self, resources: List[dict], started_at: float, complete: bool):
+        """Replaces the snapshot with the result of a full refresh."""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM resources")
+            self._upsert(connection, resources)
+            connection.execute(
+                "INSERT OR REPLACE INTO snapshot (id, refreshed_at, full_refreshed_at, complete) VALUES (1, ?, ?, ?)",
+                (started_at, started_at, int(complete)),
+            )
+
+    def merge(self, resources: List[dict], started_at: Optional[float]):
+        """
+        Merges the result of an incremental refresh. started_at is None when the
+        refresh was truncated, so the next one starts from the same point again.
+        """
+        with self._connect() as connection:
+            self._upsert(connection, resources)
+            if started_at is not None:
+                connection.execute("UPDATE snapshot SET refreshed_at = ? WHERE id = 1", (started_at,))
+
+    def _upsert(self, connection: sqlite3.Connection, resources: List[dict]):
+        connection.executemany(
+            "INSERT OR REPLACE INTO resources (name, asset_type, update_time, data) VALUES (?, ?, ?, ?)",
+            [
+                (resource.get("name"), resource.get("asset_type"), str(resource.get("update_time") or ""), json.dumps(resource, default=str))
+                for resource in resources
+            ],
+        )
+
+    def load(self) -> List[dict]:
+        """All the resources of the snapshot."""
+        with self._connect() as connection:
+            return [json.loads(data) for (data,) in connection.execute("SELECT data FROM resources ORDER BY asset_type, name")]
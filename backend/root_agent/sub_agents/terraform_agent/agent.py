@@ -8,6 +8,7 @@ from google.adk.agents import LlmAgent
 from google.adk.a2a.utils.agent_to_a2a import to_a2a
 
 # from .tools import saveTFCodeToDBSession
+from .tools import validate_terraform_code, generate_terraform_from_architecture, append_terraform_code
 
 from google.genai import types
 
@@ -16,6 +17,7 @@ terraform_agent = LlmAgent(
     name='terraform_agent',
     description='A helpful assistant for providing terraform code for given context.',
     instruction=instructions,
+    tools=[generate_terraform_from_architecture, append_terraform_code, validate_terraform_code]
 )
 
 # a2a_app = to_a2a(architecture_validator_agent, port=8005)
@@ -0,0 +1,359 @@
+"""
+Template-driven Terraform generation from the architecture graph stored in
+state["arch_json"] (see cloud_arch_diagram_agent/arch_schema.py).
+
+Each node whose diagrams component has a template becomes parameterized
+resource blocks, so the model only writes the components without one (the
+"gaps"), instead of the whole configuration. Templates use {{placeholders}}:
+
+    name     GCP resource name, e.g. "orders-db"
+    id_name  GCP resource name with underscores, for ids without dashes, e.g. "orders_db"
+    id       Terraform name, e.g. "orders_db", only for references between the blocks
+    label    Node label, escaped for an HCL string, e.g. "Orders DB"
+    display_name  The label cut to 30 characters (Spanner's limit), escaped
+
+A node labelled "N x Component" (collapsed groups of inventory diagrams) gets
+`count = N` when its template is a single resource, and its GCP names then end
+with the count index.
+"""
+import re
+from typing import Dict, List, Set, Tuple
+
+# Components (lower-case, without the "diagrams." prefix) that are not deployed resources
+NOT_DEPLOYED_PREFIXES = ("onprem.client.", "generic.", "programming.", "saas.")
+
+# Diagrams class aliases -> main class, e.g. "gce" -> "computeengine"
+ALIASES = {
+    "gcp.compute.gce": "gcp.compute.computeengine",
+    "gcp.compute.gke": "gcp.compute.kubernetesengine",
+    "gcp.compute.gcf": "gcp.compute.functions",
+    "gcp.compute.cloudrun": "gcp.compute.run",
+    "gcp.storage.gcs": "gcp.storage.storage",
+    "gcp.security.kms": "gcp.security.keymanagementservice",
+    "gcp.devtools.gcr": "gcp.devtools.containerregistry",
+    "gcp.network.vpc": "gcp.network.virtualprivatecloud",
+}
+
+# Component -> [(resource type, resource name suffix, body)]
+TEMPLATES: Dict[str, List[Tuple[str, str, str]]] = {
+    "gcp.compute.computeengine": [("google_compute_instance", "", '''
+  name         = "{{name}}"
+  machine_type = "e2-medium"
+  zone         = var.zone
+
+  boot_disk {
+    initialize_params {
+      image = "debian-cloud/debian-12"
+    }
+  }
+
+  network_interface {
+    subnetwork = google_compute_subnetwork.main.id
+  }
+''')],
+    "gcp.compute.kubernetesengine": [("google_container_cluster", "", '''
+  name                = "{{name}}"
+  location            = var.region
+  network             = google_compute_network.main.id
+  subnetwork          = google_compute_subnetwork.main.id
+  enable_autopilot    = true
+  deletion_protection = false
+''')],
+    "gcp.compute.run": [("google_cloud_run_v2_service", "", '''
+  name     = "{{name}}"
+  location = var.region
+
+  template {
+    containers {
+      image = "us-docker.pkg.dev/cloudrun/container/hello"
+    }
+  }
+''')],
+    "gcp.database.sql": [("google_sql_database_instance", "", '''
+  name                = "{{name}}"
+  region              = var.region
+  database_version    = "POSTGRES_15"
+  deletion_protection = false
+
+  settings {
+    tier = "db-custom-1-3840"
+  }
+''')],
+    "gcp.database.memorystore": [("google_redis_instance", "", '''
+  name               = "{{name}}"
+  region             = var.region
+  memory_size_gb     = 1
+  authorized_network = google_compute_network.main.id
+''')],
+    "gcp.database.spanner": [("google_spanner_instance", "", '''
+  name         = "{{name}}"
+  config       = "regional-${var.region}"
+  display_name = "{{display_name}}"
+  num_nodes    = 1
+''')],
+    "gcp.database.bigtable": [("google_bigtable_instance", "", '''
+  name                = "{{name}}"
+  deletion_protection = false
+
+  cluster {
+    cluster_id   = "{{name}}-c1"
+    zone         = var.zone
+    num_nodes    = 1
+    storage_type = "SSD"
+  }
+''')],
+    "gcp.database.firestore": [("google_firestore_database", "", '''
+  name        = "{{name}}"
+  location_id = var.region
+  type        = "FIRESTORE_NATIVE"
+''')],
+    "gcp.storage.storage": [("google_storage_bucket", "", '''
+  name                        = "${var.project_id}-{{name}}"
+  location                    = var.region
+  uniform_bucket_level_access = true
+''')],
+    "gcp.storage.filestore": [("google_filestore_instance", "", '''
+  name     = "{{name}}"
+  location = var.zone
+  tier     = "BASIC_HDD"
+
+  file_shares {
+    name        = "share1"
+    capacity_gb = 1024
+  }
+
+  networks {
+    network = google_compute_network.main.name
+    modes   = ["MODE_IPV4"]
+  }
+''')],
+    "gcp.analytics.bigquery": [("google_bigquery_dataset", "", '''
+  dataset_id = "{{id_name}}"
+  location   = var.region
+''')],
+    "gcp.analytics.pubsub": [("google_pubsub_topic", "", '''
+  name = "{{name}}"
+''')],
+    "gcp.analytics.dataproc": [("google_dataproc_cluster", "", '''
+  name   = "{{name}}"
+  region = var.region
+''')],
+    "gcp.network.dns": [("google_dns_managed_zone", "", '''
+  name     = "{{name}}"
+  dns_name = "{{name}}.example.com."
+''')],
+    "gcp.network.armor": [("google_compute_security_policy", "", '''
+  name = "{{name}}"
+''')],
+    "gcp.network.router": [("google_compute_router", "", '''
+  name    = "{{name}}"
+  region  = var.region
+  network = google_compute_network.main.id
+''')],
+    "gcp.network.nat": [
+        ("google_compute_router", "_router", '''
+  name    = "{{name}}-router"
+  region  = var.region
+  network = google_compute_network.main.id
+'''),
+        ("google_compute_router_nat", "", '''
+  name                               = "{{name}}"
+  router                             = google_compute_router.{{id}}_router.name
+  region                             = var.region
+  nat_ip_allocate_option             = "AUTO_ONLY"
+  source_subnetwork_ip_ranges_to_nat = "ALL_SUBNETWORKS_ALL_IP_RANGES"
+'''),
+    ],
+    "gcp.security.keymanagementservice": [
+        ("google_kms_key_ring", "_ring", '''
+  name     = "{{name}}"
+  location = var.region
+'''),
+        ("google_kms_crypto_key", "", '''
+  name     = "{{name}}-key"
+  key_ring = google_kms_key_ring.{{id}}_ring.id
+'''),
+    ],
+    "gcp.devtools.containerregistry": [("google_artifact_registry_repository", "", '''
+  repository_id = "{{name}}"
+  location      = var.region
+  format        = "DOCKER"
+''')],
+    "gcp.devtools.tasks": [("google_cloud_tasks_queue", "", '''
+  name     = "{{name}}"
+  location = var.region
+''')],
+}
+
+# Drawn as the shared network below rather than as resources of their own
+NETWORK_COMPONENTS = {"gcp.network.virtualprivatecloud"}
+
+HEADER = '''terraform {
+  required_providers {
+    google = {
+      source = "hashicorp/google"
+    }
+  }
+}
+
+variable "project_id" {
+{{project_variable}}
+}
+
+variable "region" {
+  type    = string
+  default = "{{region}}"
+}
+
+variable "zone" {
+  type    = string
+  default = "{{region}}-a"
+}
+
+provider "google" {
+  project = var.project_id
+  region  = var.region
+  zone    = var.zone
+}
+'''
+
+NETWORK = '''resource "google_compute_network" "main" {
+  name                    = "{{name}}"
+  auto_create_subnetworks = false
+}
+
+resource "google_compute_subnetwork" "main" {
+  name          = "{{name}}-subnet"
+  ip_cidr_range = "10.0.0.0/20"
+  region        = var.region
+  network       = google_compute_network.main.id
+}
+'''
+
+PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+COLLAPSED = re.compile(r"^(\d+) x ")
+
+# GCP limit of the display names templates use
+MAX_DISPLAY_NAME_LENGTH = 30
+
+
+def render(template: str, values: Dict[str, str]) -> str:
+    return PLACEHOLDER.sub(lambda match: values[match.group(1)], template)
+
+
+def comment_text(text: str) -> str:
+    """Text on a single comment line, e.g. the label "Web\\nServer" (a diagrams line break) -> "Web Server"."""
+    return " ".join(str(text).split())
+
+
+def hcl_string(text: str) -> str:
+    """Escapes text for the inside of an HCL quoted string, including the ${ and %{ template sequences."""
+    text = str(text).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+    return text.replace("${", "$${").replace("%{", "%%{")
+
+
+def display_name(label: str, name: str) -> str:
+    """
+    Label on one line, cut to MAX_DISPLAY_NAME_LENGTH. Labels shorter than the 4
+    characters GCP requires become "<name> instance", e.g. "db instance".
+    """
+    text = comment_text(label)[:MAX_DISPLAY_NAME_LENGTH].rstrip()
+    if len(text) < 4:
+        text = f"{name} instance"[:MAX_DISPLAY_NAME_LENGTH].rstrip()
+    return hcl_string(text)
+
+
+def normalize_component(component: str) -> str:
+    """e.g. "diagrams.gcp.compute.GCE" -> "gcp.compute.computeengine"."""
+    component = component.strip().lower().removeprefix("diagrams.")
+    return ALIASES.get(component, component)
+
+
+def resource_name(label: str, fallback: str) -> str:
+    """GCP resource name from a label: lower-case letters, digits and dashes, starting with a letter."""
+    name = re.sub(r"[^a-z0-9]+", "-", COLLAPSED.sub("", label).lower()).strip("-")
+    if not name or not name[0].isalpha():
+        name = f"{fallback}-{name}".strip("-")
+    return name[:40].rstrip("-")
+
+
+def _addresses(component: str, name: str) -> Set[str]:
+    """Terraform addresses of the blocks of a component's template for a resource name."""
+    return {f"{resource_type}.{name.replace('-', '_')}{suffix}" for resource_type, suffix, _ in TEMPLATES[component]}
+
+
+def graph_to_terraform(graph: dict, project_id: str = "", region: str = "us-central1") -> dict:
+    """
+    Generates the Terraform code of an architecture graph.
+
+    Args:
+        graph: The graph, {"nodes": [{id, label, component, parent}], "clusters": [...], "edges": [{source, target, ...}]}.
+        project_id: The default of the project_id variable, left empty to make it required.
+        region: The default region.
+
+    Returns:
+        A dict with "terraform_code", "generated" (labels of the templated nodes),
+        "gaps" ({label, component, connected_to} of the nodes the model has to write)
+        and "not_deployed" (labels of users, clients and other non-GCP nodes).
+    """
+    labels = {item["id"]: item["label"] for item in graph.get("nodes", []) + graph.get("clusters", [])}
+    connections: Dict[str, List[str]] = {}
+    for edge in graph.get("edges", []):
+        connections.setdefault(edge["source"], []).append(labels.get(edge["target"], edge["target"]))
+        connections.setdefault(edge["target"], []).append(labels.get(edge["source"], edge["source"]))
+
+    blocks, generated, gaps, not_deployed = [], [], [], []
+    # GCP names and Terraform addresses ("type.name") already emitted
+    used_names: Set[str] = set()
+    used_addresses: Set[str] = set()
+    network_name = None
+
+    for node in graph.get("nodes", []):
+        component = normalize_component(node.get("component", ""))
+        if component in NETWORK_COMPONENTS:
+            network_name = network_name or resource_name(node["label"], "vpc")
+            generated.append(node["label"])
+            continue
+        if component not in TEMPLATES:
+            if not component or component.startswith(NOT_DEPLOYED_PREFIXES):
+                not_deployed.append(node["label"])
+            else:
+                gaps.append({"label": node["label"], "component": node.get("component", ""), "connected_to": sorted(set(connections.get(node["id"], [])))})
+            continue
+
+        base_name = resource_name(node["label"], component.rsplit(".", 1)[1])
+        name, number = base_name, 1
+        # e.g. "Web 2", "Web", "Web" -> web-2, web, web-3
+        while name in used_names or _addresses(component, name) & used_addresses:
+            number += 1
+            name = f"{base_name}-{number}"
+        used_names.add(name)
+        used_addresses.update(_addresses(component, name))
+
+        # Only single-resource templates are repeated, others would need indexed references
+        count = COLLAPSED.match(node["label"]) if len(TEMPLATES[component]) == 1 else None
+        values = {
+            "name": name + ("-${count.index}" if count else ""),
+            "id_name": name.replace("-", "_") + ("_${count.index}" if count else ""),
+            "id": name.replace("-", "_"),
+            "label": hcl_string(node["label"]),
+            "display_name": display_name(node["label"], name),
+        }
+
+        lines = [f"# {comment_text(node['label'])} ({comment_text(node.get('component', ''))})"]
+        for resource_type, suffix, body in TEMPLATES[component]:
+            meta = f"\n  count = {count.group(1)}\n" if count else ""
+            lines.append(f'resource "{resource_type}" "{values["id"]}{suffix}" {{{meta}{render(body, values)}}}\n')
+        blocks.append("\n".join(lines))
+        generated.append(node["label"])
+
+    project_variable = f'  type    = string\n  default = "{hcl_string(project_id)}"' if project_id else "  type = string"
+    code = [render(HEADER, {"region": hcl_string(region), "project_variable": project_variable})]
+    if network_name or any("google_compute_network.main" in block or "google_compute_subnetwork.main" in block for block in blocks):
+        code.append(render(NETWORK, {"name": network_name or "main-vpc"}))
+    code.extend(blocks)
+    for gap in gaps:
+        connected = f", connected to {', '.join(gap['connected_to'])}" if gap["connected_to"] else ""
+        code.append(comment_text(f"# TODO: {gap['label']} ({gap['component']}){connected}") + "\n")
+
+    return {"terraform_code": "\n".join(code), "generated": generated, "gaps": gaps, "not_deployed": not_deployed}
@@ -1,47 +1,185 @@
 from google.adk.tools import ToolContext
 import google.genai.types as types
 
+from typing import Optional
+import json
 import uuid
 
-async def save_terraform_file(filename: str, content: str, tool_context: ToolContext) -> dict:
+from .bundle import BundleError, build_bundle
+from .validation import validate_terraform
+from .templates import graph_to_terraform
+from ..cloud_arch_diagram_agent.arch_schema import ArchGraphError, load_arch_graph
+
+# Artifacts are downloaded through the backend API, which redirects to a signed storage URL or streams them
+ARTIFACT_URL_PREFIX = "/api/artifacts"
+
+
+def terraform_artifact_name(filename: str, unique_id: str) -> str:
+    """Artifact name of a Terraform file, e.g. ('main.tf', id) -> 'main_<id>.tf'."""
+    base_name = filename.strip().removesuffix('.tf')
+    return f"{base_name}_{unique_id}.tf"
+
+
+async def save_terraform_file(filename: str, content: str, tool_context: ToolContext, extra_files: Optional[dict[str, str]] = None) -> dict:
     """
-    Saves the provided content as a Terraform configuration file.
+    Saves the provided content as a Terraform configuration file. The files of a
+    multi-file module (variables.tf, outputs.tf...) can be saved in the same call.
 
     Args:
         filename: The name of the file to save (e.g., 'main').
         content: The complete Terraform code to write to the file.
+        extra_files: Optional other files of the same module, mapping each file name to its Terraform code (e.g., {'variables.tf': '...'}).
     
     Returns:
-        A dict consist of the status, filename and the url of the file when uploaded to GCS bucket
+        A dict consist of the status, filename and the API url of the file, and the same for every file under "files"
+    """
+    try:
+        # The files of one call share the same id, so they can be told apart from other modules
+        unique_id = str(uuid.uuid4())
+        files = {filename: content, **(extra_files or {})}
+        validation = validate_terraform(files)
+        if not validation["valid"]:
+            return {"status": "failed", "error_message": "The Terraform code has errors, fix them and save it again.", "errors": validation["errors"]}
+        session_prefix = f"{ARTIFACT_URL_PREFIX}/{tool_context._invocation_context.user_id}/{tool_context._invocation_context.session.id}"
+
+        saved = []
+        for name, code in files.items():
+            file_path = terraform_artifact_name(name, unique_id)
+            # The artifact is built from the content in memory, nothing is written to disk
+            artifact = types.Part(
+                inline_data=types.Blob(
+                    data=code.encode('utf-8'),
+                    mime_type="text/plain"
+                )
+            )
+            await tool_context.save_artifact(
+                filename=file_path,
+                artifact=artifact
+            )
+            saved.append({"filename": file_path, "url": f"{session_prefix}/{file_path}"})
+
+        return {"status": "success", "filename": saved[0]["filename"], "url": saved[0]["url"], "files": saved, "warnings": validation["warnings"]}
+
+    except Exception as e:
+        return {"status": "failed", "error": f"An error occurred while saving the file: {str(e)}"}
+
+
+async def save_terraform_bundle(files: dict[str, str], tool_context: ToolContext, bundle_name: str = "terraform", archive_format: str = "zip") -> dict:
+    """
+    Saves a whole Terraform configuration (e.g. main.tf, variables.tf, outputs.tf
+    and modules/<name>/*.tf) as a single archive, with a manifest.json listing its files.
+
+    Args:
+        files: The Terraform code of every file, by path relative to the configuration root (e.g., {'main.tf': '...', 'modules/network/main.tf': '...'}).
+        bundle_name: The name of the archive, without extension (e.g., 'webapp').
+        archive_format: 'zip' or 'tar.gz'.
+
+    Returns:
+        A dict consist of the status, the archive filename and url, and its manifest
+        where every file also has the url of the archive and its path inside it.
     """
     try:
-        unique_id = uuid.uuid4()
-        # Ensure the filename ends with .tf
-        base_name = filename.strip('.tf')
-        file_path = f"{base_name}_{unique_id}.tf"
-        
-        with open(file_path, "wb") as f:
-            f.write(content.encode('utf-8'))
-        
-        # Read the file content as bytes and return it
-        with open(file_path, "rb") as f:
-            file_bytes = f.read()
+        validation = validate_terraform(files)
+        if not validation["valid"]:
+            return {"status": "failed", "error_message": "The Terraform code has errors, fix them and save it again.", "errors": validation["errors"]}
+        data, mime_type, manifest = build_bundle(files, archive_format)
+        file_path = f"{bundle_name.strip() or 'terraform'}_{uuid.uuid4()}.{archive_format}"
         artifact = types.Part(
             inline_data=types.Blob(
-                data=file_bytes,
-                mime_type="text/plain"
+                data=data,
+                mime_type=mime_type
             )
         )
-        
         await tool_context.save_artifact(
             filename=file_path,
             artifact=artifact
         )
-        
-        return {"status": "success", "filename": file_path, "url": f"https://storage.googleapis.com/helloaihackathon_2025_autoarch_backend_specific/autoarch/{tool_context._invocation_context.user_id}/{tool_context._invocation_context.session.id}/{file_path}"}
+        url = f"{ARTIFACT_URL_PREFIX}/{tool_context._invocation_context.user_id}/{tool_context._invocation_context.session.id}/{file_path}"
+        for entry in manifest["files"]:
+            entry["url"] = f"{url}#{entry['path']}"
+        return {"status": "success", "filename": file_path, "url": url, "manifest": manifest, "warnings": validation["warnings"]}
+
+    except BundleError as e:
+        return {"status": "failed", "error_message": str(e)}
+    except Exception as e:
+        return {"status": "failed", "error": f"An error occurred while saving the bundle: {str(e)}"}
+
+
+async def generate_terraform_from_architecture(tool_context: ToolContext, project_id: str = "", region: str = "us-central1") -> dict:
+    """
+    Generates the Terraform code of the architecture diagram saved in this session
+    (state key "arch_json") from templates, for the components that have one. The
+    code is saved to the state with key "terraform_code".
+
+    Args:
+        project_id: The GCP project id, left empty for a generic configuration.
+        region: The GCP region of the resources.
+
+    Returns:
+        A dict with the status, the "terraform_code", the "gaps" (components
+        without a template, with what they are connected to) that still have to be
+        written, and the "not_deployed" nodes (users, clients...). Nothing is saved,
+        and the "errors" are returned, when the generated code does not validate.
+    """
+    try:
+        graph = load_arch_graph(tool_context.state.get("arch_json"))
+        if graph is None:
+            return {"status": "failed", "error": "No architecture diagram saved in this session, write the Terraform code yourself."}
+
+        result = graph_to_terraform(graph.model_dump(), project_id, region)
+        validation = validate_terraform({"main.tf": result["terraform_code"]})
+        if not validation["valid"]:
+            return {"status": "failed", "error_message": "The generated Terraform code has errors, write the Terraform code yourself.", "errors": validation["errors"]}
+
+        tool_context.state["terraform_code"] = result["terraform_code"]
+        return {"status": "success", **result, "warnings": validation["warnings"]}
+    except ArchGraphError as e:
+        return {"status": "failed", "error": str(e)}
+    except Exception as e:
+        return {"status": "failed", "error": f"An unexpected error occurred: {str(e)}"}
+
+
+async def append_terraform_code(terraform_code: str, tool_context: ToolContext) -> dict:
+    """
+    Adds the resource blocks written for the gaps to the Terraform code saved by
+    generate_terraform_from_architecture. The "# TODO" lines of the gaps are
+    removed, so all the gaps should be written in one call.
+
+    Args:
+        terraform_code: The Terraform blocks to add, only the missing ones.
 
+    Returns:
+        A dict with the status, and the "errors" to fix when the combined code is invalid (nothing is saved then).
+    """
+    try:
+        current = tool_context.state.get("terraform_code")
+        if not current:
+            return {"status": "failed", "error": "No generated Terraform code in this session, call generate_terraform_from_architecture first."}
+
+        kept = [line for line in current.rstrip("\n").split("\n") if not line.startswith("# TODO: ")]
+        combined = "\n".join(kept).rstrip("\n") + "\n\n" + terraform_code.strip("\n") + "\n"
+        validation = validate_terraform({"main.tf": combined})
+        if not validation["valid"]:
+            return {"status": "failed", "error_message": "The Terraform code has errors, fix them and call the tool again.", "errors": validation["errors"]}
+
+        tool_context.state["terraform_code"] = combined
+        return {"status": "success", "warnings": validation["warnings"]}
     except Exception as e:
-        return f"An error occurred while saving the file: {str(e)}"
+        return {"status": "failed", "error": f"An unexpected error occurred: {str(e)}"}
+
+
+def validate_terraform_code(files: dict[str, str]) -> dict:
+    """
+    Checks Terraform code offline, in milliseconds: HCL syntax, Terraform block
+    structure, and resource arguments against the cached provider schemas.
+
+    Args:
+        files: The Terraform code of every file, by path (e.g., {'main.tf': '...', 'variables.tf': '...'}).
+
+    Returns:
+        A dict with "valid", the "errors" to fix and "warnings" (each with file, line and message).
+    """
+    return validate_terraform(files)
 
 
 async def saveTFCodeToDBSession(terraform_code: str, tool_context: ToolContext) -> str:
@@ -55,6 +193,9 @@ async def saveTFCodeToDBSession(terraform_code: str, tool_context: ToolContext)
         A string indicating success or failure.
     """
     try:
+        validation = validate_terraform({"main.tf": terraform_code})
+        if not validation["valid"]:
+            return f"Error: the Terraform code is invalid: {json.dumps(validation['errors'])}"
         tool_context.state["terraform_code"] = terraform_code
         return "Terraform Code Saved Successfully"
     except Exception as e:
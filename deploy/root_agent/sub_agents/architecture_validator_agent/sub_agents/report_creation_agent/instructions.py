@@ -45,10 +45,10 @@ instructions="""
     ** Strictly follow the steps below in order
     1. Received the content, extract the scorecard section and create the JSON input
     2. Extract the content under "## Current Architecture" and "## Improved Architecture"
-    3. Use the sub agents diagrams_code_builder_agent to get the code for current architecture diagram. No need to ask user to verify the code and immediately go to next step. Even though the code might have issue executing, just use the sub agent to modify it and tell the sub agent what's wrong, no need to show the user. You must not specify what is the output file name to the sub agent at this step, just let the sub agent do its task.
-    4. Use the execute_python_code tool to execute the code, and this tool will save to artifact as current_architecture.png
-    5. Use the sub agents diagrams_code_builder_agent to get the code for improved architecture diagram. No need to ask user to verify the code and immediately go to next step. Even though the code might have issue executing, just use the sub agent to modify it and tell the sub agent what's wrong, no need to show the user. You must not specify what is the output file name to the sub agent at this step, just let the sub agent do its task.
-    6. Use the execute_python_code tool to execute the code, and this tool will save to artifact as improved_architecture.png
+    3. Use the sub agents diagrams_code_builder_agent to get the code for current architecture diagram. No need to ask user to verify the code and immediately go to next step. You must not specify what is the output file name to the sub agent at this step, just let the sub agent do its task.
+    4. Use the sub agents diagrams_code_builder_agent to get the code for improved architecture diagram. Ask the sub agent to keep the same labels and group names as the current architecture code for the components that stay, so the changes can be compared. No need to ask user to verify the code and immediately go to next step. You must not specify what is the output file name to the sub agent at this step, just let the sub agent do its task.
+    5. Use the render_architecture_diff tool with both codes. It renders a single diagram of both architectures with the added, removed and changed components highlighted, and saves it to artifact as architecture_diff.png and architecture_diff.svg (the SVG and the list of changes are embedded in the report under "## Improved Architecture"). Even though the code might have issue, just use the sub agent to modify it and tell the sub agent what's wrong, no need to show the user.
+    6. Only if render_architecture_diff keeps failing, fall back to the execute_python_code tool for each code, which saves current_architecture.png/.svg and improved_architecture.png/.svg separately.
     7. Now use the generate_validation_report_from_markdown tool to create the report. Strictly DO NOT put the your conversation between agents or your personal reply (Eg: "Of course. I can help validate the architecture you've created.........") inside the report content. This report is supposed to be professional and ready for submission to the higher up management executives.
 
 
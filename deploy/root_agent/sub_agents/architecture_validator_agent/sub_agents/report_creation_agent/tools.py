@@ -7,8 +7,6 @@ from dotenv import load_dotenv
 import google.genai.types as types
 
 import markdown
-from weasyprint import HTML, CSS
-from weasyprint.text.fonts import FontConfiguration
 from lxml import etree
 from google.adk.tools import ToolContext
 
@@ -18,12 +16,41 @@ import pandas as pd
 
 import traceback
 import subprocess
-import sys
+from typing import Optional
+
+from ....cloud_arch_diagram_agent.tools import render_diagram, SUPPORTED_OUTPUT_FORMATS
+from ....cloud_arch_diagram_agent.diagrams_converter import parse_diagrams_code, DiagramsCodeError
+from ....cloud_arch_diagram_agent.architecture_diff import diff_architectures, diff_to_diagrams_code, diff_to_markdown
+from ....file_proposal_agent.pdf_renderer import render_pdf, REPORT_CSS
+from ....file_proposal_agent.render_pool import run_render
 
 
 # --- Load Environment Variables (If ADK tools need them, e.g., API keys) ---
 load_dotenv() # Create a .env file in the same directory if needed
 
+DIFF_LEGEND = "*Legend: [+] added (green), [-] removed (red, dashed connections), [~] changed (orange).*"
+
+
+async def architecture_image_tag(type_architecture: str, alt: str, tool_context: ToolContext) -> str:
+    """
+    Builds an inline <img> tag for a rendered architecture diagram, preferring the
+    SVG artifact (vector-sharp in the PDF) and falling back to the PNG one.
+
+    Args:
+        type_architecture: "current_architecture', 'improved_architecture' or 'architecture_diff'.
+        alt: The alternative text of the image.
+
+    Returns:
+        The HTML <img> tag with the image embedded as a data URI.
+    """
+    for output_format in ("svg", "png"):
+        artifact = await tool_context.load_artifact(filename=f"{type_architecture}.{output_format}")
+        if artifact is not None and artifact.inline_data is not None:
+            encoded_image = base64.b64encode(artifact.inline_data.data).decode('utf-8')
+            mime_type = SUPPORTED_OUTPUT_FORMATS[output_format]
+            return f'<img src="data:{mime_type};base64,{encoded_image}" alt="{alt}" style="max-width: 100%; height: auto;">'
+    raise ValueError(f"Error: No rendered diagram found for '{type_architecture}'. Run execute_python_code first.")
+
 
 async def generate_validation_report_from_markdown(content: str, json_input: dict, chart_type: str, tool_context: ToolContext) -> dict:
     """
@@ -87,28 +114,26 @@ async def generate_validation_report_from_markdown(content: str, json_input: dic
             # Fallback if the heading is not found, prepend to the content
             content = f"{image_tag}\n\n{content}"
 
-        current_architecture_artifact = await tool_context.load_artifact(filename="current_architecture.png")
-        improved_architecture_artifact = await tool_context.load_artifact(filename="improved_architecture.png")
-
-        current_architecture_bytes = current_architecture_artifact.inline_data.data
-        improved_architecture_bytes = improved_architecture_artifact.inline_data.data
-
-        encoded_current_architecture_image = base64.b64encode(current_architecture_bytes).decode('utf-8')
-        encoded_improved_architecture_image = base64.b64encode(improved_architecture_bytes).decode('utf-8')
-        
-        current_architecture_image_tag = f'<img src="data:image/png;base64,{encoded_current_architecture_image}" alt="Current Architecture diagram" style="max-width: 100%; height: auto;">'
-        improved_architecture_image_tag = f'<img src="data:image/png;base64,{encoded_improved_architecture_image}" alt="Improved Architecture diagram" style="max-width: 100%; height: auto;">'
-        
+        architecture_diff = tool_context.state.get("architecture_diff")
+        if architecture_diff:
+            # One diagram showing the changes, with the table of changes, replaces the two diagrams
+            diff_image_tag = await architecture_image_tag("architecture_diff", "Architecture changes diagram", tool_context)
+            current_architecture_image_tag = None
+            improved_architecture_image_tag = f"{diff_image_tag}\n\n{DIFF_LEGEND}\n\n{architecture_diff}"
+        else:
+            current_architecture_image_tag = await architecture_image_tag("current_architecture", "Current Architecture diagram", tool_context)
+            improved_architecture_image_tag = await architecture_image_tag("improved_architecture", "Improved Architecture diagram", tool_context)
 
-        current_architecture_insertion_point = "## Current Architecture"
-        parts = content.split(current_architecture_insertion_point, 1)
+        if current_architecture_image_tag is not None:
+            current_architecture_insertion_point = "## Current Architecture"
+            parts = content.split(current_architecture_insertion_point, 1)
 
-        if len(parts) > 1:
-            # If the heading is found, insert the chart between the parts.
-            content = f"{parts[0]}{current_architecture_insertion_point}\n\n{current_architecture_image_tag}\n\n{parts[1]}"
-        else:
-            # If the heading is not found, prepend the chart to the content.
-            content = f"{current_architecture_image_tag}\n\n{content}"
+            if len(parts) > 1:
+                # If the heading is found, insert the chart between the parts.
+                content = f"{parts[0]}{current_architecture_insertion_point}\n\n{current_architecture_image_tag}\n\n{parts[1]}"
+            else:
+                # If the heading is not found, prepend the chart to the content.
+                content = f"{current_architecture_image_tag}\n\n{content}"
 
         improved_architecture_insertion_point = "## Improved Architecture"
         parts = content.split(improved_architecture_insertion_point, 1)
@@ -123,42 +148,8 @@ async def generate_validation_report_from_markdown(content: str, json_input: dic
         # 1. Convert Markdown to HTML
         html_content = markdown.markdown(content, extensions=['tables', 'fenced_code'])
 
-        # 2. Add inline CSS for styling the HTML
-        css_string = """
-        @page { size: A4; margin: 0.5in; }
-        body { font-family: 'Helvetica', sans-serif; font-size: 12pt; line-height: 1.5; color: #333333; }
-        img { max-width: 100%; height: auto; display: block; margin: 1em auto; }
-        h1 { font-size: 24pt; color: #2a4365; text-align: center; margin-top: 1em; padding-bottom: 0.2em; border-bottom: 2px solid #e2e8f0; }
-        h2 { font-size: 18pt; color: #4a5568; margin-top: 1.5em; margin-bottom: 0.5em; }
-        h3 { font-size: 16pt; color: #718096; margin-top: 1.5em; margin-bottom: 0.5em; }
-        h4 { font-size: 14pt; color: #a0aec0; margin-top: 1.5em; margin-bottom: 0.5em; }
-        p { margin-top: 0.5em; margin-bottom: 1em; text-align: justify; }
-        table { border-collapse: collapse; width: 100%; margin-top: 1em; margin-bottom: 1em; }
-        th, td { border: 1px solid #e2e8f0; padding: 8px; text-align: left; }
-        th { background-color: #4a5568; color: white; font-weight: bold; }
-        tr:nth-child(even) { background-color: #f7fafc; }
-        code { font-family: 'Courier New', Courier, monospace; background-color: #e2e8f0; padding: 2px 4px; border-radius: 4px; }
-        pre { background-color: #e2e8f0; padding: 10px; border-radius: 8px; overflow-x: auto; }
-        """
-
-        # Create the complete HTML document
-        full_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Generated PDF</title>
-            <style>{css_string}</style>
-        </head>
-        <body>
-            {html_content}
-        </body>
-        </html>
-        """
-
-        # 3. Use WeasyPrint to render the HTML to PDF
-        font_config = FontConfiguration()
-        html = HTML(string=full_html, base_url='.')
-        pdf_bytes = html.write_pdf(stylesheets=[CSS(string=css_string, font_config=font_config)])
+        # 2. Render the HTML to PDF in the render pool, off the event loop
+        pdf_bytes = await run_render(render_pdf, html_content, REPORT_CSS)
 
         session_id = tool_context._invocation_context.session.id
         unique_id = os.urandom(4).hex()
@@ -185,58 +176,114 @@ async def generate_validation_report_from_markdown(content: str, json_input: dic
 
     
 
-async def execute_python_code(code_string: str, type_architecture: str, tool_context: ToolContext) -> str:
+async def execute_python_code(code_string: str, type_architecture: str, tool_context: ToolContext, output_formats: Optional[list[str]] = None, dpi: int = 96) -> str:
     """
-    Executes Python code, reads the generated image, and saves it to an artifact.
+    Executes Python code, reads the generated image(s), and saves them to artifacts.
     
     Args:
         code_string: The Python code to be executed.
         type_architecture: either "current_architecture' or 'improved_architecture'. Will be used as filename for reference.
+        output_formats: The image formats to produce, "png" and/or "svg". Defaults to ["png", "svg"] so the report can embed the sharper SVG.
+        dpi: The resolution of the PNG output. Defaults to 96.
 
     Returns:
         A string indicating success or failure.
     """
-    image_filename = f"diagram.png"
-
-    
-    # Get the path to the current Python interpreter from the virtual environment
-    python_executable = sys.executable
+    output_formats = [output_format.lower().lstrip(".") for output_format in (output_formats or ["png", "svg"])]
+    unsupported = [output_format for output_format in output_formats if output_format not in SUPPORTED_OUTPUT_FORMATS]
+    if unsupported:
+        return f"Error: Unsupported output format(s) {unsupported}. Use any of {list(SUPPORTED_OUTPUT_FORMATS)}."
 
     try:
-        # Run the Python code using the same interpreter as the agent
-        subprocess.run(
-            [python_executable, "-c", code_string],
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=60
-        )
-        
-        with open(image_filename, "rb") as f:
-            image_bytes = f.read()
-            
-        image_artifact = types.Part(
-            inline_data=types.Blob(
-                data=image_bytes,
-                mime_type="image/png"
+        rendered = render_diagram(code_string, output_formats, dpi)
+
+        saved = []
+        for output_format, image_bytes in rendered.items():
+            image_artifact = types.Part(
+                inline_data=types.Blob(
+                    data=image_bytes,
+                    mime_type=SUPPORTED_OUTPUT_FORMATS[output_format]
+                )
             )
-        )
-        output_filename = f"{type_architecture}.png"
-        version = await tool_context.save_artifact(
-            filename=output_filename,
-            artifact=image_artifact
-        )
-        
-        return f"Success - Image saved to artifact with version {version}. Filename: {output_filename}"
+            output_filename = f"{type_architecture}.{output_format}"
+            version = await tool_context.save_artifact(
+                filename=output_filename,
+                artifact=image_artifact
+            )
+            saved.append(f"{output_filename} (version {version})")
+
+        # The report shows these diagrams instead of a previously rendered diff
+        tool_context.state["architecture_diff"] = None
+        return f"Success - Image saved to artifact. Filename: {', '.join(saved)}"
     
+    except SyntaxError as e:
+        return f"Python code has a syntax error at line {e.lineno}: {e.msg}"
     except subprocess.CalledProcessError as e:
         return f"Python code execution failed with error: {e.stderr}"
-    except FileNotFoundError:
-        return f"Error: Code executed but the file '{image_filename}' was not found."
+    except FileNotFoundError as e:
+        return f"Error: Code executed but the file '{os.path.basename(e.filename or 'diagram')}' was not found."
+    except Exception as e:
+        error_details = traceback.format_exc()
+        return f"An unexpected error occurred: {str(e)}\n{error_details}"
+
+
+async def render_architecture_diff(current_code: str, improved_code: str, tool_context: ToolContext, output_formats: Optional[list[str]] = None, dpi: int = 96) -> str:
+    """
+    Compares the diagrams code of the current and the improved architecture, and
+    renders a single diagram of both with the added, removed and changed components
+    highlighted. The code is not executed for the comparison, only the merged
+    diagram is rendered once.
+
+    Args:
+        current_code: The diagrams Python code of the current architecture.
+        improved_code: The diagrams Python code of the improved architecture.
+        output_formats: The image formats to produce, "png" and/or "svg". Defaults to ["png", "svg"].
+        dpi: The resolution of the PNG output. Defaults to 96.
+
+    Returns:
+        A string indicating success (with the list of changes) or failure.
+    """
+    output_formats = [output_format.lower().lstrip(".") for output_format in (output_formats or ["png", "svg"])]
+    unsupported = [output_format for output_format in output_formats if output_format not in SUPPORTED_OUTPUT_FORMATS]
+    if unsupported:
+        return f"Error: Unsupported output format(s) {unsupported}. Use any of {list(SUPPORTED_OUTPUT_FORMATS)}."
+
+    try:
+        try:
+            current = parse_diagrams_code(current_code)
+        except DiagramsCodeError as e:
+            return f"Error: The current architecture code cannot be read: {str(e)}"
+        try:
+            improved = parse_diagrams_code(improved_code)
+        except DiagramsCodeError as e:
+            return f"Error: The improved architecture code cannot be read: {str(e)}"
+
+        diff = diff_architectures(current, improved)
+        rendered = render_diagram(diff_to_diagrams_code(diff), output_formats, dpi)
+
+        saved = []
+        for output_format, image_bytes in rendered.items():
+            image_artifact = types.Part(
+                inline_data=types.Blob(
+                    data=image_bytes,
+                    mime_type=SUPPORTED_OUTPUT_FORMATS[output_format]
+                )
+            )
+            output_filename = f"architecture_diff.{output_format}"
+            version = await tool_context.save_artifact(
+                filename=output_filename,
+                artifact=image_artifact
+            )
+            saved.append(f"{output_filename} (version {version})")
+
+        changes = diff_to_markdown(diff)
+        tool_context.state["architecture_diff"] = changes
+        return f"Success - Diff diagram saved to artifact. Filename: {', '.join(saved)}\n\n{changes}"
+
+    except subprocess.CalledProcessError as e:
+        return f"Diff diagram rendering failed with error: {e.stderr}"
+    except FileNotFoundError as e:
+        return f"Error: Diff diagram rendered but the file '{os.path.basename(e.filename or 'diagram')}' was not found."
     except Exception as e:
         error_details = traceback.format_exc()
         return f"An unexpected error occurred: {str(e)}\n{error_details}"
-    finally:
-        # Clean up the generated image file to avoid clutter.
-        if os.path.exists(image_filename):
-            os.remove(image_filename)
\ No newline at end of file
@@ -4,7 +4,7 @@ from google.adk.agents.remote_a2a_agent import RemoteA2aAgent
 from google.adk.tools.agent_tool import AgentTool
 from .instructions import instructions
 
-from .tools import execute_python_code
+from .tools import execute_python_code, diagram_gcp_inventory
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -27,5 +27,5 @@ cloud_arch_diagram_agent = Agent(
     description='A helpful assistant for helping to generate cloud architecture diagram at the end.',
     instruction=instructions,
     # sub_agents=[diagrams_code_builder_agent],
-    tools=[AgentTool(diagrams_code_builder_agent), execute_python_code]
+    tools=[AgentTool(diagrams_code_builder_agent), execute_python_code, diagram_gcp_inventory]
 )
@@ -0,0 +1,231 @@
+"""
+Diff between two architecture graphs (current vs improved), and generation of
+a single 'diagrams' code that shows both at once with the changes highlighted.
+
+Both graphs come from `diagrams_converter.parse_diagrams_code`, so the two
+designs only need their code generated, and the report renders one merged
+diagram instead of one diagram per architecture.
+"""
+from typing import Dict, List, Tuple
+
+from .diagrams_converter import graph_to_diagrams_code
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+# Font/edge color and label marker of each status in the diff diagram
+STATUS_STYLES = {
+    ADDED: {"color": "#188038", "marker": "[+] "},
+    REMOVED: {"color": "#d93025", "marker": "[-] "},
+    CHANGED: {"color": "#e37400", "marker": "[~] "},
+    UNCHANGED: {"color": "", "marker": ""},
+}
+
+CLUSTER_BACKGROUNDS = {
+    ADDED: "#e6f4ea",
+    REMOVED: "#fce8e6",
+}
+
+def _label_key(label: str) -> str:
+    return " ".join(label.lower().split())
+
+
+def _cluster_paths(graph: dict) -> Dict[str, Tuple[str, ...]]:
+    """Maps every cluster id to the labels of the clusters from the top level down to it."""
+    by_id = {cluster["id"]: cluster for cluster in graph["clusters"]}
+    paths = {}
+
+    def path(cluster_id):
+        if cluster_id not in paths:
+            paths[cluster_id] = ()  # guards against clusters nested in themselves
+            parent = by_id[cluster_id]["parent"]
+            parent_path = path(parent) if parent in by_id else ()
+            paths[cluster_id] = parent_path + (_label_key(by_id[cluster_id]["label"]),)
+        return paths[cluster_id]
+
+    for cluster_id in by_id:
+        path(cluster_id)
+    return paths
+
+
+def _pair_nodes(current: list, improved: list, current_key, improved_key) -> List[Tuple[dict, dict]]:
+    """Pairs the nodes with the same key, in order of appearance, removing them from both lists."""
+    waiting: Dict[object, List[dict]] = {}
+    for node in current:
+        waiting.setdefault(current_key(node), []).append(node)
+
+    pairs = []
+    for node in list(improved):
+        candidates = waiting.get(improved_key(node))
+        if candidates:
+            match = candidates.pop(0)
+            pairs.append((match, node))
+            current.remove(match)
+            improved.remove(node)
+    return pairs
+
+
+def diff_architectures(current: dict, improved: dict) -> dict:
+    """
+    Compares two architecture graphs. Nodes are matched by label first, then the
+    remaining ones by component and cluster (a renamed component).
+
+    Args:
+        current: The graph of the current architecture (`parse_diagrams_code` output).
+        improved: The graph of the improved architecture.
+
+    Returns:
+        A dict with:
+            "graph": the merged graph, where every node, cluster and edge has a
+                "status" (added, removed, changed or unchanged) and nodes have
+                "details" describing the change.
+            "summary": counts per status for "nodes" and "edges".
+    """
+    current_paths, improved_paths = _cluster_paths(current), _cluster_paths(improved)
+
+    # Clusters are matched by their path of labels, so "VPC > Backend" matches in both designs
+    merged_clusters, cluster_ids = [], {}
+    for side, graph, paths in ((REMOVED, current, current_paths), (ADDED, improved, improved_paths)):
+        for cluster in graph["clusters"]:
+            path = paths[cluster["id"]]
+            if path in cluster_ids:
+                merged_clusters[cluster_ids[path]]["status"] = UNCHANGED
+                continue
+            parent = current_paths.get(cluster["parent"]) if side == REMOVED else improved_paths.get(cluster["parent"])
+            cluster_ids[path] = len(merged_clusters)
+            merged_clusters.append({
+                "id": f"cluster_{len(merged_clusters) + 1}",
+                "label": cluster["label"],
+                "parent": parent,
+                "color": cluster["color"],
+                "status": side,
+            })
+    for cluster in merged_clusters:
+        cluster["parent"] = merged_clusters[cluster_ids[cluster["parent"]]]["id"] if cluster["parent"] else None
+
+    def cluster_of(node, paths):
+        path = paths.get(node["parent"])
+        return merged_clusters[cluster_ids[path]]["id"] if path else None
+
+    def cluster_label(node, graph):
+        for cluster in graph["clusters"]:
+            if cluster["id"] == node["parent"]:
+                return cluster["label"]
+        return "top level"
+
+    remaining_current, remaining_improved = list(current["nodes"]), list(improved["nodes"])
+    by_label = lambda node: _label_key(node["label"])
+    pairs = _pair_nodes(remaining_current, remaining_improved, by_label, by_label)
+    renamed = _pair_nodes(
+        remaining_current,
+        remaining_improved,
+        lambda node: (node["component"], current_paths.get(node["parent"])),
+        lambda node: (node["component"], improved_paths.get(node["parent"])),
+    )
+
+    merged_nodes, node_ids = [], {}
+
+    def add_node(node, status, details, parent, *sources):
+        merged_id = f"node_{len(merged_nodes) + 1}"
+        merged_nodes.append({
+            "id": merged_id,
+            "label": node["label"],
+            "component": node["component"],
+            "parent": parent,
+            "status": status,
+            "details": details,
+        })
+        for side, source in sources:
+            node_ids[(side, source["id"])] = merged_id
+
+    for old, new in pairs + renamed:
+        details = []
+        if _label_key(old["label"]) != _label_key(new["label"]):
+            details.append(f"renamed from '{old['label']}'")
+        if old["component"] != new["component"]:
+            details.append(f"component {old['component']} replaced by {new['component']}")
+        if current_paths.get(old["parent"]) != improved_paths.get(new["parent"]):
+            details.append(f"moved from {cluster_label(old, current)} to {cluster_label(new, improved)}")
+        add_node(new, CHANGED if details else UNCHANGED, details, cluster_of(new, improved_paths), ("current", old), ("improved", new))
+    for node in remaining_current:
+        add_node(node, REMOVED, [], cluster_of(node, current_paths), ("current", node))
+    for node in remaining_improved:
+        add_node(node, ADDED, [], cluster_of(node, improved_paths), ("improved", node))
+
+    merged_edges = {}
+    for side, graph in (("current", current), ("improved", improved)):
+        for edge in graph["edges"]:
+            key = (node_ids[(side, edge["source"])], node_ids[(side, edge["target"])])
+            if key in merged_edges:
+                if side == "improved" and merged_edges[key]["status"] == REMOVED:
+                    merged_edges[key]["status"] = UNCHANGED
+            else:
+                merged_edges[key] = dict(edge, source=key[0], target=key[1], status=REMOVED if side == "current" else ADDED)
+
+    summary = {"nodes": {}, "edges": {}}
+    for node in merged_nodes:
+        summary["nodes"][node["status"]] = summary["nodes"].get(node["status"], 0) + 1
+    for edge in merged_edges.values():
+        summary["edges"][edge["status"]] = summary["edges"].get(edge["status"], 0) + 1
+
+    return {
+        "graph": {"nodes": merged_nodes, "clusters": merged_clusters, "edges": list(merged_edges.values())},
+        "summary": summary,
+    }
+
+
+def diff_to_diagrams_code(diff: dict, title: str = "Architecture Changes", direction: str = "LR") -> str:
+    """
+    Generates the 'diagrams' code of the merged graph from `diff_architectures`:
+    added items are green and marked [+], removed ones red and marked [-] (their
+    connections dashed), changed ones orange and marked [~].
+
+    Returns:
+        The Python code, ready for `render_diagram`.
+    """
+    graph = diff["graph"]
+    styled = {"nodes": [], "clusters": [], "edges": []}
+    for cluster in graph["clusters"]:
+        style = STATUS_STYLES[cluster["status"]]
+        styled["clusters"].append(dict(cluster, label=style["marker"] + cluster["label"]))
+        if cluster["status"] in CLUSTER_BACKGROUNDS:
+            styled["clusters"][-1]["graph_attr"] = {"bgcolor": CLUSTER_BACKGROUNDS[cluster["status"]], "fontcolor": style["color"]}
+    for node in graph["nodes"]:
+        style = STATUS_STYLES[node["status"]]
+        attrs = {"fontcolor": style["color"]} if style["color"] else {}
+        styled["nodes"].append(dict(node, label=style["marker"] + node["label"], attrs=attrs))
+    for edge in graph["edges"]:
+        if edge["status"] == UNCHANGED:
+            styled["edges"].append(edge)
+        else:
+            styled["edges"].append(dict(edge, color=STATUS_STYLES[edge["status"]]["color"], style="dashed" if edge["status"] == REMOVED else "bold"))
+    return graph_to_diagrams_code(styled, title, direction)
+
+
+def diff_to_markdown(diff: dict) -> str:
+    """
+    Builds a Markdown table listing the added, removed and changed components
+    and connections, for the report.
+    """
+    graph = diff["graph"]
+    labels = {node["id"]: node["label"] for node in graph["nodes"]}
+    titles = {ADDED: "Added", REMOVED: "Removed", CHANGED: "Changed"}
+
+    rows = []
+    for status in (ADDED, REMOVED, CHANGED):
+        for node in graph["nodes"]:
+            if node["status"] == status:
+                details = "; ".join(node["details"]) or node["component"]
+                rows.append(f"| {titles[status]} | Component | {node['label']} | {details} |")
+    for status in (ADDED, REMOVED):
+        for edge in graph["edges"]:
+            if edge["status"] == status:
+                connection = f"{labels[edge['source']]} → {labels[edge['target']]}"
+                rows.append(f"| {titles[status]} | Connection | {connection} | {edge['label']} |")
+
+    if not rows:
+        return "No differences between the current and the improved architecture."
+    header = ["| Change | Type | Name | Details |", "|---|---|---|---|"]
+    return "\n".join(header + [row.replace("\n", " ") for row in rows])
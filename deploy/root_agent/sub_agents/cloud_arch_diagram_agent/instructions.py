@@ -12,6 +12,8 @@ instructions="""
     
     Tools:
     1. execute_python_code: Use this tool to execute the python code you got from diagrams_code_builder_agent. This tool will also store the image generated into artifact, where you can obtain the image from and display to the user.
+    By default it renders a PNG. If the user asks for a vector/SVG diagram or a higher resolution, pass output_formats (e.g. ["png", "svg"]) and dpi (e.g. 200) to the tool.
+    2. diagram_gcp_inventory: When the user asks for the diagram of their existing GCP project (the resources listed by gcp_agent in this session), use this tool directly instead of describing the resources to diagrams_code_builder_agent. It draws the inventory and returns the diagrams code, which you can give to diagrams_code_builder_agent only if the user wants changes.
 
 
     ***Important Notes:
@@ -0,0 +1,212 @@
+"""
+Single-pass Markdown to Word writer. The markdown-it token stream is turned
+directly into python-docx paragraphs, runs, lists and tables, instead of
+rendering HTML and parsing it back with regexes, so nested emphasis, links
+in table cells and nested lists keep their structure and long paragraphs
+are written in linear time.
+"""
+from typing import Dict, List, Optional
+
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.shared import OxmlElement, qn
+from markdown_it import MarkdownIt
+
+HYPERLINK_RELATIONSHIP = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink'
+CODE_FONT = 'Courier New'
+
+# The default template has list styles down to the third level
+MAX_LIST_LEVEL = 3
+
+# Raw HTML is written as text, like any other character of the content
+_parser = MarkdownIt("commonmark", {"html": False}).enable(["table", "strikethrough"])
+
+
+class DocxWriter:
+    """Writes Markdown content at the end of a python-docx Document."""
+
+    def __init__(self, document):
+        self.document = document
+        # Styles of the open lists, e.g. ["List Bullet", "List Number"]
+        self.lists: List[str] = []
+        # Whether the open list item still has no paragraph
+        self.item_start = False
+        self.quote_level = 0
+        self.paragraph = None
+        # Inline tokens of the table being read, one list per row, and which rows are headers
+        self.table_rows: Optional[List[list]] = None
+        self.header_rows: List[bool] = []
+        self.in_header = False
+        # Hyperlink relationships are added with a running rId, python-docx's
+        # relate_to scans every relationship of the part for each link
+        self.link_ids: Dict[str, str] = {}
+        rels = document.part.rels
+        self.next_rid = 1 + max((int(r_id[3:]) for r_id in rels if r_id[3:].isdigit()), default=0)
+
+    def write(self, content: str):
+        for token in _parser.parse(content):
+            handler = getattr(self, f"_{token.type}", None)
+            if handler is not None:
+                handler(token)
+
+    def _paragraph_style(self) -> Optional[str]:
+        if self.lists:
+            level = min(len(self.lists), MAX_LIST_LEVEL)
+            suffix = f" {level}" if level > 1 else ""
+            if self.item_start:
+                self.item_start = False
+                return f"{self.lists[-1]}{suffix}"
+            return f"List Continue{suffix}"
+        if self.quote_level:
+            return 'Quote'
+        return None
+
+    def _heading_open(self, token):
+        self.paragraph = self.document.add_heading(level=int(token.tag[1]))
+
+    def _paragraph_open(self, token):
+        self.paragraph = self.document.add_paragraph(style=self._paragraph_style())
+
+    def _heading_close(self, token):
+        self.paragraph = None
+
+    _paragraph_close = _heading_close
+
+    def _inline(self, token):
+        if self.table_rows is not None:
+            self.table_rows[-1].append(token)
+        elif self.paragraph is not None:
+            self._write_inline(self.paragraph, token.children or [])
+
+    def _bullet_list_open(self, token):
+        self.lists.append('List Bullet')
+
+    def _ordered_list_open(self, token):
+        self.lists.append('List Number')
+
+    def _bullet_list_close(self, token):
+        self.lists.pop()
+
+    _ordered_list_close = _bullet_list_close
+
+    def _list_item_open(self, token):
+        self.item_start = True
+
+    def _blockquote_open(self, token):
+        self.quote_level += 1
+
+    def _blockquote_close(self, token):
+        self.quote_level -= 1
+
+    def _fence(self, token):
+        self.item_start = False
+        paragraph = self.document.add_paragraph(style='No Spacing')
+        paragraph.add_run(token.content.rstrip("\n")).font.name = CODE_FONT
+
+    _code_block = _fence
+
+    def _table_open(self, token):
+        # The table is created once all its rows are read, to know the number of columns
+        self.table_rows, self.header_rows = [], []
+
+    def _thead_open(self, token):
+        self.in_header = True
+
+    def _thead_close(self, token):
+        self.in_header = False
+
+    def _tr_open(self, token):
+        self.table_rows.append([])
+        self.header_rows.append(self.in_header)
+
+    def _table_close(self, token):
+        rows, self.table_rows = self.table_rows, None
+        num_cols = max((len(row) for row in rows), default=0)
+        if not num_cols:
+            return
+        table = self.document.add_table(rows=len(rows), cols=num_cols)
+        table.autofit = True
+        for i, row in enumerate(rows):
+            for j, cell in enumerate(row):
+                paragraph = table.cell(i, j).paragraphs[0]
+                self._write_inline(paragraph, cell.children or [], bold=self.header_rows[i])
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
+
+
+    def _link_id(self, url: str) -> str:
+        """The rId of the relationship to the URL, added on its first link."""
+        if url not in self.link_ids:
+            rels = self.document.part.rels
+            while f"rId{self.next_rid}" in rels:
+                self.next_rid += 1
+            r_id = f"rId{self.next_rid}"
+            rels.add_relationship(HYPERLINK_RELATIONSHIP, url, r_id, is_external=True)
+            self.link_ids[url] = r_id
+            self.next_rid += 1
+        return self.link_ids[url]
+
+    def _write_inline(self, paragraph, children: list, bold: bool = False):
+        """
+        Adds the runs of the children of an inline token to a paragraph.
+
+        Args:
+            paragraph: The python-docx paragraph.
+            children: The inline tokens (text, strong_open, link_open...).
+            bold: Whether every run is bold, e.g. in table headers.
+        """
+        strong = 1 if bold else 0
+        em = strike = 0
+        hyperlink = None
+
+        def add_run(text, code=False):
+            run = paragraph.add_run(text)
+            # Only set properties are written, most runs have no run properties at all
+            if strong:
+                run.bold = True
+            if em:
+                run.italic = True
+            if strike:
+                run.font.strike = True
+            if code:
+                run.font.name = CODE_FONT
+            if hyperlink is not None:
+                style = OxmlElement('w:rStyle')
+                style.set(qn('w:val'), 'Hyperlink')
+                run._r.get_or_add_rPr().insert(0, style)
+                hyperlink.append(run._r)
+            return run
+
+        for child in children:
+            if child.type == 'text':
+                add_run(child.content)
+            elif child.type == 'code_inline':
+                add_run(child.content, code=True)
+            elif child.type == 'softbreak':
+                add_run(" ")
+            elif child.type == 'hardbreak':
+                add_run("").add_break()
+            elif child.type == 'strong_open':
+                strong += 1
+            elif child.type == 'strong_close':
+                strong -= 1
+            elif child.type == 'em_open':
+                em += 1
+            elif child.type == 'em_close':
+                em -= 1
+            elif child.type == 's_open':
+                strike += 1
+            elif child.type == 's_close':
+                strike -= 1
+            elif child.type == 'link_open':
+                hyperlink = add_hyperlink(paragraph, self._link_id(child.attrGet('href')))
+            elif child.type == 'link_close':
+                hyperlink = None
+            elif child.type == 'image':
+                add_run(child.content)
+
+
+def add_hyperlink(paragraph, r_id: str):
+    """Appends an empty hyperlink to the relationship r_id, its runs are added by the caller."""
+    hyperlink = OxmlElement('w:hyperlink')
+    hyperlink.set(qn('r:id'), r_id)
+    paragraph._p.append(hyperlink)
+    return hyperlink
@@ -0,0 +1,91 @@
+"""
+Process-level WeasyPrint renderer for the Markdown documents and reports.
+
+Font discovery (FontConfiguration) and stylesheet parsing are the slow part of
+a small PDF, and used to be repeated on every call. Here they run once per
+stylesheet and process, and every document is rendered with the cached CSS
+object instead of also parsing the stylesheet from an inline <style> tag.
+"""
+import threading
+from functools import lru_cache
+
+from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
+
+# Proposals, reports and documents generated by the file proposal agent
+DOCUMENT_CSS = """
+@page { size: A4; margin: 0.5in; }
+body { font-family: 'Helvetica', sans-serif; font-size: 12pt; line-height: 1.5; color: #333333; }
+h1 { font-size: 24pt; color: #2a4365; text-align: center; margin-top: 1em; margin-bottom: 0.5em; padding-bottom: 0.2em; border-bottom: 2px solid #e2e8f0; }
+h2 { font-size: 18pt; color: #4a5568; margin-top: 1.5em; margin-bottom: 0.5em; }
+h3 { font-size: 16pt; color: #718096; margin-top: 1.5em; margin-bottom: 0.5em; }
+h4 { font-size: 14pt; color: #a0aec0; margin-top: 1.5em; margin-bottom: 0.5em; }
+p { margin-top: 0.5em; margin-bottom: 1em; text-align: justify; }
+table { border-collapse: collapse; width: 100%; margin-top: 1em; margin-bottom: 1em; }
+th, td { border: 1px solid #e2e8f0; padding: 8px; text-align: left; }
+th { background-color: #4a5568; color: white; font-weight: bold; }
+tr:nth-child(even) { background-color: #f7fafc; }
+code { font-family: 'Courier New', Courier, monospace; background-color: #e2e8f0; padding: 2px 4px; border-radius: 4px; }
+pre { background-color: #e2e8f0; padding: 10px; border-radius: 8px; overflow-x: auto; }
+"""
+
+# Validation reports, with the scorecard chart and architecture diagrams
+REPORT_CSS = """
+@page { size: A4; margin: 0.5in; }
+body { font-family: 'Helvetica', sans-serif; font-size: 12pt; line-height: 1.5; color: #333333; }
+img { max-width: 100%; height: auto; display: block; margin: 1em auto; }
+h1 { font-size: 24pt; color: #2a4365; text-align: center; margin-top: 1em; padding-bottom: 0.2em; border-bottom: 2px solid #e2e8f0; }
+h2 { font-size: 18pt; color: #4a5568; margin-top: 1.5em; margin-bottom: 0.5em; }
+h3 { font-size: 16pt; color: #718096; margin-top: 1.5em; margin-bottom: 0.5em; }
+h4 { font-size: 14pt; color: #a0aec0; margin-top: 1.5em; margin-bottom: 0.5em; }
+p { margin-top: 0.5em; margin-bottom: 1em; text-align: justify; }
+table { border-collapse: collapse; width: 100%; margin-top: 1em; margin-bottom: 1em; }
+th, td { border: 1px solid #e2e8f0; padding: 8px; text-align: left; }
+th { background-color: #4a5568; color: white; font-weight: bold; }
+tr:nth-child(even) { background-color: #f7fafc; }
+code { font-family: 'Courier New', Courier, monospace; background-color: #e2e8f0; padding: 2px 4px; border-radius: 4px; }
+pre { background-color: #e2e8f0; padding: 10px; border-radius: 8px; overflow-x: auto; }
+"""
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <title>{title}</title>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+# The font configuration is shared by the cached stylesheets, and WeasyPrint
+# layouts are not thread-safe, so documents are rendered one at a time
+_render_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def font_configuration() -> FontConfiguration:
+    return FontConfiguration()
+
+
+@lru_cache(maxsize=8)
+def stylesheet(css_string: str) -> CSS:
+    """The parsed stylesheet, bound to the shared font configuration."""
+    return CSS(string=css_string, font_config=font_configuration())
+
+
+def render_pdf(html_content: str, css_string: str = DOCUMENT_CSS, title: str = "Generated PDF") -> bytes:
+    """
+    Renders an HTML fragment to PDF.
+
+    Args:
+        html_content: The body of the document, e.g. converted from Markdown.
+        css_string: The stylesheet, parsed on the first use only.
+        title: The document title.
+
+    Returns:
+        The PDF bytes.
+    """
+    document = HTML(string=HTML_TEMPLATE.format(title=title, body=html_content), base_url=".")
+    with _render_lock:
+        return document.write_pdf(stylesheets=[stylesheet(css_string)], font_config=font_configuration())
@@ -0,0 +1,104 @@
+"""
+Aggregation of Cloud Asset Inventory results into a compact summary for the
+model. The full resource list is kept out of the model context (in an
+artifact) and only counts grouped by asset type, location, network and labels,
+with a few example names, are returned.
+"""
+import json
+from typing import Dict, List
+
+# Example names kept per asset type
+MAX_EXAMPLES = 3
+
+# Most frequent labels and networks kept in the summary
+MAX_LABELS = 20
+MAX_NETWORKS = 20
+
+# Rough size of a token in characters, good enough to compare payloads
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(value) -> int:
+    """Approximate number of tokens of a JSON-serializable value."""
+    return len(json.dumps(value, default=str)) // CHARS_PER_TOKEN
+
+
+def short_name(path: str) -> str:
+    """Last segment of a resource path or URL, e.g. ".../networks/default" -> "default"."""
+    return path.rstrip("/").rsplit("/", 1)[-1]
+
+
+def resource_networks(resource: dict) -> List[str]:
+    """
+    Names of the VPC networks a resource belongs to, from the search result
+    itself (networks) or its additional attributes (instances, subnets...).
+    """
+    if resource.get("asset_type") == "compute.googleapis.com/Network":
+        return [resource.get("display_name") or short_name(resource.get("name", ""))]
+
+    networks = []
+    for key, value in (resource.get("additional_attributes") or {}).items():
+        if "network" not in key.lower() or "subnetwork" in key.lower():
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, str) and item:
+                networks.append(short_name(item))
+    return list(dict.fromkeys(networks))
+
+
+def _count(counts: Dict[str, int], key: str):
+    counts[key] = counts.get(key, 0) + 1
+
+
+def _top(counts: Dict[str, int], limit: int) -> Dict[str, int]:
+    return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit])
+
+
+def summarize_resources(resources: List[dict]) -> dict:
+    """
+    Groups resources (`ResourceSearchResult.to_dict` output) into a compact summary.
+
+    Args:
+        resources: The list of resource dictionaries.
+
+    Returns:
+        A dict with "resource_count", "by_asset_type" (count, locations, states
+        and example names per asset type), "by_location", "by_network",
+        "labels" ("key=value" counts), and "unlabeled_count".
+    """
+    by_asset_type = {}
+    by_location, by_network, labels = {}, {}, {}
+    unlabeled_count = 0
+
+    for resource in resources:
+        asset_type = resource.get("asset_type", "unknown")
+        location = resource.get("location") or "global"
+        group = by_asset_type.setdefault(asset_type, {"count": 0, "locations": {}, "states": {}, "examples": []})
+        group["count"] += 1
+        _count(group["locations"], location)
+        if resource.get("state"):
+            _count(group["states"], resource["state"])
+        if len(group["examples"]) < MAX_EXAMPLES:
+            group["examples"].append(resource.get("display_name") or short_name(resource.get("name", "")))
+
+        _count(by_location, location)
+        for network in resource_networks(resource):
+            _count(by_network, network)
+        if resource.get("labels"):
+            for key, value in resource["labels"].items():
+                _count(labels, f"{key}={value}")
+        else:
+            unlabeled_count += 1
+
+    for group in by_asset_type.values():
+        if not group["states"]:
+            del group["states"]
+
+    return {
+        "resource_count": len(resources),
+        "by_asset_type": dict(sorted(by_asset_type.items(), key=lambda item: -item[1]["count"])),
+        "by_location": _top(by_location, len(by_location)),
+        "by_network": _top(by_network, MAX_NETWORKS),
+        "labels": _top(labels, MAX_LABELS),
+        "unlabeled_count": unlabeled_count,
+    }
@@ -0,0 +1,226 @@
+"""
+Deterministic mapping of Cloud Asset Inventory results to an architecture
+graph, in the format of `diagrams_converter.parse_diagrams_code`:
+
+    {"nodes": [{id, label, component, parent}],
+     "clusters": [{id, label, parent, color}],
+     "edges": [{source, target, label, color, style, directed}]}
+
+VPC networks become clusters, with their subnetworks nested inside, and
+managed instance groups become clusters holding their instances. Networks and
+subnetworks are matched by their full path, e.g. the "default" subnetworks of
+every region, or the "default" networks of several projects, stay apart; their
+labels get the region and project when the short names collide. Asset types
+without a diagrams component (firewall rules, disks, IAM bindings...) are
+left out and only counted.
+"""
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .inventory import short_name
+
+# Asset type -> diagrams component (without the "diagrams." prefix)
+ASSET_COMPONENTS = {
+    "compute.googleapis.com/Instance": "gcp.compute.ComputeEngine",
+    "compute.googleapis.com/ForwardingRule": "gcp.network.LoadBalancing",
+    "compute.googleapis.com/GlobalForwardingRule": "gcp.network.LoadBalancing",
+    "compute.googleapis.com/Router": "gcp.network.Router",
+    "compute.googleapis.com/VpnGateway": "gcp.network.VPN",
+    "compute.googleapis.com/TargetVpnGateway": "gcp.network.VPN",
+    "compute.googleapis.com/SecurityPolicy": "gcp.network.Armor",
+    "container.googleapis.com/Cluster": "gcp.compute.KubernetesEngine",
+    "run.googleapis.com/Service": "gcp.compute.Run",
+    "cloudfunctions.googleapis.com/CloudFunction": "gcp.compute.Functions",
+    "cloudfunctions.googleapis.com/Function": "gcp.compute.Functions",
+    "appengine.googleapis.com/Application": "gcp.compute.AppEngine",
+    "sqladmin.googleapis.com/Instance": "gcp.database.SQL",
+    "redis.googleapis.com/Instance": "gcp.database.Memorystore",
+    "spanner.googleapis.com/Instance": "gcp.database.Spanner",
+    "bigtableadmin.googleapis.com/Instance": "gcp.database.Bigtable",
+    "firestore.googleapis.com/Database": "gcp.database.Firestore",
+    "storage.googleapis.com/Bucket": "gcp.storage.Storage",
+    "file.googleapis.com/Instance": "gcp.storage.Filestore",
+    "bigquery.googleapis.com/Dataset": "gcp.analytics.Bigquery",
+    "pubsub.googleapis.com/Topic": "gcp.analytics.Pubsub",
+    "dataflow.googleapis.com/Job": "gcp.analytics.Dataflow",
+    "dataproc.googleapis.com/Cluster": "gcp.analytics.Dataproc",
+    "composer.googleapis.com/Environment": "gcp.analytics.Composer",
+    "dns.googleapis.com/ManagedZone": "gcp.network.DNS",
+    "cloudkms.googleapis.com/KeyRing": "gcp.security.KeyManagementService",
+    "artifactregistry.googleapis.com/Repository": "gcp.devtools.ContainerRegistry",
+    "cloudtasks.googleapis.com/Queue": "gcp.devtools.Tasks",
+    "cloudscheduler.googleapis.com/Job": "gcp.devtools.Scheduler",
+    "apigateway.googleapis.com/Gateway": "gcp.api.APIGateway",
+    "aiplatform.googleapis.com/Endpoint": "gcp.ml.AIPlatform",
+}
+
+NETWORK_TYPE = "compute.googleapis.com/Network"
+SUBNETWORK_TYPE = "compute.googleapis.com/Subnetwork"
+INSTANCE_GROUP_TYPES = ("compute.googleapis.com/InstanceGroupManager", "compute.googleapis.com/RegionInstanceGroupManager")
+
+# More nodes than this of one component in one cluster are drawn as a single "N x" node
+MAX_NODES_PER_GROUP = 5
+
+NETWORK_COLOR = "#E8F0FE"
+SUBNETWORK_COLOR = "#F1F3F4"
+INSTANCE_GROUP_COLOR = "#FEF7E0"
+
+
+def _name(resource: dict) -> str:
+    return resource.get("display_name") or short_name(resource.get("name", ""))
+
+
+def _path(name: str) -> str:
+    """
+    Resource path from "projects/", e.g. "//compute.googleapis.com/projects/p/global/networks/n"
+    or "https://www.googleapis.com/compute/v1/projects/p/global/networks/n" -> "projects/p/global/networks/n".
+    """
+    start = name.find("projects/")
+    return (name[start:] if start >= 0 else name).rstrip("/")
+
+
+def _path_part(path: str, collection: str) -> Optional[str]:
+    """The id following a collection in a path, e.g. ("projects/p/regions/r/...", "regions") -> "r"."""
+    parts = path.split("/")
+    for index, part in enumerate(parts[:-1]):
+        if part == collection:
+            return parts[index + 1]
+    return None
+
+
+def _attribute_paths(resource: dict, subnetwork: bool) -> List[str]:
+    """Paths (or bare names) of the networks (or subnetworks) listed in the additional attributes."""
+    paths = []
+    for key, value in (resource.get("additional_attributes") or {}).items():
+        key = key.lower()
+        if "network" not in key or ("subnetwork" in key) != subnetwork:
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, str) and item:
+                paths.append(_path(item))
+    return paths
+
+
+def _find(clusters: Dict[str, str], reference: str, project: Optional[str]) -> Optional[str]:
+    """
+    The cluster of a network (or subnetwork) path. A bare name only matches a
+    single network of that name, preferably in the same project as the resource.
+    """
+    if reference in clusters:
+        return clusters[reference]
+    if "/" in reference:
+        return None
+    matches = [path for path in clusters if short_name(path) == reference]
+    if len(matches) > 1:
+        matches = [path for path in matches if _path_part(path, "projects") == project]
+    return clusters[matches[0]] if len(matches) == 1 else None
+
+
+def _unique_labels(resources: List[dict], qualifiers: Tuple[str, ...]) -> Dict[str, str]:
+    """
+    Cluster label of each resource by path: its name, followed by as many of the
+    qualifiers (e.g. "regions", "projects") as needed to tell apart equal names.
+    """
+    names = {_path(resource.get("name", "")): _name(resource) for resource in resources}
+    labels = dict(names)
+    for used in range(1, len(qualifiers) + 1):
+        counts = Counter(labels.values())
+        for path, name in names.items():
+            if counts[labels[path]] > 1:
+                extra = [_path_part(path, qualifier) for qualifier in qualifiers[:used]]
+                labels[path] = f"{name} ({', '.join(part for part in extra if part)})"
+    return labels
+
+
+def inventory_to_graph(resources: List[dict]) -> dict:
+    """
+    Builds the architecture graph of an inventory.
+
+    Args:
+        resources: The resource dictionaries (`ResourceSearchResult.to_dict` output).
+
+    Returns:
+        The graph, with an extra "skipped" dict counting the resources per asset
+        type that have no diagrams component.
+    """
+    clusters, nodes = [], []
+    skipped: Dict[str, int] = {}
+
+    def add_cluster(label, parent, color):
+        cluster_id = f"cluster_{len(clusters) + 1}"
+        clusters.append({"id": cluster_id, "label": label, "parent": parent, "color": color})
+        return cluster_id
+
+    by_type: Dict[str, List[dict]] = {}
+    for resource in resources:
+        by_type.setdefault(resource.get("asset_type", ""), []).append(resource)
+
+    # Network and subnetwork paths -> cluster ids
+    network_labels = _unique_labels(by_type.get(NETWORK_TYPE, []), ("projects",))
+    networks = {path: add_cluster(f"VPC: {label}", None, NETWORK_COLOR) for path, label in network_labels.items()}
+
+    def find_cluster(clusters, resource, subnetwork) -> Optional[str]:
+        project = _path_part(_path(resource.get("name", "")), "projects")
+        for reference in _attribute_paths(resource, subnetwork):
+            cluster_id = _find(clusters, reference, project)
+            if cluster_id is not None:
+                return cluster_id
+        return None
+
+    subnetwork_labels = _unique_labels(by_type.get(SUBNETWORK_TYPE, []), ("regions", "projects"))
+    subnetworks = {}
+    for subnetwork in by_type.get(SUBNETWORK_TYPE, []):
+        path = _path(subnetwork.get("name", ""))
+        subnetworks[path] = add_cluster(f"Subnet: {subnetwork_labels[path]}", find_cluster(networks, subnetwork, subnetwork=False), SUBNETWORK_COLOR)
+
+    def placement(resource) -> Optional[str]:
+        return find_cluster(subnetworks, resource, subnetwork=True) or find_cluster(networks, resource, subnetwork=False)
+
+    # Managed instances are named "<base instance name>-<4 random characters>",
+    # the base name being the group name unless configured otherwise
+    instance_groups = []
+    for group in (group for asset_type in INSTANCE_GROUP_TYPES for group in by_type.get(asset_type, [])):
+        instance_groups.append((re.compile(re.escape(_name(group)) + r"-[a-z0-9]{4}"), _name(group), group))
+    # Group path -> cluster id
+    group_clusters = {}
+
+    # (parent, component) -> resources, so large groups can be collapsed
+    placed: Dict[tuple, List[dict]] = {}
+    for asset_type, items in by_type.items():
+        component = ASSET_COMPONENTS.get(asset_type)
+        if component is None:
+            if asset_type not in (NETWORK_TYPE, SUBNETWORK_TYPE) + INSTANCE_GROUP_TYPES:
+                skipped[asset_type] = len(items)
+            continue
+        for resource in items:
+            parent = placement(resource)
+            if asset_type == "compute.googleapis.com/Instance":
+                for pattern, group_name, group in instance_groups:
+                    if pattern.fullmatch(_name(resource)):
+                        group_path = _path(group.get("name", ""))
+                        if group_path not in group_clusters:
+                            group_clusters[group_path] = add_cluster(f"Instance group: {group_name}", parent or placement(group), INSTANCE_GROUP_COLOR)
+                        parent = group_clusters[group_path]
+                        break
+            placed.setdefault((parent, component), []).append(resource)
+
+    for (parent, component), items in placed.items():
+        if len(items) > MAX_NODES_PER_GROUP:
+            label = f"{len(items)} x {component.rsplit('.', 1)[1]}"
+            nodes.append({"id": f"node_{len(nodes) + 1}", "label": label, "component": component, "parent": parent})
+            continue
+        for resource in items:
+            nodes.append({"id": f"node_{len(nodes) + 1}", "label": _name(resource), "component": component, "parent": parent})
+
+    # Networks and subnets without any component inside are not drawn
+    cluster_parent = {cluster["id"]: cluster["parent"] for cluster in clusters}
+    used = set()
+    for node in nodes:
+        parent = node["parent"]
+        while parent is not None and parent not in used:
+            used.add(parent)
+            parent = cluster_parent[parent]
+    clusters = [cluster for cluster in clusters if cluster["id"] in used]
+
+    return {"nodes": nodes, "clusters": clusters, "edges": [], "skipped": skipped}
@@ -0,0 +1,87 @@
+"""
+Packs the files of a Terraform configuration (main.tf, variables.tf,
+outputs.tf, modules/...) into a single zip or tar.gz archive, built in memory,
+with a manifest.json listing every file, so a whole configuration is one
+artifact upload.
+"""
+import hashlib
+import io
+import json
+import posixpath
+import tarfile
+import time
+import zipfile
+from typing import Dict, Tuple
+
+MANIFEST_NAME = "manifest.json"
+
+# Archive format -> MIME type
+ARCHIVE_FORMATS = {
+    "zip": "application/zip",
+    "tar.gz": "application/gzip",
+}
+
+
+class BundleError(ValueError):
+    pass
+
+
+def normalize_path(path: str) -> str:
+    """Relative POSIX path of a file inside the bundle, rejecting paths that escape it."""
+    normalized = posixpath.normpath(path.strip().replace("\\", "/"))
+    if not normalized or normalized == "." or normalized.startswith("/") or normalized.split("/")[0] == "..":
+        raise BundleError(f"Invalid file path in the bundle: {path!r}")
+    return normalized
+
+
+def build_manifest(files: Dict[str, bytes]) -> dict:
+    return {
+        "file_count": len(files),
+        "files": [
+            {"path": path, "size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+            for path, data in files.items()
+        ],
+    }
+
+
+def build_bundle(files: Dict[str, str], archive_format: str = "zip") -> Tuple[bytes, str, dict]:
+    """
+    Builds the archive of a Terraform file tree.
+
+    Args:
+        files: The file contents by path, e.g. {"main.tf": "...", "modules/network/main.tf": "..."}.
+        archive_format: "zip" or "tar.gz".
+
+    Returns:
+        The archive bytes, its MIME type and its manifest.
+    """
+    if archive_format not in ARCHIVE_FORMATS:
+        raise BundleError(f"Unsupported archive format: {archive_format}, expected one of {', '.join(ARCHIVE_FORMATS)}")
+    if not files:
+        raise BundleError("The bundle has no files")
+
+    encoded = {}
+    for path, content in files.items():
+        path = normalize_path(path)
+        if path == MANIFEST_NAME or path in encoded:
+            raise BundleError(f"Duplicate file path in the bundle: {path}")
+        encoded[path] = content.encode("utf-8")
+
+    manifest = build_manifest(encoded)
+    entries = {**encoded, MANIFEST_NAME: json.dumps(manifest, indent=2).encode("utf-8")}
+
+    buffer = io.BytesIO()
+    if archive_format == "zip":
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for path, data in entries.items():
+                archive.writestr(path, data)
+    else:
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for path, data in entries.items():
+                info = tarfile.TarInfo(path)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                info.mode = 0o644
+                archive.addfile(info, io.BytesIO(data))
+
+    return buffer.getvalue(), ARCHIVE_FORMATS[archive_format], manifest
@@ -2,7 +2,7 @@
 # from .tools import validate_diagrams_import
 
 from .instructions import instructions
-from .tools import validate_diagrams_import
+from .tools import validate_diagrams_import, validate_diagrams_code, search_diagrams_components
 
 import os
 import uvicorn
@@ -23,7 +23,8 @@ root_agent = LlmAgent(
     name='diagrams_code_builder_agent',
     description='A helpful assistant for creating code with python and Diagrams module.',
     instruction=instructions,
-    before_agent_callback=validate_diagrams_import
+    before_agent_callback=validate_diagrams_import,
+    tools=[validate_diagrams_code, search_diagrams_components]
 )
 
 # def create_agent() -> LlmAgent:
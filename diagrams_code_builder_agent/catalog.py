@@ -0,0 +1,164 @@
+import json
+import re
+from difflib import get_close_matches
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+CATALOG_PATH = Path(__file__).parent / "diagrams_components.json"
+
+# Names provided by the diagrams core package itself, they are not part of the
+# scraped provider catalog but are always importable.
+CORE_MODULES = {
+    "diagrams": {"Diagram", "Cluster", "Edge", "Node", "getdiagram", "setdiagram", "getcluster", "setcluster"},
+    "diagrams.custom": {"Custom"},
+}
+
+
+# Words in a request that point to a provider of the catalog
+PROVIDER_KEYWORDS = {
+    "gcp": ["gcp", "google cloud", "bigquery", "gke", "cloud run", "cloud sql", "pub/sub", "pubsub", "firestore", "vertex"],
+    "aws": ["aws", "amazon", "ec2", "s3", "lambda", "rds", "dynamodb", "cloudfront", "eks"],
+    "azure": ["azure", "microsoft", "cosmos", "aks"],
+    "k8s": ["k8s", "kubernetes", "helm", "pods?"],
+    "firebase": ["firebase"],
+    "alibabacloud": ["alibaba", "aliyun"],
+    "digitalocean": ["digitalocean", "digital ocean", "droplets?"],
+    "saas": ["saas", "datadog", "slack", "auth0", "okta", "snowflake", "cloudflare"],
+    "programming": ["flowchart", "programming language"],
+}
+
+PROVIDER_PATTERNS = {
+    provider: re.compile(r"\b(" + "|".join(keywords) + r")\b")
+    for provider, keywords in PROVIDER_KEYWORDS.items()
+}
+
+# Generic components (users, databases, web servers...) useful for every design
+BASE_PROVIDERS = ["onprem"]
+
+# Used when the request does not mention any provider
+DEFAULT_PROVIDERS = ["gcp"]
+
+
+class DiagramsCatalog:
+    """
+    Indexed view of 'diagrams_components.json'.
+
+    The JSON is a mapping of provider to a list of fully qualified class paths,
+    e.g. {"gcp": ["diagrams.gcp.compute.Run", ...]}. It is indexed by module,
+    by provider and category, and by class name so that lookups are dictionary
+    accesses.
+    """
+
+    def __init__(self, components: Dict[str, List[str]]):
+        self.components = components
+        self.modules: Dict[str, Set[str]] = {module: set(names) for module, names in CORE_MODULES.items()}
+        self.class_modules: Dict[str, List[str]] = {}
+        # provider -> category -> class names, e.g. {"gcp": {"compute": ["AppEngine", ...]}}
+        self.providers: Dict[str, Dict[str, List[str]]] = {}
+        # lower-cased class name -> fully qualified paths, for case-insensitive lookup
+        self.lower_names: Dict[str, List[str]] = {}
+
+        for provider, paths in components.items():
+            categories = self.providers.setdefault(provider, {})
+            for path in paths:
+                module, class_name = path.rsplit(".", 1)
+                self.modules.setdefault(module, set()).add(class_name)
+                self.class_modules.setdefault(class_name, []).append(module)
+                categories.setdefault(module.rsplit(".", 1)[1], []).append(class_name)
+                self.lower_names.setdefault(class_name.lower(), []).append(path)
+
+        # Parent packages (e.g. "diagrams.gcp") are importable too
+        self.packages: Set[str] = set()
+        for module in self.modules:
+            parts = module.split(".")
+            for i in range(1, len(parts)):
+                self.packages.add(".".join(parts[:i]))
+
+    def is_module(self, module: str) -> bool:
+        return module in self.modules or module in self.packages
+
+    def has_class(self, module: str, class_name: str) -> bool:
+        return class_name in self.modules.get(module, ())
+
+    def suggest(self, module: str, class_name: str) -> List[str]:
+        """
+        Returns fully qualified suggestions for an unknown class: the same class in
+        other modules first, then close spellings within the requested module.
+        """
+        suggestions = [f"{other}.{class_name}" for other in self.class_modules.get(class_name, [])]
+        for close in get_close_matches(class_name, sorted(self.modules.get(module, ())), n=3, cutoff=0.6):
+            suggestions.append(f"{module}.{close}")
+        return suggestions
+
+    def suggest_module(self, module: str) -> List[str]:
+        return get_close_matches(module, sorted(self.modules), n=3, cutoff=0.7)
+
+    def search(self, query: str, limit: int = 10) -> List[str]:
+        """
+        Fuzzy lookup of components by class name, e.g. "cloud sql" or "loadbalancer".
+        Exact (case-insensitive) matches come first, then substring matches, then
+        matches on the individual words of the query (rarest word first), then
+        close spellings.
+
+        Returns:
+            A list of fully qualified class paths.
+        """
+        key = query.lower().replace(" ", "").replace("_", "").replace("-", "")
+        if not key:
+            return []
+
+        results = list(self.lower_names.get(key, []))
+        for name, paths in self.lower_names.items():
+            if name != key and key in name:
+                results.extend(paths)
+
+        # Multi-word queries ("cloud sql") also match on each significant word
+        word_matches = []
+        for word in query.lower().split():
+            if len(word) > 2 and word != key:
+                word_matches.append([path for name, paths in self.lower_names.items() if word in name for path in paths])
+        for paths in sorted(word_matches, key=len):
+            results.extend(paths)
+
+        for name in get_close_matches(key, self.lower_names.keys(), n=limit, cutoff=0.6):
+            results.extend(self.lower_names[name])
+        return list(dict.fromkeys(results))[:limit]
+
+    def detect_providers(self, text: str) -> List[str]:
+        """
+        Returns the providers mentioned in a request (falling back to
+        DEFAULT_PROVIDERS), always together with BASE_PROVIDERS.
+        """
+        text = text.lower()
+        providers = [provider for provider, pattern in PROVIDER_PATTERNS.items() if pattern.search(text)]
+        return BASE_PROVIDERS + (providers or DEFAULT_PROVIDERS)
+
+    def compact_subset(self, providers: List[str]) -> Dict[str, Dict[str, str]]:
+        """
+        Compact listing of the given providers for the model prompt, e.g.
+        {"gcp": {"compute": "AppEngine, ComputeEngine, ..."}}, where the import path
+        is diagrams.<provider>.<category>.<ClassName>.
+        """
+        return {
+            provider: {category: ", ".join(names) for category, names in self.providers[provider].items()}
+            for provider in providers
+            if provider in self.providers
+        }
+
+
+_catalog: Optional[DiagramsCatalog] = None
+
+
+def get_catalog() -> DiagramsCatalog:
+    """
+    Loads 'diagrams_components.json' once per process and returns the indexed catalog.
+
+    Raises:
+        FileNotFoundError: If 'diagrams_components.json' does not exist.
+        json.JSONDecodeError: If the file cannot be parsed.
+    """
+    global _catalog
+    if _catalog is None:
+        with open(CATALOG_PATH, "r") as f:
+            _catalog = DiagramsCatalog(json.load(f))
+    return _catalog
@@ -16,17 +16,18 @@ with Diagram("My Diagram", show=False, filename="diagram") as diag:
 ** Strictly follow your workflow:
 1. Understand the context of cloud architecture design required
 2. Generate the python code that use Diagrams library (https://diagrams.mingrammer.com) that fulfill the required design, try your best to make sure it can visualize the design. For example, what resource should have connection to what and for what purpose.
-3. Get valid components from {valid_components}. The format is JSON:
+3. Get valid components from {valid_components}. It only lists the providers relevant to the request. The format is JSON of provider -> category -> class names:
     {
-    gcp: ["diagrams.gcp.storage.Filestore","diagrams.gcp.storage.PersistentDisk", "diagrams.gcp.storage.Storage"],
-    aws: ...
+    gcp: {"storage": "Filestore, PersistentDisk, Storage", "compute": "..."},
+    onprem: ...
 
     }
-    The key usually is the module, then the value inside is a list of available valid submodule. 
-4. From the code you generated in step 2, check your import component line against the valid components (Consider valid components are your source of truth for checking your component importing inside your generated code, if your import is not exist within that list of valid components, that means your import is wrong)
-5. If it is wrong import, then modify your code for that import and the part of the code that got affected.  
+    The import path is diagrams.<provider>.<category>.<ClassName>, for example `from diagrams.gcp.storage import Filestore`.
+    If you need a component that is not listed (e.g. another provider), use the search_diagrams_components tool to look it up by name.
+4. Call the validate_diagrams_code tool with the full code you generated in step 2. It parses the code without running it and checks every import line against the valid components. (Consider valid components are your source of truth for checking your component importing inside your generated code, if your import is not exist within that list of valid components, that means your import is wrong)
+5. If the tool returns "invalid", fix every reported error (it gives the line number and suggested valid components) and the part of the code that got affected.
 **Use Labels for Alternatives**: If an important component is unavailable, you may suggest using a label as an alternative way to represent it in the diagram, but do not import an invalid component.
-Repeat step 3 to 5 until you finish analyzing all the import line of code you generated.
+Repeat step 4 to 5 until validate_diagrams_code returns "valid".
 6. Finally, after done checking, return the code back to the requester
 
 ## Rules
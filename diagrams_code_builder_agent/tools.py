@@ -1,3 +1,4 @@
+import ast
 import json
 from typing import Dict, Any
 from pathlib import Path
@@ -6,29 +7,145 @@ from typing import Optional
 from google.genai import types
 from google.adk.agents.callback_context import CallbackContext
 
+from .catalog import get_catalog
+
 def validate_diagrams_import(callback_context: CallbackContext) -> Optional[types.Content]:
     """
-    Reads the 'diagrams_components.json' file and returns its contents.
+    Places the valid 'diagrams' components relevant to the request into state.
 
-    This tool is designed to be a data retriever for an agent, providing
-    a consistent and reliable way to access the list of valid 'diagrams'
-    components without performing live web crawling.
+    The catalog from 'diagrams_components.json' is loaded once per process (see
+    catalog.get_catalog). Only the providers mentioned in the request (or the
+    defaults) are put in state, in a compact provider -> category -> class names
+    form, to keep the session and the prompt small. Anything else can be looked
+    up with the search_diagrams_components tool.
 
     Returns:
-        A string status
+        None, so the agent runs normally.
     """
-    # Get the directory of the current script file
-    script_dir = Path(__file__).parent
-    json_path = script_dir / "diagrams_components.json"
-
     try:
-        with open(json_path, "r") as f:
-            valid_components = json.load(f)
-        callback_context.state["valid_components"] = valid_components
-        return None
+        catalog = get_catalog()
     except FileNotFoundError:
         print("Error: 'diagrams_components.json' not found. Please run the scraping script first.")
         return "Error: 'diagrams_components.json' not found. Please run the scraping script first."
     except json.JSONDecodeError:
         print("Error: Failed to parse 'diagrams_components.json'. Check file for corruption.")
         return "Error: Failed to parse 'diagrams_components.json'. Check file for corruption."
+
+    request_text = ""
+    user_content = callback_context.user_content
+    if user_content and user_content.parts:
+        request_text = " ".join(part.text for part in user_content.parts if part.text)
+
+    providers = catalog.detect_providers(request_text)
+    callback_context.state["valid_components"] = catalog.compact_subset(providers)
+    return None
+
+
+def search_diagrams_components(query: str) -> dict:
+    """
+    Searches all valid 'diagrams' components by (approximate) class name, across
+    every provider. Use it for components that are not listed in the valid
+    components given to you.
+
+    Args:
+        query: The component to look for, e.g. "memorystore", "load balancer" or "Lambda".
+
+    Returns:
+        A dict with the list of matching fully qualified import paths under "components".
+    """
+    try:
+        return {"status": "success", "components": get_catalog().search(query)}
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return {"status": "failed", "error": str(e)}
+
+
+def validate_diagrams_code(code_string: str) -> dict:
+    """
+    Statically checks generated 'diagrams' code without executing it. The code is
+    parsed with `ast` and every 'diagrams' import (and module attribute such as
+    `compute.Run`) is looked up in the valid components catalog.
+
+    Args:
+        code_string: The full Python code that uses the diagrams library.
+
+    Returns:
+        A dict with the status "valid" or "invalid", plus a list of "errors" with
+        line numbers and suggested replacements when invalid.
+    """
+    try:
+        tree = ast.parse(code_string)
+    except SyntaxError as e:
+        return {"status": "invalid", "errors": [f"Line {e.lineno}: SyntaxError: {e.msg}"]}
+
+    try:
+        catalog = get_catalog()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return {"status": "error", "errors": [f"Valid components catalog could not be loaded: {str(e)}"]}
+
+    errors = []
+    # Local names bound to a diagrams module, e.g. "compute" -> "diagrams.gcp.compute"
+    module_aliases = {}
+
+    def unknown_class(lineno, module, class_name):
+        message = f"Line {lineno}: '{module}.{class_name}' is not a valid component."
+        suggestions = catalog.suggest(module, class_name)
+        if suggestions:
+            message += f" Did you mean: {', '.join(suggestions)}?"
+        else:
+            message += " Use another component or a label instead."
+        errors.append(message)
+
+    def unknown_module(lineno, module):
+        message = f"Line {lineno}: module '{module}' does not exist."
+        suggestions = catalog.suggest_module(module)
+        if suggestions:
+            message += f" Did you mean: {', '.join(suggestions)}?"
+        errors.append(message)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom):
+            module = node.module or ""
+            if node.level or module.split(".")[0] != "diagrams":
+                continue
+            if not catalog.is_module(module):
+                unknown_module(node.lineno, module)
+                continue
+            for alias in node.names:
+                if alias.name == "*" or catalog.has_class(module, alias.name):
+                    continue
+                if catalog.is_module(f"{module}.{alias.name}"):
+                    module_aliases[alias.asname or alias.name] = f"{module}.{alias.name}"
+                    continue
+                unknown_class(node.lineno, module, alias.name)
+
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name.split(".")[0] != "diagrams":
+                    continue
+                if not catalog.is_module(alias.name):
+                    unknown_module(node.lineno, alias.name)
+                elif alias.asname:
+                    module_aliases[alias.asname] = alias.name
+                else:
+                    module_aliases["diagrams"] = "diagrams"
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Attribute):
+            continue
+        # Resolve the dotted prefix, e.g. `diagrams.gcp.compute` in `diagrams.gcp.compute.Run`
+        parts = []
+        value = node.value
+        while isinstance(value, ast.Attribute):
+            parts.append(value.attr)
+            value = value.value
+        if not isinstance(value, ast.Name) or value.id not in module_aliases:
+            continue
+        module = ".".join([module_aliases[value.id]] + parts[::-1])
+        if module not in catalog.modules or catalog.is_module(f"{module}.{node.attr}"):
+            continue
+        if not catalog.has_class(module, node.attr):
+            unknown_class(node.lineno, module, node.attr)
+
+    if errors:
+        return {"status": "invalid", "errors": list(dict.fromkeys(errors))}
+    return {"status": "valid"}
@@ -4,7 +4,7 @@ from google.adk.agents.remote_a2a_agent import RemoteA2aAgent
 from google.adk.tools.agent_tool import AgentTool
 from .instructions import instructions
 
-from .tools import generate_validation_report_from_markdown, execute_python_code
+from .tools import generate_validation_report_from_markdown, execute_python_code, render_architecture_diff
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -25,5 +25,5 @@ report_creation_agent = Agent(
     description='A helpful assistant for creating validation report',
     instruction=instructions,
     # sub_agents=[diagrams_code_builder_agent],
-    tools=[AgentTool(diagrams_code_builder_agent), generate_validation_report_from_markdown, execute_python_code]
+    tools=[AgentTool(diagrams_code_builder_agent), generate_validation_report_from_markdown, execute_python_code, render_architecture_diff]
 )
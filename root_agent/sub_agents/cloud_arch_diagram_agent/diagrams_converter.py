@@ -0,0 +1,455 @@
+"""
+Deterministic conversion of 'diagrams' Python code into the React Flow JSON
+(nodes/edges) used by the frontend, and of a graph model back into code.
+
+The code is never executed. It is parsed with `ast` and a small subset of
+Python is interpreted: imports, `with Diagram(...)` / `with Cluster(...)`
+blocks, assignments, lists, simple `for` loops and list comprehensions, and
+the `>>`, `<<` and `-` connection operators (optionally through `Edge(...)`).
+"""
+import ast
+import re
+from typing import Dict, Optional
+
+from .layout import layout_graph
+
+# Upper bound on loop iterations, so a `range(10000)` cannot blow up the graph
+MAX_ITERATIONS = 50
+
+CLUSTER_COLORS = [
+    "rgba(66, 133, 244, 0.08)",
+    "rgba(52, 168, 83, 0.08)",
+    "rgba(251, 188, 5, 0.10)",
+    "rgba(234, 67, 53, 0.08)",
+    "rgba(208, 208, 208, 0.2)",
+]
+
+
+# Used for nodes that have no renderable component (e.g. Custom nodes)
+FALLBACK_COMPONENT = "generic.blank.Blank"
+
+
+class DiagramsCodeError(ValueError):
+    """Raised when the code cannot be converted (syntax error or no diagram)."""
+
+
+class _NodeRef(str):
+    """Id of a node created by the code, distinct from plain strings."""
+
+
+class _EdgeSpec:
+    def __init__(self, label: str = "", color: str = "", style: str = ""):
+        self.label = label
+        self.color = color
+        self.style = style
+
+
+class _PendingEdge:
+    """Result of `node >> Edge(...)`, waiting for the right-hand side."""
+
+    def __init__(self, sources: list, spec: _EdgeSpec, op: type):
+        self.sources = sources
+        self.spec = spec
+        self.op = op
+
+
+class _Converter:
+    def __init__(self):
+        self.nodes = []
+        self.clusters = []
+        self.edges = []
+        self.cluster_stack = []
+        self.env = {}
+        # Local name -> component path without the "diagrams." prefix, e.g. "Run" -> "gcp.compute.Run"
+        self.components = {}
+        # Local name -> module path, e.g. "compute" -> "gcp.compute"
+        self.modules = {}
+        self.core = {}
+
+    # --- Imports -----------------------------------------------------------
+
+    def visit_import(self, node):
+        if isinstance(node, ast.ImportFrom):
+            module = node.module or ""
+            if node.level or module.split(".")[0] != "diagrams":
+                return
+            for alias in node.names:
+                local = alias.asname or alias.name
+                if module in ("diagrams", "diagrams.custom") and alias.name in ("Diagram", "Cluster", "Edge", "Custom"):
+                    self.core[local] = alias.name
+                elif module.count(".") >= 2:
+                    self.components[local] = f"{module[len('diagrams.'):]}.{alias.name}"
+                else:
+                    self.modules[local] = f"{module}.{alias.name}"[len("diagrams."):]
+        else:
+            for alias in node.names:
+                if alias.name.split(".")[0] != "diagrams":
+                    continue
+                if alias.asname:
+                    self.modules[alias.asname] = alias.name[len("diagrams."):] if alias.name != "diagrams" else ""
+                else:
+                    self.modules["diagrams"] = ""
+
+    def resolve_callable(self, func) -> Optional[str]:
+        """Returns "Diagram", "Cluster", "Edge", "Custom" or a component path for a call target."""
+        if isinstance(func, ast.Name):
+            return self.core.get(func.id) or self.components.get(func.id)
+        if isinstance(func, ast.Attribute):
+            parts = []
+            value = func
+            while isinstance(value, ast.Attribute):
+                parts.append(value.attr)
+                value = value.value
+            if isinstance(value, ast.Name) and value.id in self.modules:
+                path = ".".join(p for p in [self.modules[value.id]] + parts[::-1] if p)
+                if path in ("Diagram", "Cluster", "Edge", "custom.Custom"):
+                    return path.split(".")[-1]
+                return path if path.count(".") >= 2 else None
+        return None
+
+    # --- Statements --------------------------------------------------------
+
+    def visit_body(self, body):
+        for statement in body:
+            self.visit(statement)
+
+    def visit(self, statement):
+        if isinstance(statement, (ast.Import, ast.ImportFrom)):
+            self.visit_import(statement)
+        elif isinstance(statement, ast.With):
+            self.visit_with(statement)
+        elif isinstance(statement, ast.Assign):
+            value = self.evaluate(statement.value)
+            for target in statement.targets:
+                self.bind(target, value)
+        elif isinstance(statement, ast.AnnAssign) and statement.value is not None:
+            self.bind(statement.target, self.evaluate(statement.value))
+        elif isinstance(statement, ast.Expr):
+            self.evaluate(statement.value)
+        elif isinstance(statement, ast.For):
+            for item in self.iterate(statement.iter):
+                self.bind(statement.target, item)
+                self.visit_body(statement.body)
+        elif isinstance(statement, (ast.If, ast.Try)):
+            self.visit_body(statement.body)
+        elif isinstance(statement, ast.FunctionDef) and statement.name == "main":
+            self.visit_body(statement.body)
+
+    def visit_with(self, statement):
+        pushed = 0
+        for item in statement.items:
+            call = item.context_expr
+            kind = self.resolve_callable(call.func) if isinstance(call, ast.Call) else None
+            if kind == "Cluster":
+                cluster = {
+                    "id": f"cluster_{len(self.clusters) + 1}",
+                    "label": self.label_of(call, "Cluster"),
+                    "parent": self.cluster_stack[-1] if self.cluster_stack else None,
+                    "color": self.graph_attr_color(call),
+                }
+                self.clusters.append(cluster)
+                self.cluster_stack.append(cluster["id"])
+                pushed += 1
+        self.visit_body(statement.body)
+        for _ in range(pushed):
+            self.cluster_stack.pop()
+
+    def bind(self, target, value):
+        if isinstance(target, ast.Name):
+            self.env[target.id] = value
+        elif isinstance(target, (ast.Tuple, ast.List)) and isinstance(value, list):
+            for sub_target, sub_value in zip(target.elts, value):
+                self.bind(sub_target, sub_value)
+
+    def iterate(self, expression) -> list:
+        if isinstance(expression, ast.Call) and isinstance(expression.func, ast.Name):
+            if expression.func.id == "range":
+                args = [self.evaluate(arg) for arg in expression.args]
+                if args and all(isinstance(arg, int) for arg in args):
+                    return list(range(*args)[:MAX_ITERATIONS])
+            if expression.func.id == "enumerate" and expression.args:
+                return [[i, item] for i, item in enumerate(self.iterate(expression.args[0]))]
+        value = self.evaluate(expression)
+        if isinstance(value, list):
+            return value[:MAX_ITERATIONS]
+        return []
+
+    # --- Expressions -------------------------------------------------------
+
+    def evaluate(self, expression):
+        if isinstance(expression, ast.Constant):
+            return expression.value
+        if isinstance(expression, ast.Name):
+            return self.env.get(expression.id)
+        if isinstance(expression, ast.JoinedStr):
+            return "".join(
+                str(self.evaluate(value.value)) if isinstance(value, ast.FormattedValue) else str(value.value)
+                for value in expression.values
+            )
+        if isinstance(expression, (ast.List, ast.Tuple, ast.Set)):
+            return [self.evaluate(element) for element in expression.elts]
+        if isinstance(expression, ast.ListComp) and len(expression.generators) == 1:
+            generator = expression.generators[0]
+            items = []
+            for item in self.iterate(generator.iter):
+                self.bind(generator.target, item)
+                items.append(self.evaluate(expression.elt))
+            return items
+        if isinstance(expression, ast.Subscript):
+            container = self.evaluate(expression.value)
+            index = self.evaluate(expression.slice)
+            if isinstance(container, list) and isinstance(index, int) and -len(container) <= index < len(container):
+                return container[index]
+            return None
+        if isinstance(expression, ast.BinOp):
+            if isinstance(expression.op, (ast.RShift, ast.LShift, ast.Sub)):
+                return self.connect(self.evaluate(expression.left), self.evaluate(expression.right), type(expression.op))
+            left, right = self.evaluate(expression.left), self.evaluate(expression.right)
+            if isinstance(expression.op, ast.Add) and isinstance(left, (int, str)) and type(left) is type(right):
+                return left + right
+            return None
+        if isinstance(expression, ast.Call):
+            return self.evaluate_call(expression)
+        return None
+
+    def evaluate_call(self, call):
+        kind = self.resolve_callable(call.func)
+        if kind == "Edge":
+            kwargs = {keyword.arg: self.evaluate(keyword.value) for keyword in call.keywords if keyword.arg}
+            return _EdgeSpec(
+                label=str(kwargs.get("label") or ""),
+                color=str(kwargs.get("color") or ""),
+                style=str(kwargs.get("style") or ""),
+            )
+        if kind in (None, "Diagram", "Cluster"):
+            return None
+
+        component = "custom" if kind == "Custom" else kind
+        node_id = _NodeRef(f"node_{len(self.nodes) + 1}")
+        self.nodes.append({
+            "id": node_id,
+            "label": self.label_of(call, component.split(".")[-1]),
+            "component": component,
+            "parent": self.cluster_stack[-1] if self.cluster_stack else None,
+        })
+        return node_id
+
+    def connect(self, left, right, op):
+        if isinstance(right, _EdgeSpec):
+            return _PendingEdge(self.node_ids(left), right, op)
+        if isinstance(left, _PendingEdge):
+            self.add_edges(left.sources, self.node_ids(right), left.op, left.spec)
+        else:
+            self.add_edges(self.node_ids(left), self.node_ids(right), op, _EdgeSpec())
+        return right
+
+    def add_edges(self, sources, targets, op, spec):
+        for source in sources:
+            for target in targets:
+                # `a << b` draws the arrow from b to a
+                if op is ast.LShift:
+                    source, target = target, source
+                self.edges.append({
+                    "source": source,
+                    "target": target,
+                    "label": spec.label,
+                    "color": spec.color,
+                    "style": spec.style,
+                    "directed": op is not ast.Sub,
+                })
+
+    def node_ids(self, value) -> list:
+        if isinstance(value, _NodeRef):
+            return [value]
+        if isinstance(value, _PendingEdge):
+            return value.sources
+        if isinstance(value, list):
+            return [node_id for item in value for node_id in self.node_ids(item)]
+        return []
+
+    def label_of(self, call, default: str) -> str:
+        label = self.evaluate(call.args[0]) if call.args else None
+        for keyword in call.keywords:
+            if keyword.arg == "label":
+                label = self.evaluate(keyword.value)
+        return str(label) if label not in (None, "") else default
+
+    def graph_attr_color(self, call) -> str:
+        for keyword in call.keywords:
+            if keyword.arg == "graph_attr" and isinstance(keyword.value, ast.Dict):
+                for key, value in zip(keyword.value.keys, keyword.value.values):
+                    if self.evaluate(key) in ("bgcolor", "fillcolor"):
+                        return str(self.evaluate(value) or "")
+        return ""
+
+
+def parse_diagrams_code(code_string: str) -> dict:
+    """
+    Parses 'diagrams' code into a graph model.
+
+    Args:
+        code_string: The Python code using the diagrams library.
+
+    Returns:
+        A dict with "nodes" ({id, label, component, parent}), "clusters"
+        ({id, label, parent, color}) and "edges" ({source, target, label, color,
+        style, directed}). `parent` is the id of the enclosing cluster or None.
+
+    Raises:
+        DiagramsCodeError: If the code does not parse or defines no diagram nodes.
+    """
+    try:
+        tree = ast.parse(code_string)
+    except SyntaxError as e:
+        raise DiagramsCodeError(f"Syntax error at line {e.lineno}: {e.msg}") from e
+
+    converter = _Converter()
+    converter.visit_body(tree.body)
+    if not converter.nodes:
+        raise DiagramsCodeError("No diagrams nodes found in the code.")
+
+    return {"nodes": converter.nodes, "clusters": converter.clusters, "edges": converter.edges}
+
+
+def to_react_flow(graph: dict, direction: str = "LR") -> dict:
+    """
+    Emits the React Flow JSON for a graph model from `parse_diagrams_code`.
+
+    Clusters become nodes of type "group" listed before their children, and
+    child nodes carry `parentNode` and `extent: "parent"`. Positions and group
+    sizes come from `layout.layout_graph`.
+
+    Returns:
+        A dict with "nodes" and "edges" in the React Flow format.
+    """
+    positions, sizes = layout_graph(graph, direction)
+    depth = {}
+    for cluster in graph["clusters"]:
+        depth[cluster["id"]] = depth.get(cluster["parent"], -1) + 1
+
+    nodes = []
+    for cluster in graph["clusters"]:
+        node = {
+            "id": cluster["id"],
+            "type": "group",
+            "data": {"label": cluster["label"]},
+            "position": positions[cluster["id"]],
+            "style": {
+                "width": sizes[cluster["id"]]["width"],
+                "height": sizes[cluster["id"]]["height"],
+                "backgroundColor": cluster["color"] or CLUSTER_COLORS[depth[cluster["id"]] % len(CLUSTER_COLORS)],
+            },
+            "zIndex": -1,
+        }
+        if cluster["parent"]:
+            node["parentNode"] = cluster["parent"]
+            node["extent"] = "parent"
+        nodes.append(node)
+
+    for item in graph["nodes"]:
+        node = {
+            "id": item["id"],
+            "type": "default",
+            "position": positions[item["id"]],
+            "data": {"label": item["label"], "component": item["component"]},
+        }
+        if item["parent"]:
+            node["parentNode"] = item["parent"]
+            node["extent"] = "parent"
+        nodes.append(node)
+
+    edges = []
+    used_ids = set()
+    for edge in graph["edges"]:
+        # Parallel edges between the same nodes (e.g. with different labels) get "-2", "-3"... suffixes
+        base_id = edge_id = f"e-{edge['source']}-{edge['target']}"
+        number = 1
+        while edge_id in used_ids:
+            number += 1
+            edge_id = f"{base_id}-{number}"
+        used_ids.add(edge_id)
+        flow_edge = {
+            "id": edge_id,
+            "source": edge["source"],
+            "target": edge["target"],
+            "label": edge["label"],
+            "animated": edge["style"] == "dashed",
+        }
+        if edge["color"]:
+            flow_edge["style"] = {"stroke": edge["color"]}
+        if edge["directed"]:
+            flow_edge["markerEnd"] = {"type": "arrowclosed"}
+        edges.append(flow_edge)
+
+    return {"nodes": nodes, "edges": edges}
+
+
+def diagrams_code_to_react_flow(code_string: str) -> dict:
+    """
+    Converts 'diagrams' code straight into the React Flow JSON.
+
+    Raises:
+        DiagramsCodeError: If the code cannot be converted.
+    """
+    return to_react_flow(parse_diagrams_code(code_string))
+
+
+def graph_to_diagrams_code(graph: dict, title: str = "Architecture", direction: str = "LR") -> str:
+    """
+    Generates 'diagrams' code for a graph model in the `parse_diagrams_code`
+    format, the inverse of the parsing. Optional extra keys are honoured:
+    "attrs" on nodes (graphviz node attributes, e.g. fontcolor) and "graph_attr"
+    on clusters (e.g. bgcolor, used instead of "color").
+
+    Returns:
+        The Python code, ready to be rendered.
+    """
+    def component_of(node):
+        return node["component"] if node["component"].count(".") >= 2 else FALLBACK_COMPONENT
+
+    imports, aliases = {}, {}
+    for node in graph["nodes"]:
+        component = component_of(node)
+        if component not in aliases:
+            module, class_name = component.rsplit(".", 1)
+            aliases[component] = re.sub(r"\W", "_", component)
+            imports.setdefault(module, []).append(f"{class_name} as {aliases[component]}")
+
+    lines = ["from diagrams import Diagram, Cluster, Edge"]
+    lines += [f"from diagrams.{module} import {', '.join(names)}" for module, names in imports.items()]
+    lines += ["", f"with Diagram({title!r}, show=False, direction={direction!r}):"]
+
+    children: Dict[Optional[str], list] = {}
+    for cluster in graph["clusters"]:
+        children.setdefault(cluster["parent"], []).append(("cluster", cluster))
+    for node in graph["nodes"]:
+        children.setdefault(node["parent"], []).append(("node", node))
+
+    # Node ids are not always valid Python names
+    variables = {}
+
+    def emit(parent, indent):
+        for kind, item in children.get(parent, []):
+            if kind == "cluster":
+                graph_attr = item.get("graph_attr") or ({"bgcolor": item["color"]} if item.get("color") else {})
+                lines.append(f"{indent}with Cluster({item['label']!r}, graph_attr={graph_attr!r}):")
+                before = len(lines)
+                emit(item["id"], indent + "    ")
+                if len(lines) == before:
+                    lines.append(f"{indent}    pass")
+            else:
+                variables[item["id"]] = f"n{len(variables) + 1}"
+                attrs = "".join(f", {key}={value!r}" for key, value in (item.get("attrs") or {}).items())
+                lines.append(f"{indent}{variables[item['id']]} = {aliases[component_of(item)]}({item['label']!r}{attrs})")
+
+    emit(None, "    ")
+
+    for edge in graph["edges"]:
+        if edge["source"] not in variables or edge["target"] not in variables:
+            continue
+        attrs = {key: edge[key] for key in ("label", "color", "style") if edge.get(key)}
+        operator = ">>" if edge.get("directed", True) else "-"
+        edge_args = ", ".join(f"{key}={value!r}" for key, value in attrs.items())
+        lines.append(f"    {variables[edge['source']]} {operator} Edge({edge_args}) {operator} {variables[edge['target']]}")
+
+    return "\n".join(lines) + "\n"
@@ -2,10 +2,19 @@ from google.adk.tools import ToolContext
 import google.genai.types as types
 import ast
 import os
+import re
 import base64
+import html
+import mimetypes
 import traceback
 import subprocess
 import sys
+import tempfile
+from typing import Optional
+
+from .diagrams_converter import graph_to_diagrams_code
+from ..gcp_agent.tools import load_inventory_index
+from ..gcp_agent.inventory_diagram import inventory_to_graph
 
 # async def save_image_to_artifact(base64_string: str, tool_context: ToolContext) -> str:
 #     """
@@ -69,53 +78,210 @@ import sys
     
 #     return "Failed: No image artifact found in the tool context."
 
-async def execute_python_code(code_string: str, tool_context: ToolContext) -> str:
+# Diagrams always writes "<filename>.<format>", so the rendered files are
+# looked up with this base name inside the temporary working directory.
+DIAGRAM_BASENAME = "diagram"
+
+SUPPORTED_OUTPUT_FORMATS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+# Prepended to the generated code so the output format, DPI and filename are
+# controlled by the tool instead of whatever the generated code asked for.
+RENDER_PRELUDE = '''
+import inspect as _inspect
+import diagrams as _diagrams
+
+_diagram_init = _diagrams.Diagram.__init__
+
+def _render_init(self, *args, **kwargs):
+    bound = _inspect.signature(_diagram_init).bind(self, *args, **kwargs)
+    bound.arguments["filename"] = {basename!r}
+    bound.arguments["outformat"] = {formats!r}
+    bound.arguments["show"] = False
+    graph_attr = dict(bound.arguments.get("graph_attr") or {{}})
+    graph_attr["dpi"] = {dpi!r}
+    bound.arguments["graph_attr"] = graph_attr
+    _diagram_init(*bound.args, **bound.kwargs)
+
+_diagrams.Diagram.__init__ = _render_init
+'''
+
+
+# Node icons in the SVG written by graphviz, e.g. <image xlink:href="/.../resources/gcp/compute/gce.png" .../>
+SVG_IMAGE_HREF = re.compile(rb'(<image\b[^>]*?\b(?:xlink:)?href=")([^"]+)(")')
+
+
+def inline_svg_images(svg: bytes, base_dir: str) -> bytes:
     """
-    Executes Python code, reads the generated image, and saves it to an artifact.
-    
+    Replaces the file paths of the node icons in an SVG by data URIs, so the SVG
+    still shows them once it leaves this machine, e.g. embedded in the PDF report
+    as a data URI or downloaded from the chat.
+
+    Args:
+        svg: The SVG bytes.
+        base_dir: The directory relative paths are resolved from.
+
     Returns:
-        A string indicating success or failure.
+        The SVG bytes, with every readable icon inlined.
     """
-    image_filename = "diagram.png"
-    
-    # Get the path to the current Python interpreter from the virtual environment
-    python_executable = sys.executable
+    def inline(match):
+        href = html.unescape(match.group(2).decode())
+        if href.startswith(("data:", "http:", "https:")):
+            return match.group(0)
+        path = os.path.join(base_dir, href.removeprefix("file://"))
+        if not os.path.isfile(path):
+            return match.group(0)
+        mime_type = mimetypes.guess_type(path)[0] or "image/png"
+        with open(path, "rb") as f:
+            data = base64.b64encode(f.read())
+        return match.group(1) + f"data:{mime_type};base64,".encode() + data + match.group(3)
 
-    try:
+    return SVG_IMAGE_HREF.sub(inline, svg)
+
+
+def render_diagram(code_string: str, output_formats: list, dpi: int) -> dict:
+    """
+    Runs the diagrams code in a separate interpreter inside a temporary directory
+    and collects the rendered files.
+
+    Args:
+        code_string: The Python code using the diagrams library.
+        output_formats: The formats to render, any of "png" and "svg".
+        dpi: The resolution used for raster output.
+
+    Returns:
+        A dict mapping each output format to the rendered bytes, the SVG with its
+        icons inlined.
+
+    Raises:
+        SyntaxError: If the code does not parse, checked before any process is spawned.
+    """
+    ast.parse(code_string)
+
+    prelude = RENDER_PRELUDE.format(basename=DIAGRAM_BASENAME, formats=list(output_formats), dpi=str(dpi))
+
+    with tempfile.TemporaryDirectory() as work_dir:
         # Run the Python code using the same interpreter as the agent
         subprocess.run(
-            [python_executable, "-c", code_string],
+            [sys.executable, "-c", prelude + code_string],
             capture_output=True,
             text=True,
             check=True,
-            timeout=60
+            timeout=60,
+            cwd=work_dir
         )
-        
-        with open(image_filename, "rb") as f:
-            image_bytes = f.read()
-            
+
+        rendered = {}
+        for output_format in output_formats:
+            with open(os.path.join(work_dir, f"{DIAGRAM_BASENAME}.{output_format}"), "rb") as f:
+                rendered[output_format] = f.read()
+        if "svg" in rendered:
+            rendered["svg"] = inline_svg_images(rendered["svg"], work_dir)
+        return rendered
+
+
+async def save_rendered_images(rendered: dict, tool_context: ToolContext) -> list:
+    """
+    Saves the images from render_diagram to artifacts, under a new
+    "received_file_<id>" name so the chat displays them.
+
+    Returns:
+        The saved filenames with their version.
+    """
+    unique_id = os.urandom(4).hex()
+    saved = []
+    for output_format, image_bytes in rendered.items():
         image_artifact = types.Part(
             inline_data=types.Blob(
                 data=image_bytes,
-                mime_type="image/png"
+                mime_type=SUPPORTED_OUTPUT_FORMATS[output_format]
             )
         )
-        output_filename = f"received_file_{os.urandom(4).hex()}.png"
+        output_filename = f"received_file_{unique_id}.{output_format}"
         version = await tool_context.save_artifact(
             filename=output_filename,
             artifact=image_artifact
         )
-        
-        return f"Success - Image saved to artifact with version {version}. Filename: {output_filename}"
-    
+        saved.append(f"{output_filename} (version {version})")
+    return saved
+
+
+async def execute_python_code(code_string: str, tool_context: ToolContext, output_formats: Optional[list[str]] = None, dpi: int = 96) -> str:
+    """
+    Executes Python code, reads the generated image(s), and saves them to artifacts.
+
+    Args:
+        code_string: The Python code to be executed.
+        output_formats: The image formats to produce, "png" and/or "svg". Defaults to ["png"]. SVG is much smaller and stays sharp when embedded in documents.
+        dpi: The resolution of the PNG output. Defaults to 96.
+
+    Returns:
+        A string indicating success or failure.
+    """
+    output_formats = [output_format.lower().lstrip(".") for output_format in (output_formats or ["png"])]
+    unsupported = [output_format for output_format in output_formats if output_format not in SUPPORTED_OUTPUT_FORMATS]
+    if unsupported:
+        return f"Error: Unsupported output format(s) {unsupported}. Use any of {list(SUPPORTED_OUTPUT_FORMATS)}."
+
+    try:
+        rendered = render_diagram(code_string, output_formats, dpi)
+        saved = await save_rendered_images(rendered, tool_context)
+        return f"Success - Image saved to artifact. Filename: {', '.join(saved)}"
+
+    except SyntaxError as e:
+        return f"Python code has a syntax error at line {e.lineno}: {e.msg}"
+    except subprocess.CalledProcessError as e:
+        return f"Python code execution failed with error: {e.stderr}"
+    except FileNotFoundError as e:
+        return f"Error: Code executed but the file '{os.path.basename(e.filename or DIAGRAM_BASENAME)}' was not found."
+    except Exception as e:
+        error_details = traceback.format_exc()
+        return f"An unexpected error occurred: {str(e)}\n{error_details}"
+
+
+async def diagram_gcp_inventory(tool_context: ToolContext, output_formats: Optional[list[str]] = None, dpi: int = 96) -> str:
+    """
+    Draws the architecture diagram of the last GCP inventory of the session
+    (from gcp_agent) directly, without generating the code with an LLM: asset
+    types are mapped to diagrams components, VPC networks and subnets become
+    clusters, and managed instance groups group their instances.
+
+    Args:
+        output_formats: The image formats to produce, "png" and/or "svg". Defaults to ["png"].
+        dpi: The resolution of the PNG output. Defaults to 96.
+
+    Returns:
+        A string indicating success or failure, with the asset types left out and
+        the generated diagrams code (which diagrams_code_builder_agent can modify).
+    """
+    output_formats = [output_format.lower().lstrip(".") for output_format in (output_formats or ["png"])]
+    unsupported = [output_format for output_format in output_formats if output_format not in SUPPORTED_OUTPUT_FORMATS]
+    if unsupported:
+        return f"Error: Unsupported output format(s) {unsupported}. Use any of {list(SUPPORTED_OUTPUT_FORMATS)}."
+
+    try:
+        index = await load_inventory_index(tool_context)
+        if index is None:
+            return "Error: No GCP inventory found in this session, the gcp_agent has to list the project resources first."
+
+        graph = inventory_to_graph(index.resources)
+        skipped = graph.pop("skipped")
+        if not graph["nodes"]:
+            return f"Error: None of the inventoried resources can be drawn. Asset types found: {list(skipped)}"
+
+        code_string = graph_to_diagrams_code(graph, title="GCP Inventory")
+        rendered = render_diagram(code_string, output_formats, dpi)
+        saved = await save_rendered_images(rendered, tool_context)
+        return (
+            f"Success - Image saved to artifact. Filename: {', '.join(saved)}\n"
+            f"Asset types not drawn: {skipped}\n\n"
+            f"Diagrams code:\n{code_string}"
+        )
+
     except subprocess.CalledProcessError as e:
         return f"Python code execution failed with error: {e.stderr}"
-    except FileNotFoundError:
-        return f"Error: Code executed but the file '{image_filename}' was not found."
     except Exception as e:
         error_details = traceback.format_exc()
         return f"An unexpected error occurred: {str(e)}\n{error_details}"
-    finally:
-        # Clean up the generated image file to avoid clutter.
-        if os.path.exists(image_filename):
-            os.remove(image_filename)
\ No newline at end of file
@@ -20,8 +20,11 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from reportlab.lib import colors
 
 import markdown
-from weasyprint import HTML, CSS
-from weasyprint.text.fonts import FontConfiguration
+# Run as a script by the MCP server, imported as part of the package otherwise
+try:
+    from .pdf_renderer import render_pdf, DOCUMENT_CSS
+except ImportError:
+    from pdf_renderer import render_pdf, DOCUMENT_CSS
 
 from fastmcp import FastMCP
 
@@ -524,107 +527,10 @@ def generate_pdf_from_markdown(content):
     # 1. Convert Markdown to HTML
     html_content = markdown.markdown(content, extensions=['tables', 'fenced_code'])
 
-    # 2. Add inline CSS for styling the HTML
-    # WeasyPrint works best with CSS for styling.
-    css_string = """
-    @page {
-        size: A4;
-        margin: 0.5in;
-    }
-    body {
-        font-family: 'Helvetica', sans-serif;
-        font-size: 12pt;
-        line-height: 1.5;
-        color: #333333;
-    }
-    h1 {
-        font-size: 24pt;
-        color: #2a4365;
-        text-align: center;
-        margin-top: 1em;
-        margin-bottom: 0.5em;
-        padding-bottom: 0.2em;
-        border-bottom: 2px solid #e2e8f0;
-    }
-    h2 {
-        font-size: 18pt;
-        color: #4a5568;
-        margin-top: 1.5em;
-        margin-bottom: 0.5em;
-    }
-    h3 {
-        font-size: 16pt;
-        color: #718096;
-        margin-top: 1.5em;
-        margin-bottom: 0.5em;
-    }
-    h4 {
-        font-size: 14pt;
-        color: #a0aec0;
-        margin-top: 1.5em;
-        margin-bottom: 0.5em;
-    }
-    p {
-        margin-top: 0.5em;
-        margin-bottom: 1em;
-        text-align: justify;
-    }
-    table {
-        border-collapse: collapse;
-        width: 100%;
-        margin-top: 1em;
-        margin-bottom: 1em;
-    }
-    th, td {
-        border: 1px solid #e2e8f0;
-        padding: 8px;
-        text-align: left;
-    }
-    th {
-        background-color: #4a5568;
-        color: white;
-        font-weight: bold;
-    }
-    tr:nth-child(even) {
-        background-color: #f7fafc;
-    }
-    code {
-        font-family: 'Courier New', Courier, monospace;
-        background-color: #e2e8f0;
-        padding: 2px 4px;
-        border-radius: 4px;
-    }
-    pre {
-        background-color: #e2e8f0;
-        padding: 10px;
-        border-radius: 8px;
-        overflow-x: auto;
-    }
-    """
-    
-    # Create the complete HTML document
-    full_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Generated PDF</title>
-        <style>{css_string}</style>
-    </head>
-    <body>
-        {html_content}
-    </body>
-    </html>
-    """
-
-    # 3. Use WeasyPrint to render the HTML to PDF
-    # Configure fonts to avoid rendering issues
-    font_config = FontConfiguration()
-    
-    # Create an HTML object and render it to a PDF
-    html = HTML(string=full_html, base_url='.')
-    pdf_bytes = html.write_pdf(stylesheets=[CSS(string=css_string, font_config=font_config)])
+    # 2. Render the HTML to PDF with the shared stylesheet and fonts
+    pdf_bytes = render_pdf(html_content, DOCUMENT_CSS)
 
-    # 4. Save the PDF to a file
+    # 3. Save the PDF to a file
     with open("output.pdf", 'wb') as f:
         f.write(pdf_bytes)
 
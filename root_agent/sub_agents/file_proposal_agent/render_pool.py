@@ -0,0 +1,77 @@
+"""
+Bounded process pool for the CPU-heavy document renders (WeasyPrint PDFs and
+python-docx documents), so a long proposal is rendered outside the event loop
+and does not stall the chat turns of the other sessions.
+
+Workers are started with "spawn", which is safe from a process running the
+event loop and other threads, and keep their own renderer caches (see
+pdf_renderer.py) between renders.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", "2"))
+
+# Seconds a render may take, including the time waiting for a free worker
+RENDER_TIMEOUT = float(os.environ.get("RENDER_TIMEOUT", "120"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """
+    Stops the workers of a pool, e.g. one stuck on a render that timed out,
+    since a running task cannot be cancelled. Renders still running in it fail,
+    the next ones start a new pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+async def run_render(function: Callable, *args: Any, timeout: float = RENDER_TIMEOUT) -> Any:
+    """
+    Runs a render in the process pool.
+
+    Args:
+        function: A module-level function, so it can be sent to the worker, e.g. `render_pdf`.
+        *args: Its (picklable) arguments.
+        timeout: The seconds to wait for the result.
+
+    Returns:
+        The result of the function.
+
+    Raises:
+        TimeoutError: The render did not finish in time.
+    """
+    pool = _get_pool()
+    future = pool.submit(function, *args)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        # A render still waiting for a worker is just dropped
+        if not future.cancel() and not future.done():
+            _discard_pool(pool)
+        raise TimeoutError(f"Rendering did not finish within {timeout:g} seconds.")
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
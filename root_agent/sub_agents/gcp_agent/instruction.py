@@ -3,5 +3,8 @@ agent_instructions="""
     You should delegate back to your parent agent after finish task or encounter error or if you not comfortable or not capable to fulfill the user request.
     
     Tools available to you:
-    1. list_gcp_project_resources: You should use this tools if you need to see what are the resources being used in the user Google Cloud Platform. The tool will provide the list of every resources. So you should be smart enough to filter based on user request or query before delegate back to parent agent. By default you should shall all. At the beginning, you can first check whether is it already available inside {resources_queried}. That means it already queried before. 
+    1. list_gcp_project_resources: You should use this tools if you need to see what are the resources being used in the user Google Cloud Platform. The tool will provide a summary of the resources: counts by asset type (with locations, states and a few example names), by location, by network and by labels. So you should be smart enough to filter based on user request or query before delegate back to parent agent. The list stops at max_resources (2000 by default), when "truncated" is true tell the user the list is partial and call the tool again with a higher max_resources only if the user needs the full list. Calling the tool again is cheap: only the resources updated since the previous call are downloaded. Use full_refresh only when the user says resources were deleted or asks for a full re-scan. By default you should shall all. At the beginning, you can first check whether is it already available inside {resources_queried}. That means it already queried before. (it holds the summary)
+    2. list_gcp_resources: Use this tool instead of list_gcp_project_resources when the user asks about several projects, a folder or the whole organization. Pass all the scopes at once (e.g. ["project-a", "project-b", "folders/123", "organizations/456"]) rather than calling list_gcp_project_resources once per project; it returns a single merged summary and the result of each scope.
+    3. query_gcp_resources: For follow-up questions on the inventory (e.g. "which VMs are in us-central1 without labels", "what is tagged http-server", "which instances are stopped"), use this tool with the filters (asset_type, location, label, network_tag, network, state, unlabeled) instead of reading the inventory yourself or querying GCP again. It answers from the last inventory.
+    4. get_inventory_resources: The full list of resources is kept aside, use this tool to get all the details (including attributes) of the resources of one asset type when query_gcp_resources is not enough to answer.
 """
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+In-memory index over inventoried resources, so follow-up questions such as
+"which VMs are in us-central1 without labels" are answered by set
+intersections instead of having the model read the whole inventory.
+"""
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from .inventory import resource_networks, short_name
+
+# Inventories kept in memory per process, the least recently used are dropped
+MAX_CACHED_INDEXES = 16
+
+# Fields returned for each resource by a query, the rest stays in the inventory artifact
+COMPACT_FIELDS = ("name", "asset_type", "display_name", "location", "state", "labels", "network_tags")
+
+
+def _region(location: str) -> Optional[str]:
+    """Region of a zone, e.g. "us-central1-a" -> "us-central1"."""
+    match = re.fullmatch(r"([a-z]+-[a-z]+\d+)-[a-z]", location)
+    return match.group(1) if match else None
+
+
+class ResourceIndex:
+    """
+    Indexes resources (`ResourceSearchResult.to_dict` output) by asset type, location,
+    label, network tag, network and state. Every key is lower-cased, and maps to
+    the set of positions of the matching resources.
+    """
+
+    def __init__(self, resources: List[dict]):
+        self.resources = resources
+        self.by_asset_type: Dict[str, Set[int]] = {}
+        self.by_location: Dict[str, Set[int]] = {}
+        self.by_label: Dict[str, Set[int]] = {}
+        self.by_network_tag: Dict[str, Set[int]] = {}
+        self.by_network: Dict[str, Set[int]] = {}
+        self.by_state: Dict[str, Set[int]] = {}
+        self.unlabeled: Set[int] = set()
+
+        for position, resource in enumerate(resources):
+            asset_type = (resource.get("asset_type") or "").lower()
+            # "compute.googleapis.com/Instance" is also found as "Instance"
+            self._add(self.by_asset_type, position, asset_type, short_name(asset_type))
+
+            location = (resource.get("location") or "global").lower()
+            self._add(self.by_location, position, location, _region(location))
+
+            labels = resource.get("labels") or {}
+            if not labels:
+                self.unlabeled.add(position)
+            for key, value in labels.items():
+                self._add(self.by_label, position, key.lower(), f"{key}={value}".lower())
+
+            self._add(self.by_network_tag, position, *(tag.lower() for tag in resource.get("network_tags") or []))
+            self._add(self.by_network, position, *(network.lower() for network in resource_networks(resource)))
+            self._add(self.by_state, position, (resource.get("state") or "").lower())
+
+    @staticmethod
+    def _add(index: Dict[str, Set[int]], position: int, *keys: Optional[str]):
+        for key in keys:
+            if key:
+                index.setdefault(key, set()).add(position)
+
+    def query(
+        self,
+        asset_type: Optional[str] = None,
+        location: Optional[str] = None,
+        label: Optional[str] = None,
+        network_tag: Optional[str] = None,
+        network: Optional[str] = None,
+        state: Optional[str] = None,
+        unlabeled: bool = False,
+    ) -> List[dict]:
+        """
+        Returns the resources matching every given filter, in inventory order.
+        `location` matches a zone, or every zone of a region; `label` is a key
+        ("env") or a key=value pair ("env=prod").
+        """
+        filters = [
+            (self.by_asset_type, asset_type),
+            (self.by_location, location),
+            (self.by_label, label),
+            (self.by_network_tag, network_tag),
+            (self.by_network, network),
+            (self.by_state, state),
+        ]
+        matches = [index.get(value.strip().lower(), set()) for index, value in filters if value]
+        if unlabeled:
+            matches.append(self.unlabeled)
+        if not matches:
+            return list(self.resources)
+
+        # Intersect starting from the smallest set
+        matches.sort(key=len)
+        positions = set(matches[0]).intersection(*matches[1:])
+        return [self.resources[position] for position in sorted(positions)]
+
+
+_indexes: "OrderedDict[tuple, ResourceIndex]" = OrderedDict()
+
+
+def cache_index(key: tuple, resources: List[dict]) -> ResourceIndex:
+    """Builds and caches the index of an inventory, e.g. under (session id, artifact name)."""
+    _indexes[key] = ResourceIndex(resources)
+    _indexes.move_to_end(key)
+    while len(_indexes) > MAX_CACHED_INDEXES:
+        _indexes.popitem(last=False)
+    return _indexes[key]
+
+
+def get_cached_index(key: tuple) -> Optional[ResourceIndex]:
+    index = _indexes.get(key)
+    if index is not None:
+        _indexes.move_to_end(key)
+    return index
+
+
+def compact(resource: dict) -> dict:
+    """Keeps the COMPACT_FIELDS that are set."""
+    return {field: resource[field] for field in COMPACT_FIELDS if resource.get(field)}
@@ -1,76 +1,424 @@
 from google.cloud import asset_v1
 from google.adk.tools import ToolContext
-import google.auth 
+import google.genai.types as types
+import google.auth
 from google.auth import impersonated_credentials
+from google.auth.transport.requests import Request
+import asyncio
+import datetime
+import hashlib
 import json
+import os
+import time
+from typing import List, Optional, Tuple
 
-def list_gcp_project_resources(project_id: str, tool_context: ToolContext) -> list:
+from .fake_asset_api import FakeAssetServiceAsyncClient
+from .inventory import summarize_resources, estimate_tokens, CHARS_PER_TOKEN
+from .snapshot_store import AssetSnapshotStore
+from .resource_index import ResourceIndex, cache_index, get_cached_index, compact
+
+IMPERSONATED_SERVICE_ACCOUNT = "agent-sa@subhadipmitra-pso.iam.gserviceaccount.com"
+CLOUD_PLATFORM_SCOPES = ("https://www.googleapis.com/auth/cloud-platform",)
+
+# Lifetime of the short-lived access token, in seconds
+CREDENTIALS_LIFETIME = 3600
+
+# The cached token is refreshed when it expires within this many seconds
+REFRESH_MARGIN = 300
+
+# Largest page the Cloud Asset API accepts for search_all_resources
+PAGE_SIZE = 500
+
+# Default cap on the number of resources kept per call, so very large projects
+# are inventoried in bounded time and memory.
+DEFAULT_MAX_RESOURCES = 2000
+
+# Resources returned at most by get_inventory_resources
+DEFAULT_DRILL_DOWN_LIMIT = 50
+
+# Timeout of each page request, in seconds
+PAGE_TIMEOUT = 60
+
+# Scopes inventoried at the same time by list_gcp_resources, and the page
+# requests per second allowed for each of them
+MAX_PARALLEL_SCOPES = 4
+SCOPE_PAGES_PER_SECOND = 2
+
+# Impersonated credentials per (target principal, scopes), and the client built
+# on them with the event loop it belongs to (async gRPC channels are bound to one loop)
+_credentials = {}
+_clients = {}
+
+
+async def get_asset_client(target_principal: str = IMPERSONATED_SERVICE_ACCOUNT, scopes: Tuple[str, ...] = CLOUD_PLATFORM_SCOPES):
+    """
+    Returns a Cloud Asset Inventory async client authenticated as the target
+    principal. The credentials and the client are created once per process and
+    reused, and the token is refreshed (off the event loop) shortly before it expires.
+
+    When the FAKE_ASSET_API_DATA environment variable is set, a local fake client
+    serving that JSON file is returned instead (see fake_asset_api.py).
+    """
+    fake_data = os.environ.get("FAKE_ASSET_API_DATA")
+    if fake_data:
+        return FakeAssetServiceAsyncClient.from_file(fake_data)
+
+    key = (target_principal, tuple(scopes))
+    credentials = _credentials.get(key)
+    if credentials is None:
+        # The source credentials are your user credentials from 'gcloud auth application-default login'
+        # or other credentials available in your environment.
+        source_credentials, project = google.auth.default()
+        credentials = impersonated_credentials.Credentials(
+            source_credentials=source_credentials,
+            target_principal=target_principal,
+            target_scopes=list(scopes),
+            lifetime=CREDENTIALS_LIFETIME,
+        )
+        _credentials[key] = credentials
+
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)  # expiry is naive UTC
+    if credentials.expiry is None or credentials.expiry - now < datetime.timedelta(seconds=REFRESH_MARGIN):
+        await asyncio.to_thread(credentials.refresh, Request())
+
+    loop = asyncio.get_running_loop()
+    cached = _clients.get(key)
+    if cached is None or cached[0] is not loop:
+        # The client needs the 'roles/cloudasset.viewer' role on the project.
+        cached = (loop, asset_v1.AssetServiceAsyncClient(credentials=credentials))
+        _clients[key] = cached
+    return cached[1]
+
+
+class PageRateLimiter:
+    """Spaces out the page requests made for one scope, to stay under the Asset API quota."""
+
+    def __init__(self, pages_per_second: float = SCOPE_PAGES_PER_SECOND):
+        self.interval = 1 / pages_per_second
+        self.next_request_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            if self.next_request_at > now:
+                await asyncio.sleep(self.next_request_at - now)
+            self.next_request_at = max(now, self.next_request_at) + self.interval
+
+
+def normalize_scope(scope: str) -> str:
+    """Accepts "my-project", "projects/my-project", "folders/123" or "organizations/456"."""
+    scope = scope.strip().strip("/")
+    return scope if scope.startswith(("projects/", "folders/", "organizations/")) else f"projects/{scope}"
+
+
+async def search_scope_resources(client, scope: str, max_resources: int, query: str = "", rate_limiter: Optional[PageRateLimiter] = None) -> Tuple[List[dict], bool]:
     """
-    Lists all resources implemented in a specific Google Cloud Platform project
-    using the Cloud Asset Inventory API.
+    Streams the resources of a scope page by page, stopping after max_resources.
 
     Args:
-        project_id: The ID of the GCP project (e.g., "my-project-123").
+        client: The Asset API async client from get_asset_client.
+        scope: "projects/{project_id}", "folders/{folder_id}" or "organizations/{org_id}".
+        max_resources: The maximum number of resources to return.
+        query: An optional Asset API search query, e.g. "updateTime>1700000000".
+        rate_limiter: Optional limiter waited on before every page request.
 
     Returns:
-        A list of resource dictionaries, where each dictionary represents an asset
-        and contains its metadata. Returns an empty list if no resources are found
-        or an error occurs.
+        (the resource dictionaries, True if the cap was reached before the end)
     """
-    try:
-        impersonated_email = "agent-sa@subhadipmitra-pso.iam.gserviceaccount.com"
+    # We are not specifying asset_types, so it will search for all supported
+    # asset types.
+    request = asset_v1.SearchAllResourcesRequest(
+        scope=scope,
+        query=query,
+        page_size=min(PAGE_SIZE, max(max_resources, 1)),
+    )
+
+    resources = []
+    if rate_limiter:
+        await rate_limiter.wait()
+    # The async pager fetches the next page only when the current one is consumed
+    pager = await client.search_all_resources(request=request, timeout=PAGE_TIMEOUT)
+    async for page in pager.pages:
+        for resource in page.results:
+            if len(resources) >= max_resources:
+                return resources, True
+            resources.append(asset_v1.ResourceSearchResult.to_dict(resource))
+        if rate_limiter:
+            await rate_limiter.wait()
+    return resources, False
+
+
+async def inventory_scope(client, scope: str, max_resources: int, full_refresh: bool = False, rate_limiter: Optional[PageRateLimiter] = None) -> dict:
+    """
+    Refreshes the local snapshot of a scope, downloading only the resources
+    updated since the previous refresh unless a full refresh is needed.
+
+    Returns:
+        A dict with "scope", "refresh" ("full" or "incremental"), "updated_count",
+        "truncated" and "resources", every resource of the snapshot.
+    """
+    store = await asyncio.to_thread(AssetSnapshotStore, scope)
+    refreshed_at = None if full_refresh else await asyncio.to_thread(store.refreshed_at)
+    query = store.update_query(refreshed_at) if refreshed_at is not None else ""
+
+    print(f"Searching for resources in {scope} (max {max_resources}, {'incremental' if query else 'full'} refresh)...")
+
+    started_at = time.time()
+    updated_resources, truncated = await search_scope_resources(client, scope, max_resources, query, rate_limiter)
+    if query:
+        await asyncio.to_thread(store.merge, updated_resources, None if truncated else started_at)
+    else:
+        await asyncio.to_thread(store.replace, updated_resources, started_at, not truncated)
+    all_resources = await asyncio.to_thread(store.load)
+
+    print(f"Finished searching. Downloaded {len(updated_resources)} resources, {len(all_resources)} in the snapshot of {scope}{' (truncated)' if truncated else ''}.")
+    return {
+        "scope": scope,
+        "refresh": "incremental" if query else "full",
+        "updated_count": len(updated_resources),
+        "truncated": truncated,
+        "resources": all_resources,
+    }
 
-        # Create the credentials object that will be used to generate the impersonated credentials.
-        # This could be your user credentials from 'gcloud auth application-default login'
-        # or other credentials available in your environment.
-        credentials, project = google.auth.default()
 
+async def save_inventory(resources: List[dict], inventory_artifact: str, tool_context: ToolContext, **summary_fields) -> Tuple[dict, int]:
+    """
+    Saves the full list of resources to an artifact and keeps only its summary
+    (with the extra summary_fields, e.g. the project id) in the state, since the
+    full list is far too big for the model context.
 
-        sa_impersonated_credentials = impersonated_credentials.Credentials(
-            source_credentials=credentials,
-            target_principal=impersonated_email,
-            target_scopes=["https://www.googleapis.com/auth/cloud-platform"], # The required scopes
-            lifetime=3600,  # The lifetime of the short-lived access token, in seconds
+    Returns:
+        (the summary, the approximate number of tokens saved)
+    """
+    inventory_json = json.dumps(resources, default=str)
+    await tool_context.save_artifact(
+        filename=inventory_artifact,
+        artifact=types.Part(
+            inline_data=types.Blob(
+                data=inventory_json.encode("utf-8"),
+                mime_type="application/json"
+            )
         )
+    )
+
+    summary = dict(summary_fields, **summarize_resources(resources))
+    tokens_saved = len(inventory_json) // CHARS_PER_TOKEN - estimate_tokens(summary)
+    print(f"Inventory summary saved, about {tokens_saved} tokens saved.")
+
+    tool_context.state["resources_queried"] = summary
+    tool_context.state["resources_inventory_artifact"] = inventory_artifact
+    cache_index((tool_context._invocation_context.session.id, inventory_artifact), resources)
+    return summary, tokens_saved
+
+
+async def load_inventory_index(tool_context: ToolContext) -> Optional[ResourceIndex]:
+    """
+    Returns the index of the last inventory of the session, rebuilt from the
+    inventory artifact when it is not in memory (e.g. after a restart).
+    Returns None when there is no inventory yet.
+    """
+    inventory_artifact = tool_context.state.get("resources_inventory_artifact")
+    if not inventory_artifact:
+        return None
+    key = (tool_context._invocation_context.session.id, inventory_artifact)
+    index = get_cached_index(key)
+    if index is None:
+        artifact = await tool_context.load_artifact(filename=inventory_artifact)
+        if artifact is None or artifact.inline_data is None:
+            return None
+        index = cache_index(key, json.loads(artifact.inline_data.data))
+    return index
+
+
+async def list_gcp_project_resources(project_id: str, tool_context: ToolContext, max_resources: int = DEFAULT_MAX_RESOURCES, full_refresh: bool = False) -> dict:
+    """
+    Inventories the resources implemented in a specific Google Cloud Platform project
+    using the Cloud Asset Inventory API. Results are streamed page by page and the
+    listing stops after max_resources resources.
+
+    The resources are kept in a local snapshot of the project, so the following
+    calls only download the resources updated since the previous one (a full
+    refresh is done once a day, or when full_refresh is True).
 
-        # Initialize the Cloud Asset Inventory client.
-        # The client automatically handles authentication if running in a GCP
-        # environment with appropriate permissions (e.g., 'roles/cloudasset.viewer').
-        # If running locally, ensure your gcloud CLI is authenticated or
-        # GOOGLE_APPLICATION_CREDENTIALS environment variable is set.
-        client = asset_v1.AssetServiceClient(credentials=sa_impersonated_credentials)
+    The full list of resources is saved to the artifact "gcp_inventory_<project_id>.json"
+    and only a summary is returned, use get_inventory_resources for the details.
+
+    Args:
+        project_id: The ID of the GCP project (e.g., "my-project-123").
+        max_resources: The maximum number of resources to download. Defaults to 2000.
+        full_refresh: Download every resource again instead of only the updated ones,
+            e.g. to drop deleted resources from the snapshot. Defaults to False.
+
+    Returns:
+        A dict with the status, "refresh" ("full" or "incremental"), "updated_count"
+        (resources downloaded), "truncated" (True when the cap was reached before the
+        end of the inventory), "summary" (resource counts grouped by asset type,
+        location, network and labels), "inventory_artifact" and "tokens_saved", the
+        approximate number of tokens saved by not returning the full list.
+    """
+    try:
+        # The credentials and the client are cached across calls, see get_asset_client
+        client = await get_asset_client()
 
         # Define the scope for the search. For a project, the format is "projects/{project_id}".
-        scope = f"projects/{project_id}"
-
-        print(f"Searching for all resources in project: {project_id}...")
-
-        # Use the search_all_resources method. This method returns an iterable
-        # (pager) that handles pagination automatically.
-        # We are not specifying asset_types, so it will search for all supported
-        # asset types.
-        request = asset_v1.SearchAllResourcesRequest(
-            scope=scope,
-            # Optional: You can specify asset_types to filter the results.
-            # For example: asset_types=["compute.googleapis.com/Instance", "storage.googleapis.com/Bucket"]
-            # To get more detailed metadata, you might need to set 'content_type'.
-            # However, search_all_resources provides a good overview.
-        )
+        result = await inventory_scope(client, f"projects/{project_id}", max_resources, full_refresh)
+
+        inventory_artifact = f"gcp_inventory_{project_id}.json"
+        summary, tokens_saved = await save_inventory(result["resources"], inventory_artifact, tool_context, project_id=project_id)
+        return {
+            "status": "success",
+            "refresh": result["refresh"],
+            "updated_count": result["updated_count"],
+            "truncated": result["truncated"],
+            "summary": summary,
+            "inventory_artifact": inventory_artifact,
+            "tokens_saved": tokens_saved,
+        }
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return {"status": "failed", "error": str(e)}
+
+
+async def list_gcp_resources(scopes: list[str], tool_context: ToolContext, max_resources_per_scope: int = DEFAULT_MAX_RESOURCES, full_refresh: bool = False) -> dict:
+    """
+    Inventories many Google Cloud Platform projects, folders or organizations at
+    once, a few scopes in parallel, and merges them into one summarized inventory.
+    Each scope keeps its own local snapshot like list_gcp_project_resources.
+
+    The merged list of resources is saved to the artifact "gcp_inventory_<n>_scopes_<hash>.json",
+    <hash> being derived from the scopes so different sets of scopes do not overwrite each other,
+    and only a summary is returned, use get_inventory_resources for the details.
+
+    Args:
+        scopes: The scopes, e.g. ["my-project-1", "projects/my-project-2", "folders/123", "organizations/456"].
+        max_resources_per_scope: The maximum number of resources to download per scope. Defaults to 2000.
+        full_refresh: Download every resource again instead of only the updated ones. Defaults to False.
+
+    Returns:
+        A dict with the status, "scopes" (refresh, updated_count, resource_count,
+        truncated or error per scope), "summary" of the merged inventory,
+        "inventory_artifact" and "tokens_saved".
+    """
+    try:
+        client = await get_asset_client()
+        scopes = list(dict.fromkeys(normalize_scope(scope) for scope in scopes))
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_SCOPES)
+
+        async def run(scope):
+            async with semaphore:
+                try:
+                    return await inventory_scope(client, scope, max_resources_per_scope, full_refresh, PageRateLimiter())
+                except Exception as e:
+                    # One failing scope (e.g. missing permission) does not fail the others
+                    print(f"An error occurred for {scope}: {e}")
+                    return {"scope": scope, "error": str(e)}
+
+        results = await asyncio.gather(*(run(scope) for scope in scopes))
+
+        # A project inside an inventoried folder appears in both, keep each resource once
+        merged = {}
+        for result in results:
+            for resource in result.get("resources", []):
+                merged[resource.get("name")] = resource
+
+        # Same scopes in any order -> same artifact, other scopes with the same count -> another one
+        scopes_hash = hashlib.sha256("\n".join(sorted(scopes)).encode("utf-8")).hexdigest()[:12]
+        inventory_artifact = f"gcp_inventory_{len(scopes)}_scopes_{scopes_hash}.json"
+        summary, tokens_saved = await save_inventory(list(merged.values()), inventory_artifact, tool_context, scopes=scopes)
+
+        scope_results = {}
+        for result in results:
+            resources = result.pop("resources", None)
+            if resources is not None:
+                result["resource_count"] = len(resources)
+            scope_results[result.pop("scope")] = result
 
-        all_resources = []
-        # Iterate through the paginated responses
-        for resource in client.search_all_resources(request=request):
-            # Each 'resource' object contains various attributes like:
-            # .name (full resource name), .asset_type, .project, .display_name,
-            # .location, .state, .labels, .network_tags, etc.
-            # Convert the resource object to a dictionary for easier handling.
-            all_resources.append(asset_v1.ResourceSearchResult.to_dict(resource))
-            print(f"Found resource: {resource.asset_type} - {resource.display_name} ({resource.name})")
+        return {
+            "status": "success",
+            "scopes": scope_results,
+            "summary": summary,
+            "inventory_artifact": inventory_artifact,
+            "tokens_saved": tokens_saved,
+        }
 
-        print(f"Finished searching. Found {len(all_resources)} resources in project {project_id}.")
-        tool_context.state["resources_queried"] = all_resources
-        return all_resources
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return {"status": "failed", "error": str(e)}
+
+
+async def get_inventory_resources(asset_type: str, tool_context: ToolContext, limit: int = DEFAULT_DRILL_DOWN_LIMIT) -> dict:
+    """
+    Returns the full details of the inventoried resources of one asset type.
+
+    Args:
+        asset_type: The asset type, e.g. "compute.googleapis.com/Instance" (or just "Instance").
+        limit: The maximum number of resources to return. Defaults to 50.
+
+    Returns:
+        A dict with the status, "total" (number of resources of that type) and
+        "resources", the resource dictionaries (at most limit of them).
+    """
+    try:
+        index = await load_inventory_index(tool_context)
+        if index is None:
+            return {"status": "failed", "error": "No inventory found, use list_gcp_project_resources first."}
+
+        matches = index.query(asset_type=asset_type)
+        return {"status": "success", "total": len(matches), "resources": matches[:limit]}
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return {"status": "failed", "error": str(e)}
+
+
+async def query_gcp_resources(
+    tool_context: ToolContext,
+    asset_type: Optional[str] = None,
+    location: Optional[str] = None,
+    label: Optional[str] = None,
+    network_tag: Optional[str] = None,
+    network: Optional[str] = None,
+    state: Optional[str] = None,
+    unlabeled: bool = False,
+    limit: int = DEFAULT_DRILL_DOWN_LIMIT,
+) -> dict:
+    """
+    Filters the inventoried resources. Every given filter must match, and the
+    matching is case-insensitive.
+
+    Args:
+        asset_type: The asset type, e.g. "compute.googleapis.com/Instance" or "Instance".
+        location: A zone ("us-central1-a"), a region ("us-central1", also matches its zones) or "global".
+        label: A label key ("env") or key=value ("env=prod").
+        network_tag: A network tag, e.g. "http-server".
+        network: A VPC network name, e.g. "default".
+        state: The resource state, e.g. "RUNNING" or "TERMINATED".
+        unlabeled: Only the resources without any label. Defaults to False.
+        limit: The maximum number of resources to return. Defaults to 50.
+
+    Returns:
+        A dict with the status, "total" (number of matching resources) and
+        "resources" (name, type, display name, location, state, labels and network
+        tags of at most limit of them).
+    """
+    try:
+        index = await load_inventory_index(tool_context)
+        if index is None:
+            return {"status": "failed", "error": "No inventory found, use list_gcp_project_resources first."}
+
+        matches = index.query(
+            asset_type=asset_type,
+            location=location,
+            label=label,
+            network_tag=network_tag,
+            network=network,
+            state=state,
+            unlabeled=unlabeled,
+        )
+        return {"status": "success", "total": len(matches), "resources": [compact(resource) for resource in matches[:limit]]}
 
     except Exception as e:
         print(f"An error occurred: {e}")
-        return [{"error": str(e)}]
\ No newline at end of file
+        return {"status": "failed", "error": str(e)}
@@ -7,7 +7,7 @@ load_dotenv()
 from google.adk.agents import LlmAgent
 from google.adk.a2a.utils.agent_to_a2a import to_a2a
 
-from .tools import save_terraform_file
+from .tools import save_terraform_file, save_terraform_bundle, validate_terraform_code
 
 from google.genai import types
 
@@ -16,7 +16,7 @@ terraform_agent = LlmAgent(
     name='terraform_agent',
     description='A helpful assistant for providing terraform configurations for given context.',
     instruction=instructions,
-    tools=[save_terraform_file]
+    tools=[save_terraform_file, save_terraform_bundle, validate_terraform_code]
 )
 
 # a2a_app = to_a2a(architecture_validator_agent, port=8005)
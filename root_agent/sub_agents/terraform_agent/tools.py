@@ -1,42 +1,108 @@
 from google.adk.tools import ToolContext
 import google.genai.types as types
 
+from typing import Optional
 import uuid
 
-async def save_terraform_file(filename: str, content: str, tool_context: ToolContext) -> str:
+from .bundle import BundleError, build_bundle
+from .validation import validate_terraform
+
+
+def terraform_artifact_name(filename: str, unique_id: str) -> str:
+    """Artifact name of a Terraform file, e.g. ('main.tf', id) -> 'main_<id>.tf'."""
+    base_name = filename.strip().removesuffix('.tf')
+    return f"{base_name}_{unique_id}.tf"
+
+
+async def save_terraform_file(filename: str, content: str, tool_context: ToolContext, extra_files: Optional[dict[str, str]] = None) -> dict:
     """
-    Saves the provided content as a Terraform configuration file.
+    Saves the provided content as a Terraform configuration file. The files of a
+    multi-file module (variables.tf, outputs.tf...) can be saved in the same call.
 
     Args:
         filename: The name of the file to save (e.g., 'main').
         content: The complete Terraform code to write to the file.
+        extra_files: Optional other files of the same module, mapping each file name to its Terraform code (e.g., {'variables.tf': '...'}).
     
     Returns:
-        A confirmation message indicating the file was saved.
+        A dict consist of the status and the names of the saved files.
+    """
+    try:
+        # The files of one call share the same id, so they can be told apart from other modules
+        unique_id = str(uuid.uuid4())
+        files = {filename: content, **(extra_files or {})}
+        validation = validate_terraform(files)
+        if not validation["valid"]:
+            return {"status": "failed", "error_message": "The Terraform code has errors, fix them and save it again.", "errors": validation["errors"]}
+
+        saved = []
+        for name, code in files.items():
+            file_path = terraform_artifact_name(name, unique_id)
+            # The artifact is built from the content in memory, nothing is written to disk
+            artifact = types.Part(
+                inline_data=types.Blob(
+                    data=code.encode('utf-8'),
+                    mime_type="text/plain"
+                )
+            )
+            await tool_context.save_artifact(
+                filename=file_path,
+                artifact=artifact
+            )
+            saved.append(file_path)
+
+        return {"status": "success", "filenames": saved, "warnings": validation["warnings"]}
+
+    except Exception as e:
+        return {"status": "failed", "error": f"An error occurred while saving the file: {str(e)}"}
+
+
+async def save_terraform_bundle(files: dict[str, str], tool_context: ToolContext, bundle_name: str = "terraform", archive_format: str = "zip") -> dict:
+    """
+    Saves a whole Terraform configuration (e.g. main.tf, variables.tf, outputs.tf
+    and modules/<name>/*.tf) as a single archive, with a manifest.json listing its files.
+
+    Args:
+        files: The Terraform code of every file, by path relative to the configuration root (e.g., {'main.tf': '...', 'modules/network/main.tf': '...'}).
+        bundle_name: The name of the archive, without extension (e.g., 'webapp').
+        archive_format: 'zip' or 'tar.gz'.
+
+    Returns:
+        A dict consist of the status, the archive filename and its manifest.
     """
     try:
-        unique_id = uuid.uuid4()
-        # Ensure the filename ends with .tf
-        base_name = filename.strip('.tf')
-        file_path = f"{base_name}_{unique_id}.tf"
-        
-        with open(file_path, "wb") as f:
-            f.write(content.encode('utf-8'))
-        
-        # Read the file content as bytes and return it
-        with open(file_path, "rb") as f:
-            file_bytes = f.read()
+        validation = validate_terraform(files)
+        if not validation["valid"]:
+            return {"status": "failed", "error_message": "The Terraform code has errors, fix them and save it again.", "errors": validation["errors"]}
+        data, mime_type, manifest = build_bundle(files, archive_format)
+        file_path = f"{bundle_name.strip() or 'terraform'}_{uuid.uuid4()}.{archive_format}"
         artifact = types.Part(
             inline_data=types.Blob(
-                data=file_bytes,
-                mime_type="text/plain"
+                data=data,
+                mime_type=mime_type
             )
         )
-        
         await tool_context.save_artifact(
             filename=file_path,
             artifact=artifact
         )
-        
+        return {"status": "success", "filename": file_path, "manifest": manifest, "warnings": validation["warnings"]}
+
+    except BundleError as e:
+        return {"status": "failed", "error_message": str(e)}
     except Exception as e:
-        return f"An error occurred while saving the file: {str(e)}"
+        return {"status": "failed", "error": f"An error occurred while saving the bundle: {str(e)}"}
+
+
+def validate_terraform_code(files: dict[str, str]) -> dict:
+    """
+    Checks Terraform code offline, in milliseconds: HCL syntax, Terraform block
+    structure, and resource arguments against the cached provider schemas.
+
+    Args:
+        files: The Terraform code of every file, by path (e.g., {'main.tf': '...', 'variables.tf': '...'}).
+
+    Returns:
+        A dict with "valid", the "errors" to fix and "warnings" (each with file, line and message).
+    """
+    return validate_terraform(files)
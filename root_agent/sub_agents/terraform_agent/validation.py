@@ -0,0 +1,529 @@
+"""
+Offline validation of generated Terraform code, fast enough to run on every
+save, so mistakes are reported to the agent in the same turn instead of by the
+user after a failed `terraform init/plan`.
+
+Two stages:
+- HCL syntax: a small parser of the HCL native syntax structure (blocks,
+  arguments, strings, heredocs, comments and bracket nesting). Expressions
+  are only checked for balanced brackets, not evaluated.
+- Provider schemas: arguments and nested blocks of resources and data sources
+  are checked against a locally cached schema file, the output of
+  `terraform providers schema -json`, given by TERRAFORM_SCHEMA_FILE. Without
+  it, only the syntax and the Terraform language structure are checked.
+
+Errors block the save. References to variables, locals, modules or resources
+that are not declared in the given files are only warnings, since the rest of
+the module may have been saved separately.
+"""
+import json
+import os
+import posixpath
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA_FILE = os.environ.get("TERRAFORM_SCHEMA_FILE", os.path.join(os.path.dirname(__file__), "provider_schemas.json"))
+
+# Top-level block type -> number of labels
+TOP_LEVEL_BLOCKS = {
+    "terraform": 0,
+    "locals": 0,
+    "provider": 1,
+    "variable": 1,
+    "output": 1,
+    "module": 1,
+    "resource": 2,
+    "data": 2,
+    "moved": 0,
+    "import": 0,
+    "removed": 0,
+    "check": 1,
+}
+
+# Arguments and blocks every resource and data source accepts
+META_ARGUMENTS = {"count", "for_each", "depends_on", "provider"}
+META_BLOCKS = {"lifecycle", "provisioner", "connection"}
+
+OPENING = {"{": "}", "[": "]", "(": ")"}
+CLOSING = {closer: opener for opener, closer in OPENING.items()}
+
+
+class HCLSyntaxError(ValueError):
+    def __init__(self, line: int, message: str):
+        super().__init__(message)
+        self.line = line
+        self.message = message
+
+
+IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_-]*")
+NUMBER = re.compile(r"\d+(\.\d+)?([eE][+-]?\d+)?")
+HEREDOC = re.compile(r"<<-?([A-Za-z_][A-Za-z0-9_-]*)[ \t]*\n")
+OPERATORS = ("==", "!=", "<=", ">=", "&&", "||", "=>", "...", "::")
+
+
+class _Token:
+    __slots__ = ("kind", "value", "line")
+
+    def __init__(self, kind: str, value: str, line: int):
+        self.kind = kind  # ident, string, heredoc, number, newline, punct, eof
+        self.value = value
+        self.line = line
+
+
+class _Tokenizer:
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.line = 1
+
+    def tokens(self) -> List[_Token]:
+        tokens = []
+        text = self.text
+        while self.pos < len(text):
+            char = text[self.pos]
+            if char == "\n":
+                tokens.append(_Token("newline", "\n", self.line))
+                self.line += 1
+                self.pos += 1
+            elif char in " \t\r":
+                self.pos += 1
+            elif char == "#" or text.startswith("//", self.pos):
+                end = text.find("\n", self.pos)
+                self.pos = len(text) if end == -1 else end
+            elif text.startswith("/*", self.pos):
+                end = text.find("*/", self.pos + 2)
+                if end == -1:
+                    raise HCLSyntaxError(self.line, "Unterminated /* comment")
+                self.line += text.count("\n", self.pos, end)
+                self.pos = end + 2
+            elif char == '"':
+                line = self.line
+                tokens.append(_Token("string", self._string(), line))
+            elif text.startswith("<<", self.pos) and HEREDOC.match(text, self.pos):
+                line = self.line
+                tokens.append(_Token("heredoc", self._heredoc(), line))
+            elif IDENT.match(text, self.pos):
+                match = IDENT.match(text, self.pos)
+                tokens.append(_Token("ident", match.group(), self.line))
+                self.pos = match.end()
+            elif NUMBER.match(text, self.pos):
+                match = NUMBER.match(text, self.pos)
+                tokens.append(_Token("number", match.group(), self.line))
+                self.pos = match.end()
+            else:
+                operator = next((op for op in OPERATORS if text.startswith(op, self.pos)), char)
+                tokens.append(_Token("punct", operator, self.line))
+                self.pos += len(operator)
+        tokens.append(_Token("eof", "", self.line))
+        return tokens
+
+    def _string(self) -> str:
+        """Quoted string starting at the current position, interpolations included."""
+        text, start, line = self.text, self.pos, self.line
+        self.pos += 1
+        while self.pos < len(text):
+            char = text[self.pos]
+            if char == "\\":
+                self.pos += 2
+            elif char == '"':
+                self.pos += 1
+                return text[start:self.pos]
+            elif char == "\n":
+                raise HCLSyntaxError(line, "Unterminated string, quoted strings cannot span lines (use a heredoc)")
+            elif text.startswith(("$${", "%%{"), self.pos):
+                self.pos += 3
+            elif text.startswith(("${", "%{"), self.pos):
+                self._template()
+            else:
+                self.pos += 1
+        raise HCLSyntaxError(line, "Unterminated string")
+
+    def _template(self):
+        """Skips a ${...} or %{...} template sequence, which may hold nested strings."""
+        text, line = self.text, self.line
+        self.pos += 2
+        depth = 1
+        while self.pos < len(text):
+            char = text[self.pos]
+            if char == '"':
+                self._string()
+                continue
+            if char == "\n":
+                self.line += 1
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    self.pos += 1
+                    return
+            self.pos += 1
+        raise HCLSyntaxError(line, "Unterminated template sequence '${'")
+
+    def _heredoc(self) -> str:
+        text, line = self.text, self.line
+        match = HEREDOC.match(text, self.pos)
+        marker = match.group(1)
+        self.pos = match.end()
+        self.line += 1
+        while self.pos < len(text):
+            end = text.find("\n", self.pos)
+            end = len(text) if end == -1 else end
+            content_line = text[self.pos:end]
+            self.pos = end
+            # The closing marker may be indented, for both <<EOT and <<-EOT
+            if content_line.strip() == marker:
+                return text[match.start():end]
+            if end < len(text):
+                self.pos += 1
+                self.line += 1
+        raise HCLSyntaxError(line, f"Unterminated heredoc, no closing '{marker}' line")
+
+
+class _Parser:
+    """
+    Parses a body into blocks, as dicts:
+
+        {"type", "labels", "line", "attributes": {name: {"line", "expression"}}, "blocks": [...]}
+
+    Non-fatal problems (e.g. a redefined argument) go to `errors`.
+    """
+
+    def __init__(self, tokens: List[_Token]):
+        self.tokens = tokens
+        self.pos = 0
+        self.errors: List[Tuple[int, str]] = []
+
+    def peek(self) -> _Token:
+        return self.tokens[self.pos]
+
+    def next(self) -> _Token:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse_body(self, opened_at: Optional[int] = None) -> dict:
+        body = {"attributes": {}, "blocks": []}
+        while True:
+            token = self.next()
+            if token.kind == "newline":
+                continue
+            if token.kind == "eof":
+                if opened_at is not None:
+                    raise HCLSyntaxError(opened_at, "Unclosed '{', the block is never closed")
+                return body
+            if token.value == "}":
+                if opened_at is None:
+                    raise HCLSyntaxError(token.line, "Unexpected '}', no block to close")
+                return body
+            if token.kind != "ident":
+                raise HCLSyntaxError(token.line, f"Expected an argument or block name, found '{token.value.strip()}'")
+
+            following = self.peek()
+            if following.value == "=":
+                self.next()
+                expression = self.parse_expression(token.line)
+                if token.value in body["attributes"]:
+                    self.errors.append((token.line, f"Argument '{token.value}' is already set on line {body['attributes'][token.value]['line']}"))
+                body["attributes"][token.value] = {"line": token.line, "expression": expression}
+                continue
+
+            labels = []
+            while self.peek().kind in ("string", "ident"):
+                label = self.next()
+                labels.append(label.value[1:-1] if label.kind == "string" else label.value)
+            opening = self.next()
+            if opening.value != "{":
+                if opening.value == ":":
+                    raise HCLSyntaxError(opening.line, f"Use '=' to set '{token.value}', not ':'")
+                raise HCLSyntaxError(opening.line, f"Expected '=' or '{{' after '{token.value}'")
+            block = {"type": token.value, "labels": labels, "line": token.line}
+            block.update(self.parse_body(opened_at=opening.line))
+            body["blocks"].append(block)
+
+    def parse_expression(self, line: int) -> List[_Token]:
+        """Tokens of an argument value, up to the end of its line outside any brackets."""
+        expression, stack = [], []
+        while True:
+            token = self.peek()
+            if token.kind == "eof":
+                if stack:
+                    raise HCLSyntaxError(stack[-1].line, f"Unclosed '{stack[-1].value}'")
+                break
+            if not stack and (token.kind == "newline" or token.value == "}"):
+                break
+            if not stack and token.value == ",":
+                raise HCLSyntaxError(token.line, "Unexpected ',' after an argument, arguments are separated by new lines")
+            self.next()
+            if token.value in OPENING:
+                stack.append(token)
+            elif token.value in CLOSING:
+                if not stack or stack[-1].value != CLOSING[token.value]:
+                    raise HCLSyntaxError(token.line, f"Unexpected '{token.value}'")
+                stack.pop()
+            expression.append(token)
+        if not expression:
+            raise HCLSyntaxError(line, "Missing value after '='")
+        return expression
+
+
+def parse_hcl(text: str) -> Tuple[dict, List[Tuple[int, str]]]:
+    """
+    Parses an HCL file.
+
+    Returns:
+        The root body ({"attributes", "blocks"}) and the non-fatal errors as (line, message).
+
+    Raises:
+        HCLSyntaxError: On the first syntax error.
+    """
+    # CRLF files are valid HCL, e.g. heredoc markers end with "\r\n"
+    parser = _Parser(_Tokenizer(text.replace("\r\n", "\n")).tokens())
+    return parser.parse_body(), parser.errors
+
+
+@lru_cache(maxsize=4)
+def _load_schema(path: str, modified: float) -> dict:
+    with open(path, "r") as f:
+        provider_schemas = json.load(f).get("provider_schemas", {})
+
+    schema = {"resource": {}, "data": {}, "providers": set()}
+    for address, provider in provider_schemas.items():
+        # "registry.terraform.io/hashicorp/google-beta" -> "google"
+        schema["providers"].add(address.rsplit("/", 1)[-1].split("-")[0])
+        for name, resource in provider.get("resource_schemas", {}).items():
+            schema["resource"][name] = resource["block"]
+        for name, data_source in provider.get("data_source_schemas", {}).items():
+            schema["data"][name] = data_source["block"]
+    return schema
+
+
+def _trim_block(block: dict) -> dict:
+    return {
+        "attributes": {
+            name: {flag: True for flag in ("required", "optional", "computed") if attribute.get(flag)}
+            for name, attribute in block.get("attributes", {}).items()
+        },
+        "block_types": {
+            name: {
+                **{key: nested[key] for key in ("nesting_mode", "min_items", "max_items") if key in nested},
+                "block": _trim_block(nested.get("block", {})),
+            }
+            for name, nested in block.get("block_types", {}).items()
+        },
+    }
+
+
+def trim_provider_schema(provider_schemas: dict) -> dict:
+    """
+    Keeps only what the validation reads from the output of
+    `terraform providers schema -json`: the resource and data source blocks
+    without descriptions, types or provider and function schemas, which cuts
+    the hashicorp/google schema to a fraction of its size.
+
+    Args:
+        provider_schemas: The parsed output of `terraform providers schema -json`.
+
+    Returns:
+        A schema file in the same format, usable as TERRAFORM_SCHEMA_FILE.
+    """
+    return {
+        "format_version": provider_schemas.get("format_version"),
+        "provider_schemas": {
+            address: {
+                kind: {name: {"block": _trim_block(entry.get("block", {}))} for name, entry in provider.get(kind, {}).items()}
+                for kind in ("resource_schemas", "data_source_schemas")
+            }
+            for address, provider in provider_schemas.get("provider_schemas", {}).items()
+        },
+    }
+
+
+def load_provider_schema(path: str = SCHEMA_FILE) -> Optional[dict]:
+    """The cached provider schema, reloaded when the file changes, or None without a schema file."""
+    try:
+        return _load_schema(path, os.path.getmtime(path))
+    except (OSError, ValueError, KeyError) as e:
+        if os.path.exists(path):
+            print(f"Could not load the Terraform provider schema {path}: {e}")
+        return None
+
+
+def _check_block(block: dict, schema: dict, path: str, errors: List[dict], top_level: bool):
+    attributes = schema.get("attributes", {})
+    block_types = schema.get("block_types", {})
+
+    for name, attribute in block["attributes"].items():
+        if top_level and name in META_ARGUMENTS:
+            continue
+        if name in block_types:
+            errors.append({"line": attribute["line"], "message": f"'{name}' is a block, write it as '{name} {{ ... }}' without '='"})
+        elif name not in attributes:
+            errors.append({"line": attribute["line"], "message": f"Unsupported argument '{name}' in {path}"})
+        elif attributes[name].get("computed") and not (attributes[name].get("optional") or attributes[name].get("required")):
+            errors.append({"line": attribute["line"], "message": f"'{name}' is read-only in {path}, it cannot be set"})
+
+    for name, attribute in attributes.items():
+        if attribute.get("required") and name not in block["attributes"]:
+            errors.append({"line": block["line"], "message": f"Missing required argument '{name}' in {path}"})
+
+    counts, dynamic = {}, set()
+    for nested in block["blocks"]:
+        name = nested["type"]
+        if name == "dynamic" and nested["labels"]:
+            dynamic.add(nested["labels"][0])
+            name = nested["labels"][0]
+            content = next((child for child in nested["blocks"] if child["type"] == "content"), None)
+            if name in block_types and content is not None:
+                _check_block(content, block_types[name]["block"], f"{path}.{name}", errors, top_level=False)
+            elif name not in block_types:
+                errors.append({"line": nested["line"], "message": f"Unsupported block type '{name}' in {path}"})
+            continue
+        if top_level and name in META_BLOCKS:
+            continue
+        if name not in block_types:
+            hint = f", set it with '{name} = ...'" if name in attributes else ""
+            errors.append({"line": nested["line"], "message": f"Unsupported block type '{name}' in {path}{hint}"})
+            continue
+        counts[name] = counts.get(name, 0) + 1
+        _check_block(nested, block_types[name]["block"], f"{path}.{name}", errors, top_level=False)
+
+    for name, block_type in block_types.items():
+        count = counts.get(name, 0)
+        max_items = block_type.get("max_items") or (1 if block_type.get("nesting_mode") == "single" else 0)
+        if max_items and count > max_items:
+            errors.append({"line": block["line"], "message": f"At most {max_items} '{name}' block(s) allowed in {path}, found {count}"})
+        if count < block_type.get("min_items", 0) and name not in dynamic:
+            errors.append({"line": block["line"], "message": f"Missing required block '{name}' in {path}"})
+
+
+REFERENCE = re.compile(r"(?<![\w.\-])(var|local|module|data\.[a-z][a-z0-9_]*|[a-z][a-z0-9]*_[a-z0-9_]+)\.([A-Za-z_][A-Za-z0-9_-]*)")
+INTERPOLATION = re.compile(r"(?<!\$)\$\{(.*?)\}", re.S)
+
+
+def _expression_text(expression: List[_Token]) -> str:
+    """The expression without its literal strings, keeping the interpolations inside them."""
+    parts = []
+    for token in expression:
+        if token.kind in ("string", "heredoc"):
+            parts.extend(INTERPOLATION.findall(token.value))
+        else:
+            parts.append(token.value)
+    return " ".join(parts).replace(" . ", ".")
+
+
+def _references(block: dict, iterators: frozenset = frozenset()) -> List[Tuple[int, str, str]]:
+    """(line, prefix, name) of the references in a block, without the iterators of dynamic blocks."""
+    references = []
+    for attribute in block["attributes"].values():
+        for match in REFERENCE.finditer(_expression_text(attribute["expression"])):
+            if match.group(1) not in iterators:
+                references.append((attribute["line"], match.group(1), match.group(2)))
+    for nested in block["blocks"]:
+        nested_iterators = iterators
+        if nested["type"] == "dynamic" and nested["labels"]:
+            iterator = nested["attributes"].get("iterator")
+            names = [nested["labels"][0]] + ([iterator["expression"][0].value] if iterator else [])
+            nested_iterators = iterators.union(names)
+        references.extend(_references(nested, nested_iterators))
+    return references
+
+
+def _is_terraform_file(path: str) -> bool:
+    name = posixpath.basename(path)
+    return name.endswith(".tf") or "." not in name
+
+
+def validate_terraform(files: Dict[str, str], schema_file: str = SCHEMA_FILE) -> dict:
+    """
+    Validates Terraform files. Files are grouped by directory, each directory
+    being one module.
+
+    Args:
+        files: The file contents by path (e.g., {"main.tf": "...", "modules/network/main.tf": "..."}).
+            Only ".tf" files (or names without extension) are checked.
+        schema_file: The `terraform providers schema -json` output to check resources against.
+
+    Returns:
+        A dict with "valid", "errors" and "warnings" (lists of {"file", "line", "message"}),
+        and "schema_checked" telling whether a provider schema was available.
+    """
+    schema = load_provider_schema(schema_file)
+    errors, warnings = [], []
+    modules: Dict[str, List[Tuple[str, dict]]] = {}
+
+    for path, text in files.items():
+        if not _is_terraform_file(path):
+            continue
+        try:
+            body, syntax_errors = parse_hcl(text)
+        except HCLSyntaxError as e:
+            errors.append({"file": path, "line": e.line, "message": e.message})
+            continue
+        errors.extend({"file": path, "line": line, "message": message} for line, message in syntax_errors)
+        modules.setdefault(posixpath.dirname(path.replace("\\", "/")), []).append((path, body))
+
+        for name, attribute in body["attributes"].items():
+            errors.append({"file": path, "line": attribute["line"], "message": f"Argument '{name}' is not allowed at the top level, it must be inside a block"})
+
+        for block in body["blocks"]:
+            kind = block["type"]
+            if kind not in TOP_LEVEL_BLOCKS:
+                hint = " (backend blocks go inside the terraform block)" if kind == "backend" else ""
+                errors.append({"file": path, "line": block["line"], "message": f"Unsupported top-level block type '{kind}'{hint}"})
+                continue
+            if len(block["labels"]) != TOP_LEVEL_BLOCKS[kind]:
+                errors.append({"file": path, "line": block["line"], "message": f"'{kind}' blocks take {TOP_LEVEL_BLOCKS[kind]} label(s), found {len(block['labels'])}"})
+                continue
+            if schema is None or kind not in ("resource", "data"):
+                continue
+            type_name = block["labels"][0]
+            if type_name.split("_")[0] not in schema["providers"]:
+                continue  # provider not in the schema file
+            address = f"{'data.' if kind == 'data' else ''}{type_name}.{block['labels'][1]}"
+            if type_name not in schema[kind]:
+                errors.append({"file": path, "line": block["line"], "message": f"Unknown {'data source' if kind == 'data' else 'resource'} type '{type_name}'"})
+                continue
+            block_errors = []
+            _check_block(block, schema[kind][type_name], address, block_errors, top_level=True)
+            errors.extend({"file": path, **error} for error in block_errors)
+
+    for directory, bodies in modules.items():
+        declared = {"var": set(), "local": set(), "module": set(), "resource": set()}
+        addresses: Dict[str, str] = {}
+        for path, body in bodies:
+            for block in body["blocks"]:
+                kind, labels = block["type"], block["labels"]
+                if kind in ("variable", "module") and len(labels) == 1:
+                    declared["var" if kind == "variable" else "module"].add(labels[0])
+                elif kind == "locals":
+                    declared["local"].update(block["attributes"])
+                elif kind in ("resource", "data") and len(labels) == 2:
+                    declared["resource"].add(f"{'data.' if kind == 'data' else ''}{labels[0]}.{labels[1]}")
+                if kind in ("resource", "data", "variable", "output", "module") and len(labels) == TOP_LEVEL_BLOCKS[kind]:
+                    address = ".".join([kind] + labels)
+                    if address in addresses:
+                        errors.append({"file": path, "line": block["line"], "message": f"Duplicate {kind} '{'.'.join(labels)}', also declared in {addresses[address]}"})
+                    addresses[address] = path
+
+        for path, body in bodies:
+            for block in body["blocks"]:
+                for line, prefix, name in _references(block):
+                    if prefix in ("var", "local", "module"):
+                        if name not in declared[prefix]:
+                            warnings.append({"file": path, "line": line, "message": f"Reference to undeclared {prefix} '{prefix}.{name}'"})
+                    elif f"{prefix}.{name}" not in declared["resource"]:
+                        warnings.append({"file": path, "line": line, "message": f"Reference to undeclared resource '{prefix}.{name}'"})
+
+    return {"valid": not errors, "errors": errors, "warnings": warnings, "schema_checked": schema is not None}
+
+
+if __name__ == "__main__":
+    # python validation.py <terraform providers schema -json output> <trimmed schema file>
+    import sys
+
+    with open(sys.argv[1], "r") as f:
+        trimmed = trim_provider_schema(json.load(f))
+    with open(sys.argv[2], "w") as f:
+        json.dump(trimmed, f, separators=(",", ":"))
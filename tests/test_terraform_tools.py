@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("google.adk")
+
+from root_agent.sub_agents.terraform_agent.tools import save_terraform_file
+
+MAIN_TF = 'resource "google_storage_bucket" "assets" {\n  name     = "assets"\n  location = "US"\n}\n'
+
+
+class StubToolContext:
+    def __init__(self):
+        self.artifacts = {}
+
+    async def save_artifact(self, filename, artifact):
+        self.artifacts[filename] = artifact
+
+
+def test_save_terraform_file_saves_the_artifact_without_writing_to_disk(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tool_context = StubToolContext()
+
+    result = asyncio.run(save_terraform_file("main.tf", MAIN_TF, tool_context))
+
+    assert result["status"] == "success"
+    assert os.listdir(tmp_path) == []
+    [filename] = result["filenames"]
+    assert filename.startswith("main_") and filename.endswith(".tf")
+    assert tool_context.artifacts[filename].inline_data.data == MAIN_TF.encode("utf-8")